@@ -1,5 +1,22 @@
+import time
+
 import streamlit as st
-from utils.api import ask_question
+from config import SHOW_LATENCY
+from utils.api import ask_question_stream, busy_message, iter_sse_events
+
+
+def _token_stream(response, final, started):
+    # Yields answer tokens for st.write_stream; the final "done" event
+    # (sources + timings) is stored in `final`, with the client-side
+    # time to first token
+    for event, data in iter_sse_events(response):
+        if event == "token":
+            final.setdefault("client_first_token_ms", round((time.perf_counter() - started) * 1000, 1))
+            yield data["token"]
+        elif event == "done":
+            final.update(data)
+        elif event == "error":
+            raise RuntimeError(data["error"])
 
 
 def render_chat():
@@ -53,17 +70,43 @@ def render_chat():
     if user_input:
         st.session_state.messages.append({"role": "user", "content": user_input})
 
-        with st.spinner("Assistant is thinking..."):
-            response = ask_question(user_input)
+        with chat_container:
+            st.markdown(
+                f"<div class='chat-bubble-user'>🙋‍♂️ {user_input}</div>",
+                unsafe_allow_html=True
+            )
 
-        if response.status_code == 200:
-            data = response.json()
-            answer = data["response"]
+            started = time.perf_counter()
+            response = ask_question_stream(user_input)
 
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": answer
-            })
+            if response.status_code == 200:
+                # Render tokens as they arrive instead of waiting on a spinner
+                final = {}
+                try:
+                    answer = st.write_stream(_token_stream(response, final, started))
+                except RuntimeError as e:
+                    st.error(f"Error: {e}")
+                    return
 
-        else:
-            st.error(f"Error: {response.text}")
+                # Client-side chat-turn latency (includes network + Render)
+                latency = {
+                    "first_token_ms": final.get("client_first_token_ms"),
+                    "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "server_ms": final.get("timings", {}).get("total"),
+                }
+                st.session_state.setdefault("latencies", []).append(latency)
+                if SHOW_LATENCY:
+                    st.caption(
+                        f"⏱️ first token {latency['first_token_ms']} ms · "
+                        f"total {latency['total_ms']} ms · server {latency['server_ms']} ms"
+                    )
+
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": answer
+                })
+
+            elif busy_message(response):
+                st.warning(busy_message(response))
+            else:
+                st.error(f"Error: {response.text}")
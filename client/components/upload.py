@@ -1,5 +1,42 @@
+import time
+
 import streamlit as st
-from utils.api import upload_pdfs_api
+from utils.api import busy_message, get_job_status, upload_pdfs_api
+
+
+POLL_INTERVAL_SECONDS = 1.0
+
+
+def _wait_for_job(job_id):
+    # Poll /jobs/{id} until ingestion finishes, showing per-file progress
+    progress_bar = st.progress(0.0, text="Processing documents...")
+    details = st.empty()
+
+    while True:
+        response = get_job_status(job_id)
+        if response.status_code != 200:
+            progress_bar.empty()
+            return {"status": "failed", "error": response.text}
+
+        job = response.json()
+        files = job["files"]
+
+        total = sum(f["chunks_total"] or 0 for f in files)
+        done = sum(f["vectors_upserted"] for f in files)
+        fraction = done / total if total else 0.0
+        progress_bar.progress(min(fraction, 1.0), text=f"Indexed {done}/{total or '?'} chunks")
+
+        details.markdown("\n".join(
+            f"- **{f['file']}** — {f['status']}: {f['pages_parsed']} pages, "
+            f"{f['chunks_embedded']} chunks embedded, {f['vectors_upserted']} vectors stored"
+            for f in files
+        ))
+
+        if job["status"] in ("completed", "failed"):
+            progress_bar.empty()
+            return job
+
+        time.sleep(POLL_INTERVAL_SECONDS)
 
 
 def render_uploader():
@@ -50,8 +87,14 @@ def render_uploader():
             with st.spinner("Uploading documents..."):
                 response = upload_pdfs_api(uploaded_files)
 
-            if response.status_code == 200:
-                st.success("✅ Uploaded successfully")
+            if response.status_code in (200, 202):
+                job = _wait_for_job(response.json()["job_id"])
+                if job["status"] == "completed":
+                    st.success("✅ Uploaded successfully")
+                else:
+                    st.error(f"❌ Error: {job.get('error')}")
+            elif busy_message(response):
+                st.warning(f"⚠️ {busy_message(response)}")
             else:
                 st.error(f"❌ Error: {response.text}")
         else:
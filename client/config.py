@@ -1,2 +1,20 @@
+import os
+
 # API_URL="http://127.0.0.1:8000"
-API_URL=" https://patientmate.onrender.com"
\ No newline at end of file
+API_URL=os.getenv("API_URL","https://patientmate.onrender.com").strip()
+
+# HTTP client (see utils/api.py)
+API_CONNECT_TIMEOUT=float(os.getenv("API_CONNECT_TIMEOUT","10"))
+# Read timeout also bounds the gap between streamed tokens
+API_READ_TIMEOUT=float(os.getenv("API_READ_TIMEOUT","120"))
+API_RETRIES=int(os.getenv("API_RETRIES","3"))
+API_HTTP2=os.getenv("API_HTTP2","false").lower()=="true"
+# Shared with the server's RATE_LIMIT_CLIENT_SECRET: lets it rate-limit each
+# browser separately instead of this whole process as one client
+API_CLIENT_SECRET=os.getenv("API_CLIENT_SECRET","").strip()
+# Reverse proxies (IPs or CIDRs) in front of this Streamlit app. Their
+# X-Forwarded-For names the browser; from anyone else it is ignored, as the
+# caller could write any address there. Empty = use the connection's address
+TRUSTED_PROXIES=[p.strip() for p in os.getenv("TRUSTED_PROXIES","").split(",") if p.strip()]
+# Show client-measured latency under each answer
+SHOW_LATENCY=os.getenv("SHOW_LATENCY","false").lower()=="true"
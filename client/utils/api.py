@@ -1,10 +1,153 @@
-import requests
-from config import API_URL
+import importlib.util
+import ipaddress
+import json
+import time
+import uuid
+
+import httpx
+import streamlit as st
+from config import (API_CLIENT_SECRET, API_CONNECT_TIMEOUT, API_HTTP2, API_READ_TIMEOUT, API_RETRIES, API_URL,
+                    TRUSTED_PROXIES)
+
+RETRY_STATUSES={502,503,504}
+RETRY_BASE_DELAY=0.5
+TRUSTED_NETWORKS=[ipaddress.ip_network(p,strict=False) for p in TRUSTED_PROXIES]
+
+
+@st.cache_resource
+def get_client():
+    """One pooled HTTP client per Streamlit process, shared by every session.
+
+    Keep-alive connections to API_URL are reused across chat turns, so only
+    the first request pays the TCP/TLS handshake. The transport retries
+    failed connects (nothing was sent, so safe for POSTs too).
+    """
+    http2=API_HTTP2 and importlib.util.find_spec("h2") is not None
+    return httpx.Client(
+        base_url=API_URL,
+        timeout=httpx.Timeout(API_READ_TIMEOUT,connect=API_CONNECT_TIMEOUT),
+        transport=httpx.HTTPTransport(
+            http2=http2,
+            retries=API_RETRIES,
+            limits=httpx.Limits(max_connections=20,max_keepalive_connections=10,keepalive_expiry=60)
+        )
+    )
+
+
+def _get_with_retry(url,**kwargs):
+    # Idempotent requests are also retried on gateway errors / timeouts
+    # (e.g. Render waking the service up), with exponential backoff
+    for attempt in range(API_RETRIES+1):
+        try:
+            response=get_client().get(url,**kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt==API_RETRIES:
+                return response
+        except (httpx.TimeoutException,httpx.NetworkError):
+            if attempt==API_RETRIES:
+                raise
+        time.sleep(RETRY_BASE_DELAY*2**attempt)
+
+
+def get_namespace():
+    # Each browser session is its own tenant unless ?tenant=<id> pins one,
+    # so users only ever retrieve from documents uploaded in their namespace
+    if "namespace" not in st.session_state:
+        st.session_state.namespace=st.query_params.get("tenant") or uuid.uuid4().hex
+    return st.session_state.namespace
+
+
+def get_session_id():
+    # One server-side conversation per browser session, so follow-up
+    # questions are answered in the context of the previous turns
+    if "session_id" not in st.session_state:
+        st.session_state.session_id=uuid.uuid4().hex
+    return st.session_state.session_id
+
+
+def _is_trusted_proxy(host):
+    try:
+        address=ipaddress.ip_address(host)
+    except (TypeError,ValueError):
+        return False
+    return any(address in network for network in TRUSTED_NETWORKS)
+
+
+def _browser_address():
+    # Address of the browser behind this session: the connection's peer,
+    # unless that is one of TRUSTED_PROXIES. Then X-Forwarded-For is walked
+    # from the right to the first hop our proxies did not add (the left end
+    # is written by the caller)
+    context=getattr(st,"context",None)
+    peer=getattr(context,"ip_address",None)
+    if not _is_trusted_proxy(peer):
+        return peer
+    headers=getattr(context,"headers",None) or {}
+    for hop in reversed(headers.get("X-Forwarded-For","").split(",")):
+        hop=hop.strip()
+        if hop and not _is_trusted_proxy(hop):
+            return hop
+    return peer
+
+
+def _client_headers():
+    # The server rate-limits per client, and every session shares this
+    # process's IP. It only believes X-Client-Id with the shared secret, so
+    # without one all sessions share a bucket rather than each getting its own
+    address=_browser_address()
+    if not API_CLIENT_SECRET or not address:
+        return {}
+    return {"X-Client-Id":address,"X-Client-Secret":API_CLIENT_SECRET}
+
+
+def busy_message(response):
+    """User-facing text for a 429 / 503 (server busy or rate limited), else None."""
+    if response.status_code not in (429,503):
+        return None
+    retry_after=response.headers.get("Retry-After","a few")
+    return f"The assistant is busy right now, please try again in {retry_after} seconds."
+
+
+def _ask_data(question):
+    return {"question":question,"namespace":get_namespace(),"session_id":get_session_id()}
 
 
 def upload_pdfs_api(files):
-    files_payload=[ ("files",(f.name,f.read(),"application/pdf")) for f in files]
-    return requests.post(f"{API_URL}/upload_pdfs/",files=files_payload)
+    # httpx streams file objects into the multipart body chunk by chunk
+    return get_client().post(
+        "/upload_pdfs/",
+        files=[("files",(f.name,f,"application/pdf")) for f in files],
+        data={"namespace":get_namespace()},
+        headers=_client_headers()
+    )
+
+def get_job_status(job_id):
+    return _get_with_retry(f"/jobs/{job_id}")
 
 def ask_question(question):
-    return requests.post(f"{API_URL}/ask/",data={"question":question})
\ No newline at end of file
+    return get_client().post("/ask/",data=_ask_data(question),headers=_client_headers())
+
+def ask_question_stream(question):
+    # Server-Sent Events response; read it with iter_sse_events, which closes it
+    client=get_client()
+    request=client.build_request("POST","/ask/stream",data=_ask_data(question),headers=_client_headers())
+    response=client.send(request,stream=True)
+    if response.status_code!=200:
+        response.read()
+        response.close()
+    return response
+
+def iter_sse_events(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    try:
+        for line in response.iter_lines():
+            if not line:
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+    finally:
+        response.close()
@@ -0,0 +1,70 @@
+"""Per-request chain setup overhead: build-per-request vs build-once.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_chain_setup [iterations]
+
+No network calls are made: only client/prompt/chain construction is timed,
+which is what /ask/ used to pay on every question before any Groq I/O.
+(The old path also lost HTTP keep-alive, so each question paid a fresh
+TLS handshake on top of the numbers below.)
+"""
+import os
+import sys
+import time
+from typing import List, Optional
+
+os.environ.setdefault("GROQ_API_KEY", "bench-dummy-key")
+
+from pydantic import Field
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from server.modules.llm import get_llm_chain
+
+
+DOCS = [Document(page_content="Hemoglobin 13.5 g/dL", metadata={"source": "lab.pdf"})]
+
+
+def per_request_setup():
+    # What /ask/ did before: new retriever class + new ChatGroq + prompt + chain
+    class SimpleRetriever(BaseRetriever):
+        tags: Optional[List[str]] = Field(default_factory=list)
+        metadata: Optional[dict] = Field(default_factory=dict)
+
+        def __init__(self, documents: List[Document]):
+            super().__init__()
+            self._docs = documents
+
+        def _get_relevant_documents(self, query: str) -> List[Document]:
+            return self._docs
+
+    return get_llm_chain(SimpleRetriever(DOCS))
+
+
+def shared_setup(chain):
+    # What /ask/ does now: reuse the startup chain, only build the input
+    return chain, {"question": "what is my hemoglobin level", "docs": DOCS}
+
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    chain = get_llm_chain()
+    before = bench(per_request_setup, iterations)
+    after = bench(lambda: shared_setup(chain), iterations)
+
+    print(f"iterations:            {iterations}")
+    print(f"build per request:     {before * 1e3:8.3f} ms/request")
+    print(f"shared startup chain:  {after * 1e3:8.3f} ms/request")
+    print(f"saved:                 {(before - after) * 1e3:8.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Chunking: the previous character splitter vs the structured chunker.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_chunking [pages] [workers] [pdf ...]
+    e.g. python -m server.benchmarks.bench_chunking 2000 4 assets/DIABETES.pdf
+
+Pages are synthetic structured reports (lab table, medication list,
+sections of prose, see synthetic.report_page), plus the pages of any
+PDFs given. For each splitter it reports chunks per page (= embeddings
+and upserts per page), tokens per chunk, how many lab tables / medication
+lists were split across chunks or cut off from their heading (synthetic
+pages only) and pages/s, for the structured chunker both in-process and
+over `workers` processes (steady state, after a warm-up pass).
+"""
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from server.benchmarks.synthetic import report_page
+from server.modules.chunker import CHUNK_MAX_TOKENS, split_pages, split_text
+from server.modules.tokenizer import get_tokenizer, worker_tokenizer
+
+BATCH_PAGES = 16
+
+
+def recursive_split(texts):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=700, chunk_overlap=120, add_start_index=True)
+    return [splitter.split_text(text) for text in texts]
+
+
+def structured_split(texts):
+    return [[chunk.text for chunk in split_text(text)] for text in texts]
+
+
+def split_batch(texts, tokenizer_path):
+    # As in the parse workers: the tokenizer the parent resolved, loaded by path
+    return split_pages(texts, worker_tokenizer(tokenizer_path))
+
+
+def structured_split_pool(texts, workers):
+    batches = [texts[i:i + BATCH_PAGES] for i in range(0, len(texts), BATCH_PAGES)]
+    split = partial(split_batch, tokenizer_path=get_tokenizer().path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(split, batches))  # process start-up and tokenizer load, outside the timing
+        start = time.perf_counter()
+        results = [page for batch in pool.map(split, batches) for page in batch]
+        elapsed = time.perf_counter() - start
+    return [[chunk.text for chunk in page] for page in results], elapsed
+
+
+def split_blocks(pages, blocks):
+    """Blocks (with their heading) not contained whole in any chunk of their page."""
+    return sum(
+        1
+        for chunks, page_blocks in zip(pages, blocks)
+        for block in page_blocks
+        if not any(block in chunk for chunk in chunks)
+    )
+
+
+def report(name, pages, elapsed, blocks, tokenizer):
+    tokens = [tokenizer.count(chunk) for chunks in pages for chunk in chunks]
+    chunks = len(tokens)
+    total_blocks = sum(len(page_blocks) for page_blocks in blocks)
+    print(f"{name:>22}{chunks:>8}{chunks / len(pages):>9.2f}{statistics.mean(tokens):>9.0f}"
+          f"{np.percentile(tokens, 95):>9.0f}{statistics.pstdev(tokens) / statistics.mean(tokens):>8.2f}"
+          f"{split_blocks(pages, blocks):>7}/{total_blocks:<6}{len(pages) / elapsed:>10.0f}")
+
+
+def main():
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    pdfs = sys.argv[3:]
+
+    rng = random.Random(0)
+    synthetic = [report_page(rng) for _ in range(n_pages)]
+    texts = [text for text, _ in synthetic]
+    blocks = [page_blocks for _, page_blocks in synthetic]
+    if pdfs:
+        from pypdf import PdfReader
+        for path in pdfs:
+            for page in PdfReader(path).pages:
+                texts.append(page.extract_text() or "")
+                blocks.append([])
+
+    tokenizer = get_tokenizer()
+    split_text("warm-up")
+    print(f"pages={len(texts)} tokenizer={type(tokenizer).__name__} max_tokens={CHUNK_MAX_TOKENS}")
+    print(f"{'splitter':>22}{'chunks':>8}{'/page':>9}{'tok avg':>9}{'tok p95':>9}{'tok cv':>8}"
+          f"{'split blocks':>14}{'pages/s':>10}")
+
+    for name, split in (("recursive 700/120", recursive_split), ("structured", structured_split)):
+        start = time.perf_counter()
+        pages = split(texts)
+        report(name, pages, time.perf_counter() - start, blocks, tokenizer)
+
+    pages, elapsed = structured_split_pool(texts, workers)
+    report(f"structured x{workers} procs", pages, elapsed, blocks, tokenizer)
+
+
+if __name__ == "__main__":
+    main()
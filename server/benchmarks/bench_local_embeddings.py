@@ -0,0 +1,78 @@
+"""Local CPU embedding throughput: sentences/s vs batch size, and micro-batching.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_local_embeddings [batch_sizes] [sentences] [model]
+    e.g. python -m server.benchmarks.bench_local_embeddings 1,8,32,64 512 BAAI/bge-m3
+
+Runtime and threads come from LOCAL_EMBEDDING_RUNTIME / LOCAL_EMBEDDING_THREADS,
+so compare e.g. torch vs int8 vs onnx by re-running with a different env.
+The second table sends single-query requests from concurrent threads,
+through LocalEmbeddings (micro-batched) and straight to model.encode.
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from server.benchmarks.synthetic import LINES
+from server.modules.local_embeddings import (
+    LOCAL_EMBEDDING_RUNTIME,
+    LocalEmbeddings,
+    load_sentence_transformer,
+)
+
+
+def sentences(n, lines_per_sentence=3, seed=0):
+    rng = random.Random(seed)
+    return [
+        "passage: " + " ".join(
+            rng.choice(LINES).format(n=rng.randint(60, 240), m=rng.randint(2, 90), d=round(rng.uniform(0.5, 12), 1))
+            for _ in range(lines_per_sentence)
+        )
+        for _ in range(n)
+    ]
+
+
+def bench_batch_sizes(model, batch_sizes, texts):
+    print(f"{'batch':>7}{'sent/s':>10}{'ms/batch':>10}")
+    for batch_size in batch_sizes:
+        model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        elapsed = time.perf_counter() - start
+        batches = -(-len(texts) // batch_size)
+        print(f"{batch_size:>7}{len(texts) / elapsed:>10.1f}{elapsed / batches * 1000:>10.1f}")
+
+
+def bench_concurrent_queries(model, model_name, queries, concurrency=(1, 8, 32)):
+    batched = LocalEmbeddings(model_name, model=model)
+    batched.embed_query(queries[0])  # warm-up
+
+    print(f"\n{'threads':>7}{'mode':>12}{'queries/s':>11}")
+    for threads in concurrency:
+        for mode, fn in (
+            ("direct", lambda q: model.encode([q], normalize_embeddings=True)),
+            ("microbatch", batched.embed_query),
+        ):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(fn, queries))
+            elapsed = time.perf_counter() - start
+            print(f"{threads:>7}{mode:>12}{len(queries) / elapsed:>11.1f}")
+
+
+def main():
+    batch_sizes = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "1,4,8,16,32,64").split(",")]
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    model_name = sys.argv[3] if len(sys.argv) > 3 else os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+
+    model = load_sentence_transformer(model_name)
+    print(f"model={model_name} runtime={LOCAL_EMBEDDING_RUNTIME} sentences={n}")
+    texts = sentences(n)
+    bench_batch_sizes(model, batch_sizes, texts)
+    bench_concurrent_queries(model, model_name, [f"query: {t[9:80]}" for t in texts[:128]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""PDF parsing throughput: sequential PyPDFLoader-style vs the process pool.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_pdf_parsing [files] [pages_per_file]
+
+Builds a synthetic corpus, then parses it once sequentially in-process
+(what load_vectorstore used to do) and once through the parse pool for
+1, 2, 4, ... up to os.cpu_count() workers.
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+from server.benchmarks.synthetic import make_corpus
+from server.modules.pdf_handlers import iter_parsed_pages, submit_pdf_parse
+
+
+def parse_sequential(paths):
+    pages = 0
+    for path in paths:
+        for page in PdfReader(path).pages:
+            page.extract_text()
+            pages += 1
+    return pages
+
+
+def parse_pool(paths, workers):
+    pages = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsing = [(path, *submit_pdf_parse(path, pool=pool, pages_per_task=8)) for path in paths]
+        for path, page_count, futures in parsing:
+            for _ in iter_parsed_pages(path, page_count, futures):
+                pages += 1
+    return pages
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    pages = fn(*args)
+    return pages, time.perf_counter() - start
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    pages_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(tmp, files=files, pages=pages_per_file)
+
+        pages, seconds = timed(parse_sequential, paths)
+        print(f"corpus: {files} files x {pages_per_file} pages, {os.cpu_count()} cores")
+        print(f"{'mode':<16}{'seconds':>10}{'pages/s':>12}{'speedup':>10}")
+        print(f"{'sequential':<16}{seconds:>10.2f}{pages / seconds:>12.1f}{1.0:>10.2f}")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            pool_pages, pool_seconds = timed(parse_pool, paths, workers)
+            assert pool_pages == pages
+            print(f"{f'pool x{workers}':<16}{pool_seconds:>10.2f}"
+                  f"{pool_pages / pool_seconds:>12.1f}{seconds / pool_seconds:>10.2f}")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cold start: import time of server.main and time to first served request.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_startup [runs]
+
+Each run uses a fresh interpreter. "import" is the in-process time of
+`import server.main`; "first request" is from spawning uvicorn to the first
+200 from /health; "warm" is until /health reports no pending resources.
+Dummy API keys are filled in when missing (nothing is called upstream at
+startup) and HF_HUB_OFFLINE=1 avoids hub retries for uncached models.
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import server.main; print(time.perf_counter() - t)"
+
+
+def bench_env():
+    env = dict(os.environ)
+    for key in ("GROQ_API_KEY", "HUGGINGFACEHUB_API_TOKEN", "PINECONE_API_KEY", "PINECONE_INDEX_NAME"):
+        env.setdefault(key, "bench-dummy")
+    env.setdefault("HF_HUB_OFFLINE", "1")
+    return env
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import(env):
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def health(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+
+def time_first_request(env, timeout=120):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server.main:app", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first = warm = None
+    try:
+        while time.perf_counter() - start < timeout:
+            status = health(port)
+            if status is not None:
+                first = first or time.perf_counter() - start
+                if not status["resources"]["pending"]:
+                    warm = time.perf_counter() - start
+                    break
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return first, warm
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = bench_env()
+
+    imports, firsts, warms = [], [], []
+    for _ in range(runs):
+        imports.append(time_import(env))
+        first, warm = time_first_request(env)
+        firsts.append(first)
+        warms.append(warm)
+
+    print(f"runs={runs} RESOURCE_WARMUP={env.get('RESOURCE_WARMUP', 'background')}")
+    print(f"{'metric':>15}{'median s':>10}{'max s':>10}")
+    for name, samples in (("import", imports), ("first request", firsts), ("warm", warms)):
+        samples = [s for s in samples if s is not None]
+        if samples:
+            print(f"{name:>15}{statistics.median(samples):>10.3f}{max(samples):>10.3f}")
+        else:
+            print(f"{name:>15}{'timeout':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Per-tenant query latency as the number of tenants grows.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_tenants [tenants] [corpus] [dim] [queries]
+    e.g. python -m server.benchmarks.bench_tenants 1,10,100,1000 50000 384 200
+
+The corpus size is fixed and split evenly over the tenants (namespaces),
+so each tenant holds corpus / tenants chunks. Queries go to one tenant,
+unfiltered and with a metadata filter (one source file, doc type).
+Dense search is forced exact so the pre-filter's effect is not masked by
+IVF; with 1 tenant it scans the whole corpus, like an unpartitioned index.
+Latency should fall with tenant size instead of staying at full-corpus cost.
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from server.modules.bm25 import BM25Index
+from server.modules.prefilter import MetadataFilter
+from server.modules.vectorstore import LocalVectorStore
+
+TOP_K = 10
+CHUNKS_PER_FILE = 50
+DOC_TYPES = ("lab_report", "prescription", "discharge_summary")
+
+
+def synthetic_corpus(n, dim, vocabulary=5000, words=80, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    # Zipf-like term distribution, like real text
+    terms = np.minimum(rng.zipf(1.3, size=(n, words)), vocabulary)
+    texts = [" ".join(f"w{t}" for t in row) for row in terms]
+    return vectors, texts
+
+
+def metadata(i, namespace):
+    file_no = i // CHUNKS_PER_FILE
+    return {
+        "source": f"./uploaded_docs/{namespace}/file{file_no}.pdf",
+        "page": (i % CHUNKS_PER_FILE) // 5,
+        "doc_type": DOC_TYPES[file_no % len(DOC_TYPES)],
+    }
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def timed_queries(fn, probes):
+    latencies = []
+    for probe in probes:
+        start = time.perf_counter()
+        fn(probe)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run(tenants, vectors, texts, queries):
+    n, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    probes = rng.normal(size=(queries, dim)).astype(np.float32)
+    words = [f"w{t}" for t in range(1, 200)]
+    questions = [" ".join(rng.choice(words, 4)) for _ in range(queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(f"{tmp}/vectors", dim=dim)
+        bm25 = BM25Index(f"{tmp}/bm25")
+        per_tenant = n // tenants
+        for t in range(tenants):
+            namespace = f"tenant{t}"
+            rows = range(t * per_tenant, (t + 1) * per_tenant)
+            items = [(f"c{i}", vectors[i], metadata(i - t * per_tenant, namespace)) for i in rows]
+            for start in range(0, len(items), 5000):
+                store.upsert(items[start:start + 5000], namespace)
+            bm25.add([(vid, texts[i], meta) for (vid, _, meta), i in zip(items, rows)], namespace)
+
+        namespace = "tenant0"
+        flt = MetadataFilter(sources=(f"./uploaded_docs/{namespace}/file0.pdf",), doc_type=DOC_TYPES[0])
+        cases = {
+            "dense": lambda q: store.query(q, TOP_K, False, namespace, exact=True),
+            "dense+filter": lambda q: store.query(q, TOP_K, False, namespace, flt, exact=True),
+        }
+        sparse_cases = {
+            "sparse": lambda q: bm25.query(q, TOP_K, namespace),
+            "sparse+filter": lambda q: bm25.query(q, TOP_K, namespace, flt),
+        }
+        for name, fn in cases.items():
+            fn(probes[0])
+            latencies = timed_queries(fn, probes)
+            print(f"{tenants:>8}{per_tenant:>10}{name:>15}"
+                  f"{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+        for name, fn in sparse_cases.items():
+            fn(questions[0])
+            latencies = timed_queries(fn, questions)
+            print(f"{tenants:>8}{per_tenant:>10}{name:>15}"
+                  f"{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+
+
+def main():
+    tenant_counts = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "1,10,100,1000").split(",")]
+    corpus = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    dim = int(sys.argv[3]) if len(sys.argv) > 3 else 384
+    queries = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    vectors, texts = synthetic_corpus(corpus, dim)
+    print(f"corpus={corpus} dim={dim} top_k={TOP_K} queries={queries}")
+    print(f"{'tenants':>8}{'chunks':>10}{'query':>15}{'p50 ms':>10}{'p95 ms':>10}")
+    for tenants in tenant_counts:
+        run(tenants, vectors, texts, queries)
+
+
+if __name__ == "__main__":
+    main()
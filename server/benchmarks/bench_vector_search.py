@@ -0,0 +1,72 @@
+"""Local vector store: exact vs IVF search, recall and latency.
+
+Run from the repo root:
+    python -m server.benchmarks.bench_vector_search [sizes] [dim] [queries]
+    e.g. python -m server.benchmarks.bench_vector_search 10000,50000 1024 200
+
+Data is clustered (like real chunk embeddings) so IVF has structure to
+exploit. Recall@10 is measured against exact search on the same store.
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from server.modules.vectorstore import LocalVectorStore
+
+TOP_K = 10
+
+
+def clustered(n, dim, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def run(n, dim, queries):
+    data = clustered(n, dim)
+    probes = clustered(queries, dim, seed=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(tmp, dim=dim, ann_threshold=n + 1)
+        for start in range(0, n, 5000):
+            store.upsert((f"v{i}", data[i], {"i": i}) for i in range(start, min(start + 5000, n)))
+
+        store.query(probes[0], TOP_K, exact=False)  # build the IVF index outside the timings
+
+        results = {}
+        for mode, exact in (("exact", True), ("ivf", False)):
+            latencies, ids = [], []
+            for q in probes:
+                start = time.perf_counter()
+                matches = store.query(q, TOP_K, include_metadata=False, exact=exact)["matches"]
+                latencies.append(time.perf_counter() - start)
+                ids.append({m["id"] for m in matches})
+            results[mode] = (latencies, ids)
+
+        exact_ids = results["exact"][1]
+        for mode, (latencies, ids) in results.items():
+            recall = np.mean([len(a & b) / TOP_K for a, b in zip(ids, exact_ids)])
+            print(f"{n:>9}{mode:>7}{percentile_ms(latencies, 50):>10.2f}"
+                  f"{percentile_ms(latencies, 95):>10.2f}{recall:>10.3f}")
+
+
+def main():
+    sizes = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "10000,50000").split(",")]
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    print(f"dim={dim} top_k={TOP_K} queries={queries}")
+    print(f"{'vectors':>9}{'mode':>7}{'p50 ms':>10}{'p95 ms':>10}{'recall':>10}")
+    for n in sizes:
+        run(n, dim, queries)
+
+
+if __name__ == "__main__":
+    main()
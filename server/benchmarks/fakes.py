@@ -0,0 +1,203 @@
+"""Deterministic local stand-ins for Groq, the HF embedding endpoint and Pinecone.
+
+install_fakes() swaps them into the resource registry, so the real
+routes, retrieval, context building and ingestion pipeline run unchanged
+while no request leaves the machine. Latencies are simulated with
+sleeps, so results reflect concurrency behaviour, not model speed.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from server.modules.resources import resources
+
+ANSWER = (
+    "Based on the provided documents, the reported values are within the "
+    "reference range and the medication schedule is unchanged. Please discuss "
+    "any concerns with your clinician."
+)
+
+
+# -------------------------
+# Groq
+# -------------------------
+class FakeChatModel(BaseChatModel):
+    """Chat model that "generates" ANSWER word by word.
+
+    first_token_s is paid once per call, token_s per generated token;
+    both invoke and stream honour them, sync and async.
+    """
+
+    first_token_s: float = 0.2
+    token_s: float = 0.005
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def _tokens(self):
+        words = ANSWER.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.first_token_s + self.token_s * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=ANSWER))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.first_token_s + self.token_s * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=ANSWER))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_s)
+        for token in self._tokens():
+            time.sleep(self.token_s)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_s)
+        for token in self._tokens():
+            await asyncio.sleep(self.token_s)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+# -------------------------
+# HF embedding endpoint
+# -------------------------
+class FakeEmbeddings(Embeddings):
+    """Hash-seeded unit vectors: the same text always gets the same vector.
+
+    Each call costs call_s (HTTP round trip) plus text_s per text.
+    """
+
+    def __init__(self, dim=1024, call_s=0.03, text_s=0.001):
+        self.dim = dim
+        self.call_s = call_s
+        self.text_s = text_s
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.call_s + self.text_s * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.call_s + self.text_s * len(texts))
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+# -------------------------
+# Pinecone
+# -------------------------
+class FakePineconeIndex:
+    """In-memory index with the pinecone.Index upsert/query/delete surface.
+
+    Exact cosine search over a numpy matrix, per namespace, honouring the
+    metadata filter operators the app sends ($in, $eq, $gte, $lte);
+    latency_s is added to every call to stand in for the network round trip.
+    """
+
+    def __init__(self, latency_s=0.02):
+        self.latency_s = latency_s
+        self._lock = threading.Lock()
+        self._namespaces = {}   # namespace -> {id: (vector, metadata)}
+        self._matrices = {}     # namespace -> (ids, matrix), rebuilt lazily
+
+    def upsert(self, vectors, namespace=""):
+        time.sleep(self.latency_s)
+        with self._lock:
+            store = self._namespaces.setdefault(namespace, {})
+            for item in vectors:
+                vid, values, metadata = (
+                    (item["id"], item["values"], item.get("metadata")) if isinstance(item, dict) else item
+                )
+                vector = np.asarray(values, dtype=np.float32)
+                store[vid] = (vector / (np.linalg.norm(vector) or 1.0), metadata or {})
+            self._matrices.pop(namespace, None)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids, namespace=""):
+        time.sleep(self.latency_s)
+        with self._lock:
+            store = self._namespaces.get(namespace, {})
+            for vid in ids:
+                store.pop(vid, None)
+            self._matrices.pop(namespace, None)
+        return {}
+
+    def query(self, vector, top_k, include_metadata=True, namespace="", filter=None, **kwargs):
+        time.sleep(self.latency_s)
+        with self._lock:
+            store = self._namespaces.get(namespace, {})
+            if not store:
+                return {"matches": []}
+            if namespace not in self._matrices:
+                ids = list(store)
+                self._matrices[namespace] = (ids, np.stack([store[i][0] for i in ids]))
+            ids, matrix = self._matrices[namespace]
+            scores = matrix @ np.asarray(vector, dtype=np.float32)
+            if filter:
+                keep = np.array([_matches(store[i][1], filter) for i in ids])
+                scores[~keep] = -np.inf
+            top = [i for i in np.argsort(-scores)[:top_k] if np.isfinite(scores[i])]
+            return {
+                "matches": [
+                    {
+                        "id": ids[i],
+                        "score": float(scores[i]),
+                        **({"metadata": store[ids[i]][1]} if include_metadata else {}),
+                    }
+                    for i in top
+                ]
+            }
+
+    def __len__(self):
+        return sum(len(store) for store in self._namespaces.values())
+
+
+_OPERATORS = {
+    "$eq": lambda value, arg: value == arg,
+    "$in": lambda value, arg: value in arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+}
+
+
+def _matches(metadata, pinecone_filter):
+    return all(
+        _OPERATORS[op](metadata.get(field), arg)
+        for field, clause in pinecone_filter.items()
+        for op, arg in clause.items()
+    )
+
+
+def install_fakes(first_token_s=0.2, token_s=0.005, embed_call_s=0.03, embed_text_s=0.001,
+                  index_latency_s=0.02, dim=1024):
+    """Register the fakes in the resource registry (call before the app starts)."""
+    from server.modules.llm import get_llm_chain
+    from server.modules.vectorstore import PineconeVectorStore
+
+    llm = FakeChatModel(first_token_s=first_token_s, token_s=token_s)
+    embedder = FakeEmbeddings(dim=dim, call_s=embed_call_s, text_s=embed_text_s)
+    index = FakePineconeIndex(latency_s=index_latency_s)
+
+    resources.register("llm_chain", lambda: get_llm_chain(llm=llm))
+    resources.register("embedder", lambda: embedder)
+    resources.register("vector_store", lambda: PineconeVectorStore(index))
+    return llm, embedder, index
@@ -0,0 +1,213 @@
+"""End-to-end load test of /upload_pdfs/ and /ask/ against local fakes.
+
+Run from the repo root:
+    python -m server.benchmarks.load_test [--concurrency 1,4,16,64] [--requests 200]
+        [--files 4] [--pages 25] [--first-token-ms 200] [--token-ms 5]
+        [--embed-ms 30] [--index-ms 20]
+
+A uvicorn server is started in a separate process (working directory is
+a temp dir, so caches and uploads never touch the repo) with the fakes
+from server.benchmarks.fakes in place of Groq, the HF endpoint and
+Pinecone. The parent process then:
+
+1. uploads a synthetic PDF corpus and reports ingestion pages/s and chunks/s
+2. drives /ask/ at each concurrency level and reports RPS, p50/p95/p99
+   latency, errors and the server's resident memory (current and peak)
+
+The answer cache and the reranker are off so every question does the
+full pipeline; set ANSWER_CACHE_ENABLED / RERANK_ENABLED to override.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+QUESTIONS = [
+    "What is the latest HbA1c value?",
+    "What dose of metformin was prescribed?",
+    "What was the fasting glucose?",
+    "What is the eGFR and creatinine?",
+    "What were the LDL and HDL cholesterol levels?",
+    "What was the blood pressure?",
+    "Are there any drug allergies?",
+    "What lifestyle advice was given?",
+]
+
+
+# -------------------------
+# Server process
+# -------------------------
+def serve(args):
+    os.environ.setdefault("RERANK_ENABLED", "false")
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    # One load generator is one client: per-client limits would cap the rate measured
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    for key in ("GROQ_API_KEY", "HUGGINGFACEHUB_API_TOKEN", "PINECONE_API_KEY", "PINECONE_INDEX_NAME"):
+        os.environ.setdefault(key, "bench-dummy")
+
+    import uvicorn
+
+    from server.benchmarks.fakes import install_fakes
+
+    install_fakes(
+        first_token_s=args.first_token_ms / 1000,
+        token_s=args.token_ms / 1000,
+        embed_call_s=args.embed_ms / 1000,
+        index_latency_s=args.index_ms / 1000,
+    )
+    from server.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_server(args, workdir):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    command = [
+        sys.executable, "-m", "server.benchmarks.load_test", "--serve", "--port", str(port),
+        "--first-token-ms", str(args.first_token_ms), "--token-ms", str(args.token_ms),
+        "--embed-ms", str(args.embed_ms), "--index-ms", str(args.index_ms),
+    ]
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT)}
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def rss_mb(pid):
+    """(current, peak) resident set size of `pid` in MB, from /proc (Linux)."""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, amount, _ = line.split()
+                values[key] = int(amount) / 1024
+    return values.get("VmRSS:", 0.0), values.get("VmHWM:", 0.0)
+
+
+async def wait_ready(client, timeout=120):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            response = await client.get("/health")
+            if response.status_code == 200 and not response.json()["resources"]["pending"]:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError("server did not become ready")
+
+
+# -------------------------
+# Ingestion
+# -------------------------
+async def bench_ingestion(client, paths):
+    from contextlib import ExitStack
+
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        files = [("files", (Path(p).name, stack.enter_context(open(p, "rb")), "application/pdf")) for p in paths]
+        response = await client.post("/upload_pdfs/", files=files)
+    response.raise_for_status()
+    status_url = response.json()["status_url"]
+
+    while True:
+        job = (await client.get(status_url)).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    pages = sum(f["pages_parsed"] for f in job["files"])
+    chunks = sum(f["chunks_total"] or 0 for f in job["files"])
+    print(f"ingestion: {job['status']} files={len(paths)} pages={pages} chunks={chunks} "
+          f"time={elapsed:.2f}s pages/s={pages / elapsed:.1f} chunks/s={chunks / elapsed:.1f}")
+
+
+# -------------------------
+# /ask/ load
+# -------------------------
+async def run_level(client, concurrency, total):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/ask/", data={"question": QUESTIONS[i % len(QUESTIONS)]})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def drive(args, base_url, pid, workdir):
+    from server.benchmarks.synthetic import make_corpus
+
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 8, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_ready(client)
+        rss, _ = rss_mb(pid)
+        print(f"server ready, rss={rss:.0f}MB")
+
+        paths = make_corpus(Path(workdir) / "corpus", files=args.files, pages=args.pages)
+        await bench_ingestion(client, paths)
+
+        await run_level(client, 1, 4)  # warm-up
+        print(f"{'conc':>5}{'reqs':>6}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rss MB':>8}{'peak MB':>9}")
+        for concurrency in args.concurrency:
+            latencies, errors, elapsed = await run_level(client, concurrency, args.requests)
+            ms = np.asarray(latencies) * 1000
+            rss, peak = rss_mb(pid)
+            print(f"{concurrency:>5}{len(latencies):>6}{errors:>5}{len(latencies) / elapsed:>8.1f}"
+                  f"{np.percentile(ms, 50):>9.1f}{np.percentile(ms, 95):>9.1f}{np.percentile(ms, 99):>9.1f}"
+                  f"{rss:>8.0f}{peak:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16,64", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=25)
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--embed-ms", type=float, default=30)
+    parser.add_argument("--index-ms", type=float, default=20)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, base_url = start_server(args, workdir)
+        try:
+            asyncio.run(drive(args, base_url, process.pid, workdir))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Synthetic medical-looking PDFs for benchmarks (no external dependencies)."""
+import random
+from pathlib import Path
+
+LINES = [
+    "Patient presented with elevated fasting glucose of {n} mg/dL.",
+    "Hemoglobin A1c: {d}% (reference 4.0 - 5.6).",
+    "Metformin {n} mg twice daily with meals; review in {m} weeks.",
+    "Blood pressure {n}/{m} mmHg, pulse {m} bpm, afebrile.",
+    "Creatinine {d} mg/dL; eGFR {n} mL/min/1.73m2.",
+    "Advised low glycaemic index diet and {m} minutes of daily exercise.",
+    "LDL cholesterol {n} mg/dL, HDL {m} mg/dL, triglycerides {n} mg/dL.",
+    "No known drug allergies. Family history of type 2 diabetes.",
+]
+
+
+def _page_text(rng, lines_per_page):
+    return [
+        rng.choice(LINES).format(n=rng.randint(60, 240), m=rng.randint(2, 90), d=round(rng.uniform(0.5, 12), 1))
+        for _ in range(lines_per_page)
+    ]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path, pages=10, lines_per_page=40, seed=0):
+    """Write a text-only PDF with `pages` pages of clinical-style lines."""
+    rng = random.Random(seed)
+    objects = []  # object bodies, 1-based ids in order
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # placeholder, filled once kids are known
+    kids = []
+    for _ in range(pages):
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        for line in _page_text(rng, lines_per_page):
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref
+    )
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_bytes(bytes(out))
+    return str(path)
+
+
+LAB_TESTS = [
+    ("Hemoglobin", "g/dL", "13.5 - 17.5"),
+    ("HbA1c", "%", "4.0 - 5.6"),
+    ("Fasting glucose", "mg/dL", "70 - 99"),
+    ("Creatinine", "mg/dL", "0.7 - 1.3"),
+    ("eGFR", "mL/min/1.73m2", "> 90"),
+    ("LDL cholesterol", "mg/dL", "< 100"),
+    ("HDL cholesterol", "mg/dL", "> 40"),
+    ("Triglycerides", "mg/dL", "< 150"),
+    ("TSH", "mIU/L", "0.4 - 4.0"),
+    ("Potassium", "mmol/L", "3.5 - 5.1"),
+]
+MEDICATIONS = ["Metformin", "Atorvastatin", "Lisinopril", "Amlodipine", "Levothyroxine", "Aspirin"]
+SECTIONS = ["History of present illness", "Assessment and plan", "Clinical notes", "Follow-up"]
+
+
+def _wrap(text, width=110):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line + " ")
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + [line + " "]
+
+
+def report_page(rng):
+    """Text of one structured report page as pypdf extracts it: headings,
+    a lab table, a medication list and wrapped prose.
+
+    Returns (text, blocks): the lab table and the medication list, each
+    with its heading, which a chunker should keep in one chunk.
+    """
+    table = ["LABORATORY RESULTS", "Test   Result   Units   Reference range"]
+    for name, unit, reference in rng.choices(LAB_TESTS, k=rng.randint(6, 24)):
+        table.append(f"{name}   {round(rng.uniform(0.5, 180), 1)}   {unit}   {reference}")
+    medications = ["Medications:"]
+    for i, drug in enumerate(rng.sample(MEDICATIONS, rng.randint(2, 5)), start=1):
+        medications.append(f"{i}) {drug} {rng.choice([5, 10, 20, 500, 850])} mg {rng.choice(['once', 'twice'])} daily")
+    lines = table + [" "] + medications
+    for section in rng.sample(SECTIONS, 2):
+        lines += [" ", f"{section}:"]
+        prose = " ".join(
+            rng.choice(LINES).format(n=rng.randint(60, 240), m=rng.randint(2, 90), d=round(rng.uniform(0.5, 12), 1))
+            for _ in range(rng.randint(6, 14))
+        )
+        lines += _wrap(prose)
+    return "\n".join(lines), ["\n".join(table), "\n".join(medications)]
+
+
+def make_corpus(directory, files=8, pages=25, lines_per_page=40):
+    return [
+        make_pdf(Path(directory) / f"synthetic_{i}.pdf", pages=pages, lines_per_page=lines_per_page, seed=i)
+        for i in range(files)
+    ]
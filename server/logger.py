@@ -19,8 +19,3 @@ def setup_logger(name="MedicalAssistant"):
 
 
 logger=setup_logger()
-
-logger.info("RAG prcoess started")
-logger.debug("Bebugging")
-logger.error("Failed to load")
-logger.critical("Critical message")
\ No newline at end of file
@@ -1,14 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # ✅ Use package imports
+from server.middlewares.admission import admission_middleware
 from server.middlewares.exception_handlers import catch_exception_middleware
+from server.middlewares.metrics import metrics_middleware
+from server.modules.pdf_handlers import shutdown_parse_pool
+from server.modules.resilience import circuit_status
+from server.modules.resources import RESOURCE_WARMUP, resources
 from server.routes.upload_pdfs import router as upload_router
 from server.routes.ask_question import router as ask_router   # make sure file name is ask_questions.py
+from server.routes.jobs import router as jobs_router
+from server.routes.metrics import router as metrics_router
+
+# ----------------------------
+# Lifespan: shared resources (chain, embedder, vector store, ...) are built
+# once per process. By default they warm in the background so the port
+# opens immediately; a request that needs one sooner waits for it.
+# ----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.resources = resources
+    warm_up = None
+    if RESOURCE_WARMUP == "blocking":
+        await resources.warm_up()
+    elif RESOURCE_WARMUP == "background":
+        warm_up = asyncio.create_task(resources.warm_up())
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+    resources.close()
+    shutdown_parse_pool()
+
 
 app = FastAPI(
     title="Medical Assistant API",
-    description="API for AI Medical Assistant Chatbot"
+    description="API for AI Medical Assistant Chatbot",
+    lifespan=lifespan
 )
 
 # ----------------------------
@@ -25,6 +56,9 @@ app.add_middleware(
 # ----------------------------
 # Middleware
 # ----------------------------
+# Added first = innermost: shed requests still show up in the metrics
+app.middleware("http")(admission_middleware)
+app.middleware("http")(metrics_middleware)
 app.middleware("http")(catch_exception_middleware)
 
 # ----------------------------
@@ -32,3 +66,14 @@ app.middleware("http")(catch_exception_middleware)
 # ----------------------------
 app.include_router(upload_router)
 app.include_router(ask_router)
+app.include_router(jobs_router)
+app.include_router(metrics_router)
+
+
+# ----------------------------
+# Health: up as soon as the app serves; lists which resources are warm
+# and the state of the circuit breakers around Groq / HF / Pinecone
+# ----------------------------
+@app.get("/health")
+async def health():
+    return {"status": "ok", "resources": resources.status(), "circuits": circuit_status()}
@@ -0,0 +1,36 @@
+from fastapi import Request
+
+from server.middlewares.exception_handlers import error_response
+from server.modules.admission import RATE_LIMIT_ENABLED, Overloaded, client_identity, rate_limiter
+from server.modules.jobs import job_manager
+
+
+def client_id(request:Request)->str:
+    # Keyed on the peer address; X-Forwarded-For counts only from a trusted
+    # proxy and X-Client-Id only with the shared secret (see ClientIdentity)
+    peer=request.client.host if request.client else None
+    return client_identity.key(peer,request.headers)
+
+
+def traffic_kind(request:Request):
+    if request.method!="POST":
+        return None
+    if request.url.path.startswith("/ask"):
+        return "ask"
+    if request.url.path.startswith("/upload_pdfs"):
+        return "upload"
+    return None
+
+
+async def admission_middleware(request:Request,call_next):
+    # Shed before the body is read: uploads are parsed (and spooled to disk)
+    # before the route runs, so a full ingestion queue is checked here too
+    kind=traffic_kind(request)
+    try:
+        if kind is not None and RATE_LIMIT_ENABLED:
+            rate_limiter.check(client_id(request),kind)
+        if kind=="upload":
+            job_manager.check_capacity()
+    except Overloaded as exc:
+        return error_response(exc)
+    return await call_next(request)
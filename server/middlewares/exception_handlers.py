@@ -1,6 +1,35 @@
+import math
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from server.logger import logger
+from server.modules.admission import Overloaded
+from server.modules.resilience import CircuitOpenError, upstream_retry_after, upstream_status
+
+# Retry-After sent for an upstream 429 that did not say when to retry
+UPSTREAM_RETRY_AFTER_SECONDS=10
+
+
+def error_payload(exc:Exception):
+    """(status, body) for exc: 429 when we shed the request or Groq / HF /
+    Pinecone rate-limited us, 503 while a backend's circuit is open, else
+    500. 429 and 503 bodies carry retry_after (seconds)."""
+    if isinstance(exc,Overloaded):
+        status,retry_after,message=429,exc.retry_after,str(exc)
+    elif isinstance(exc,CircuitOpenError):
+        status,retry_after,message=503,exc.retry_after,str(exc)
+    elif upstream_status(exc)==429:
+        retry_after=upstream_retry_after(exc) or UPSTREAM_RETRY_AFTER_SECONDS
+        status,message=429,f"Upstream rate limit reached, please retry later ({exc})"
+    else:
+        return 500,{"error":str(exc)}
+    return status,{"error":message,"retry_after":max(1,math.ceil(retry_after))}
+
+
+def error_response(exc:Exception)->JSONResponse:
+    status,content=error_payload(exc)
+    headers={"Retry-After":str(content["retry_after"])} if "retry_after" in content else None
+    return JSONResponse(status_code=status,content=content,headers=headers)
 
 
 async def catch_exception_middleware(request:Request,call_next):
@@ -8,5 +37,4 @@ async def catch_exception_middleware(request:Request,call_next):
         return await call_next(request)
     except Exception as exc:
         logger.exception("UNHANDLED EXCEPTION")
-        return JSONResponse(status_code=500,content={"error":str(exc)})
-
+        return error_response(exc)
@@ -0,0 +1,38 @@
+import time
+
+from fastapi import Request
+
+from server.modules.metrics import (
+    SERVER_TIMING_ENABLED,
+    format_server_timing,
+    metrics,
+    request_timings,
+)
+
+
+async def metrics_middleware(request:Request,call_next):
+    # Stages timed while serving this request land in `timings`
+    timings={}
+    token=request_timings.set(timings)
+    start=time.perf_counter()
+    status=500
+    try:
+        response=await call_next(request)
+        status=response.status_code
+    finally:
+        elapsed=time.perf_counter()-start
+        request_timings.reset(token)
+        # Route template, not the raw path, keeps label cardinality bounded
+        route=request.scope.get("route")
+        metrics.observe(
+            "http_request_duration_seconds",
+            elapsed,
+            method=request.method,
+            route=getattr(route,"path","unmatched"),
+            status=str(status)
+        )
+
+    # Streaming responses send headers before their stages finish
+    if SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"]=format_server_timing(timings,elapsed)
+    return response
@@ -0,0 +1,220 @@
+import asyncio
+import hmac
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+from server.modules.metrics import observe_stage
+
+load_dotenv()
+
+# -------------------------
+# Query pool: questions answered at once per worker, and how many may wait
+# -------------------------
+ASK_MAX_CONCURRENCY = int(os.getenv("ASK_MAX_CONCURRENCY", "32"))
+ASK_MAX_QUEUE = int(os.getenv("ASK_MAX_QUEUE", "64"))
+# A question still waiting for a slot after this long is shed
+ASK_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ASK_QUEUE_TIMEOUT_SECONDS", "10"))
+# /ask/batch runs in its own, smaller pool so bulk jobs cannot take every slot
+ASK_BATCH_MAX_CONCURRENT = int(os.getenv("ASK_BATCH_MAX_CONCURRENT", "1"))
+ASK_BATCH_MAX_QUEUE = int(os.getenv("ASK_BATCH_MAX_QUEUE", "2"))
+
+# -------------------------
+# Per-client token buckets (requests per minute, burst)
+# -------------------------
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_ASK_PER_MINUTE = float(os.getenv("RATE_LIMIT_ASK_PER_MINUTE", "60"))
+RATE_LIMIT_ASK_BURST = float(os.getenv("RATE_LIMIT_ASK_BURST", "20"))
+RATE_LIMIT_UPLOAD_PER_MINUTE = float(os.getenv("RATE_LIMIT_UPLOAD_PER_MINUTE", "6"))
+RATE_LIMIT_UPLOAD_BURST = float(os.getenv("RATE_LIMIT_UPLOAD_BURST", "3"))
+# Buckets kept in memory; the least recently seen client is forgotten beyond this
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Who may say which client a request is for. Requests are keyed on the peer
+# address; X-Forwarded-For is used only when the peer is one of these proxies
+# (IPs or CIDRs), X-Client-Id only with this secret in X-Client-Secret (a
+# proxy passes client-written headers through). Empty = trust no header.
+RATE_LIMIT_TRUSTED_PROXIES = [p.strip() for p in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if p.strip()]
+RATE_LIMIT_CLIENT_SECRET = os.getenv("RATE_LIMIT_CLIENT_SECRET", "")
+
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class Overloaded(Exception):
+    """Request shed before any work was done; the client should retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(retry_after)))
+
+
+# -------------------------
+# Rate limiting
+# -------------------------
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate            # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend one token: 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientIdentity:
+    """Works out the rate-limit key of a request without trusting the caller.
+
+    Client-supplied headers are only believed from a trusted proxy or with
+    the shared secret; a client could otherwise send a fresh id with every
+    request and never run out of tokens.
+    """
+
+    def __init__(self, trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES, secret=RATE_LIMIT_CLIENT_SECRET):
+        self.trusted_networks = [ipaddress.ip_network(p, strict=False) for p in trusted_proxies]
+        self.secret = secret
+
+    def is_trusted_proxy(self, host) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_networks)
+
+    def key(self, peer, headers) -> str:
+        peer = peer or "unknown"
+        if self.secret and hmac.compare_digest(headers.get("x-client-secret", "").encode(), self.secret.encode()):
+            explicit = headers.get("x-client-id", "").strip()
+            if explicit:
+                return "id:" + explicit[:64]
+        if self.is_trusted_proxy(peer):
+            # Walk X-Forwarded-For from the right: the first hop not added by
+            # one of our proxies is the client (the left end is caller-written)
+            for hop in reversed(headers.get("x-forwarded-for", "").split(",")):
+                hop = hop.strip()
+                if hop and not self.is_trusted_proxy(hop):
+                    return hop
+        return peer
+
+
+class RateLimiter:
+    """One token bucket per (client, traffic class), evicted LRU."""
+
+    def __init__(self, limits, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.limits = limits        # traffic class -> (per minute, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "limited": 0}
+
+    def check(self, client: str, kind: str):
+        """Raise Overloaded if `client` is over its `kind` rate."""
+        per_minute, burst = self.limits[kind]
+        key = (client, kind)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(per_minute / 60, burst)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            wait = bucket.take()
+            self._stats["limited" if wait else "allowed"] += 1
+        if wait:
+            raise Overloaded(f"Rate limit exceeded for {kind} requests", wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "clients": len(self._buckets)}
+
+
+# -------------------------
+# Concurrency pools with bounded queues
+# -------------------------
+class AdmissionPool:
+    """At most max_concurrency requests run; at most max_queue wait.
+
+    A request arriving to a full queue, or still queued after
+    queue_timeout, is shed with Overloaded instead of piling up until the
+    client times out. Retry-After is estimated from the queue length and
+    the recent service time. Queue wait is recorded as the "queue" stage.
+    """
+
+    def __init__(self, name, max_concurrency, max_queue, queue_timeout=ASK_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self._service_time = 1.0    # EWMA of seconds a request holds its slot
+        self._stats = {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0}
+
+    def retry_after(self) -> float:
+        return self._service_time * (self.waiting + 1) / self.max_concurrency
+
+    def check(self):
+        """Raise Overloaded if a request arriving now would be shed at once."""
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self._stats["shed_queue_full"] += 1
+            raise Overloaded(f"Too many {self.name} requests in progress", self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            if self._slots.locked():
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            else:
+                await self._slots.acquire()     # free slot: no timer task needed
+        except asyncio.TimeoutError:
+            self._stats["shed_timeout"] += 1
+            raise Overloaded(f"Timed out waiting for a {self.name} slot", self.retry_after()) from None
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        observe_stage(self.name, "queue", started - queued_at)
+        self.active += 1
+        self._stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+            self._service_time += 0.2 * (time.perf_counter() - started - self._service_time)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+query_pool = AdmissionPool("ask", ASK_MAX_CONCURRENCY, ASK_MAX_QUEUE)
+batch_pool = AdmissionPool("ask_batch", ASK_BATCH_MAX_CONCURRENT, ASK_BATCH_MAX_QUEUE)
+client_identity = ClientIdentity()
+rate_limiter = RateLimiter({
+    "ask": (RATE_LIMIT_ASK_PER_MINUTE, RATE_LIMIT_ASK_BURST),
+    "upload": (RATE_LIMIT_UPLOAD_PER_MINUTE, RATE_LIMIT_UPLOAD_BURST),
+})
@@ -0,0 +1,177 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from server.modules.vectors import unit_vector
+
+load_dotenv()
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Cosine similarity above which two questions are treated as the same question
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    # "What is my Hemoglobin level?" -> "what is my hemoglobin level"
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+class _Entry:
+    __slots__ = ("result", "embedding", "namespace", "expires_at")
+
+    def __init__(self, result, embedding, namespace, expires_at):
+        self.result = result
+        self.embedding = embedding
+        self.namespace = namespace
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """In-process answer cache in front of retrieval + LLM.
+
+    Lookup is exact on the normalized question first, then by cosine
+    similarity of the query embedding against cached questions. Both only
+    see entries of the same scope (tenant namespace + metadata filter), so
+    one tenant is never served another's answer. Entries
+    are evicted LRU when full, expire after a TTL, and are dropped when
+    any document is ingested into their namespace: a new document can
+    answer what an older one could not ("no relevant information").
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Stacked unit embeddings of live entries, rebuilt lazily after changes
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_scopes = None
+
+        self._stats = {
+            "hits_exact": 0,
+            "hits_semantic": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    # -------------------------
+    # Lookup
+    # -------------------------
+    def get_exact(self, question: str, scope: str = ""):
+        key = (scope, normalize_question(question))
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits_exact"] += 1
+            return entry.result
+
+    def get_similar(self, embedding, scope: str = ""):
+        """Best live cached answer whose question embedding is close enough, else None.
+
+        Counts a miss when nothing qualifies, so call it after get_exact.
+        """
+        query = unit_vector(embedding)
+        with self._lock:
+            matrix, keys = self._similarity_matrix()
+            if matrix is not None:
+                scores = matrix @ query
+                scores[self._matrix_scopes != scope] = -np.inf
+                # Best first; an expired entry is dropped and the next one tried
+                candidates = np.flatnonzero(scores >= self.similarity_threshold)
+                for i in candidates[np.argsort(-scores[candidates])].tolist():
+                    entry = self._live_entry(keys[i])
+                    if entry is not None:
+                        self._entries.move_to_end(keys[i])
+                        self._stats["hits_semantic"] += 1
+                        return entry.result
+
+            self._stats["misses"] += 1
+            return None
+
+    # -------------------------
+    # Update
+    # -------------------------
+    def put(self, question: str, embedding, result, scope: str = "", namespace: str = ""):
+        key = (scope, normalize_question(question))
+        entry = _Entry(
+            result=result,
+            embedding=unit_vector(embedding),
+            namespace=namespace,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+            self._matrix = None
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """Drop every answer given in `namespace`, whatever its filter or sources."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.namespace == namespace]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._matrix = None
+                self._stats["invalidations"] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits_exact"] + self._stats["hits_semantic"] + self._stats["misses"]
+            hits = lookups - self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # -------------------------
+    # Internals (call with lock held)
+    # -------------------------
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            self._matrix = None
+            self._stats["expirations"] += 1
+            return None
+        return entry
+
+    def _similarity_matrix(self):
+        if self._matrix is None and self._entries:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[k].embedding for k in self._matrix_keys])
+            self._matrix_scopes = np.array([scope for scope, _ in self._matrix_keys], dtype=object)
+        return self._matrix, self._matrix_keys
+
+
+# Process-wide cache shared by /ask/ and load_vectorstore (for invalidation)
+answer_cache = AnswerCache()
@@ -0,0 +1,327 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+from dotenv import load_dotenv
+
+from server.modules.prefilter import MetadataColumns
+
+load_dotenv()
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "./cache/bm25")
+# save() compacts the index once this share of its documents are tombstones
+BM25_COMPACT_RATIO = float(os.getenv("BM25_COMPACT_RATIO", "0.25"))
+
+# Keeps dosages, lab codes and decimals intact: "500mg", "hba1c", "5.6", "co-amoxiclav"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Incremental inverted index with BM25 (Okapi) scoring.
+
+    Postings are array-backed and kept per namespace: per (namespace, term),
+    a uint32 array of doc numbers and a uint16 array of term frequencies,
+    appended to as documents are added (doc numbers only grow, so postings
+    stay sorted). A query only reads its own namespace's postings, and
+    IDF / average length are per-namespace statistics, so tenants neither
+    slow down nor skew each other. Metadata filters are applied to the
+    matching docs through a prefilter.MetadataColumns index before scoring.
+    Deleted (and replaced) documents are tombstoned: skipped at query time
+    and left out of document frequencies. Once tombstones pass
+    compact_ratio of the documents, save() compacts the index, dropping
+    them from the postings and renumbering the live documents.
+
+    On disk: postings.npz holds the lexicon ("namespace\tterm"),
+    concatenated postings and each doc's row key; docs.sqlite3 holds the
+    vector id, namespace and metadata per row key (stable across
+    compactions), read only for the documents that are returned.
+    """
+
+    def __init__(self, directory=BM25_INDEX_DIR, k1=1.5, b=0.75, compact_ratio=BM25_COMPACT_RATIO):
+        os.makedirs(directory, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self._directory = directory
+        self._lock = threading.RLock()
+
+        self._postings = {}                 # namespace -> term -> (array("I") docs, array("H") tfs)
+        self._lengths = array("I")          # doc -> token count
+        self._alive = array("b")            # doc -> 1 / 0 (tombstone)
+        self._keys = array("q")             # doc -> row key in docs.sqlite3
+        self._next_key = 0
+        self._dead = 0                      # tombstoned docs
+        self._columns = MetadataColumns()   # doc -> namespace / source / page / doc type
+        self._doc_of = {}                   # (namespace, vector id) -> doc
+        self._stats = {}                    # namespace -> [total length, alive docs]
+
+        self._db = sqlite3.connect(os.path.join(directory, "docs.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY,
+                vector_id TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+        """)
+        self._pending_docs = {}             # row key -> (row key, vector id, namespace, metadata json)
+        self._deleted_keys = []
+        self._load()
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def _load(self):
+        path = os.path.join(self._directory, "postings.npz")
+        if not os.path.exists(path):
+            return
+        data = np.load(path, allow_pickle=False)
+        terms = data["terms"].tolist()
+        offsets = data["offsets"]
+        docs, tfs = data["docs"], data["tfs"]
+        self._lengths = array("I", data["lengths"].tobytes())
+        self._alive = array("b", data["alive"].astype(np.int8).tobytes())
+        self._keys = array("q", data["keys"].astype(np.int64).tobytes())
+        self._dead = len(self._alive) - int(data["alive"].sum())
+
+        for i, key in enumerate(terms):
+            start, end = offsets[i], offsets[i + 1]
+            namespace, term = key.split("\t", 1)
+            self._postings.setdefault(namespace, {})[term] = (
+                array("I", docs[start:end].tobytes()), array("H", tfs[start:end].tobytes())
+            )
+
+        doc_of_key = {key: doc for doc, key in enumerate(self._keys)}
+        self._next_key = max(self._keys, default=-1) + 1
+        for key, vid, namespace, source, page, doc_type in self._db.execute(
+            "SELECT doc, vector_id, namespace, json_extract(metadata, '$.source'), "
+            "json_extract(metadata, '$.page'), json_extract(metadata, '$.doc_type') FROM docs"
+        ):
+            self._next_key = max(self._next_key, key + 1)
+            doc = doc_of_key.get(key)
+            if doc is not None and self._alive[doc]:
+                self._doc_of[(namespace, vid)] = doc
+                self._columns.set(doc, namespace, {"source": source, "page": page, "doc_type": doc_type})
+                stats = self._stats.setdefault(namespace, [0, 0])
+                stats[0] += self._lengths[doc]
+                stats[1] += 1
+
+    def save(self):
+        """Write postings atomically, then the doc rows added/deleted since the last save.
+
+        Compacts first if tombstones have passed compact_ratio.
+        """
+        with self._lock:
+            if self._dead and self._dead >= self.compact_ratio * len(self._alive):
+                self.compact()
+            postings = [
+                (f"{namespace}\t{term}", entry)
+                for namespace, lexicon in self._postings.items()
+                for term, entry in lexicon.items()
+            ]
+            offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+            for i, (_, entry) in enumerate(postings):
+                offsets[i + 1] = offsets[i] + len(entry[0])
+            docs = np.frombuffer(b"".join(entry[0].tobytes() for _, entry in postings), dtype=np.uint32)
+            tfs = np.frombuffer(b"".join(entry[1].tobytes() for _, entry in postings), dtype=np.uint16)
+
+            tmp = os.path.join(self._directory, "postings.tmp.npz")
+            np.savez(
+                tmp,
+                terms=np.array([key for key, _ in postings], dtype=str),
+                offsets=offsets,
+                docs=docs,
+                tfs=tfs,
+                lengths=np.frombuffer(self._lengths.tobytes(), dtype=np.uint32),
+                alive=np.frombuffer(self._alive.tobytes(), dtype=np.int8).astype(bool),
+                keys=np.frombuffer(self._keys.tobytes(), dtype=np.int64),
+            )
+            os.replace(tmp, os.path.join(self._directory, "postings.npz"))
+
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO docs (doc, vector_id, namespace, metadata) VALUES (?, ?, ?, ?)",
+                    list(self._pending_docs.values())
+                )
+                self._db.executemany("DELETE FROM docs WHERE doc = ?", [(k,) for k in self._deleted_keys])
+            self._pending_docs = {}
+            self._deleted_keys = []
+
+    def compact(self):
+        """Drop tombstoned docs from the postings and renumber the live ones
+        densely (order is kept, so postings stay sorted). Row keys do not
+        change, so docs.sqlite3 is left as it is."""
+        with self._lock:
+            alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+            live = np.flatnonzero(alive)
+            renumber = np.full(len(alive), -1, dtype=np.int64)
+            renumber[live] = np.arange(len(live))
+
+            for lexicon in self._postings.values():
+                for term, (docs, tfs) in list(lexicon.items()):
+                    docs = np.frombuffer(docs, dtype=np.uint32)
+                    keep = alive[docs]
+                    if not keep.any():
+                        del lexicon[term]
+                        continue
+                    lexicon[term] = (
+                        array("I", renumber[docs[keep]].astype(np.uint32).tobytes()),
+                        array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+                    )
+
+            self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[live].tobytes())
+            self._keys = array("q", np.frombuffer(self._keys, dtype=np.int64)[live].tobytes())
+            self._alive = array("b", bytes([1]) * len(live))
+            self._columns = self._columns.take(live)
+            self._doc_of = {entry: int(renumber[doc]) for entry, doc in self._doc_of.items()}
+            self._dead = 0
+
+    # -------------------------
+    # Updates
+    # -------------------------
+    def add(self, documents, namespace=""):
+        """Index (vector_id, text, metadata) triples; re-adding an id replaces it."""
+        with self._lock:
+            lexicon = self._postings.setdefault(namespace, {})
+            stats = self._stats.setdefault(namespace, [0, 0])
+            for vid, text, metadata in documents:
+                self._delete_one(namespace, vid)
+
+                doc = len(self._lengths)
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    postings = lexicon.get(term)
+                    if postings is None:
+                        postings = lexicon[term] = (array("I"), array("H"))
+                    postings[0].append(doc)
+                    postings[1].append(min(tf, 65535))
+
+                length = sum(counts.values())
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._columns.set(doc, namespace, metadata)
+                self._doc_of[(namespace, vid)] = doc
+                self._keys.append(self._next_key)
+                self._pending_docs[self._next_key] = (self._next_key, vid, namespace, json.dumps(metadata or {}))
+                self._next_key += 1
+                stats[0] += length
+                stats[1] += 1
+
+    def contains(self, vid, namespace=""):
+        with self._lock:
+            return (namespace, vid) in self._doc_of
+
+    def delete(self, ids, namespace=""):
+        with self._lock:
+            for vid in ids:
+                self._delete_one(namespace, vid)
+
+    def _delete_one(self, namespace, vid):
+        doc = self._doc_of.pop((namespace, vid), None)
+        if doc is None:
+            return
+        self._alive[doc] = 0
+        self._dead += 1
+        self._columns.remove(doc)
+        stats = self._stats[namespace]
+        stats[0] -= self._lengths[doc]
+        stats[1] -= 1
+        self._deleted_keys.append(self._keys[doc])
+
+    # -------------------------
+    # Search
+    # -------------------------
+    def query(self, text, top_k, namespace="", metadata_filter=None):
+        """BM25 top_k within `namespace` and `metadata_filter`, as
+        Pinecone-shaped {"matches": [{"id", "score", "metadata"}]}.
+        """
+        terms = set(tokenize(text))
+        with self._lock:
+            lexicon = self._postings.get(namespace)
+            total_length, alive_count = self._stats.get(namespace, (0, 0))
+            if lexicon is None or not alive_count or not terms:
+                return {"matches": []}
+            avg_length = total_length / alive_count
+
+            # Only the postings of this namespace's query terms are touched,
+            # so the cost follows the tenant's size, not the whole corpus
+            doc_parts, weight_parts = [], []
+            # Zero-copy views, dropped while the lock is held so add() can grow the arrays
+            all_lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            all_alive = np.frombuffer(self._alive, dtype=np.int8)
+            for term in terms:
+                postings = lexicon.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0].tobytes(), dtype=np.uint32)
+                tfs = np.frombuffer(postings[1].tobytes(), dtype=np.uint16).astype(np.float32)
+                # Tombstones count neither towards df nor the score
+                live = all_alive[docs].astype(bool)
+                docs, tfs = docs[live], tfs[live]
+                df = len(docs)
+                if not df:
+                    continue
+                idf = math.log(1 + (alive_count - df + 0.5) / (df + 0.5))
+                lengths = all_lengths[docs].astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+                doc_parts.append(docs)
+                weight_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            del all_lengths, all_alive
+            if not doc_parts:
+                return {"matches": []}
+
+            docs = np.concatenate(doc_parts).astype(np.int64)
+            weights = np.concatenate(weight_parts)
+            # Docs failing the filter are masked out here
+            keep = self._columns.match(docs, namespace, metadata_filter)
+            docs, weights = docs[keep], weights[keep]
+            if not len(docs):
+                return {"matches": []}
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights).astype(np.float32)
+
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            best_scores = scores[top].tolist()
+            top = candidates[top].tolist()
+            stored = self._fetch_docs(top)
+
+        return {
+            "matches": [
+                {"id": stored[doc][0], "score": score, "metadata": json.loads(stored[doc][1])}
+                for doc, score in zip(top, best_scores)
+                if doc in stored
+            ]
+        }
+
+    def _fetch_docs(self, docs):
+        doc_of_key = {self._keys[doc]: doc for doc in docs}
+        # Docs added since the last save() are not in SQLite yet
+        pending = {
+            doc_of_key[key]: (self._pending_docs[key][1], self._pending_docs[key][3])
+            for key in doc_of_key if key in self._pending_docs
+        }
+        rows = self._db.execute(
+            f"SELECT doc, vector_id, metadata FROM docs WHERE doc IN ({','.join('?' * len(doc_of_key))})",
+            list(doc_of_key)
+        ).fetchall()
+        return {**{doc_of_key[key]: (vid, metadata) for key, vid, metadata in rows}, **pending}
+
+
+@lru_cache(maxsize=None)
+def get_bm25_index() -> BM25Index:
+    """Process-wide BM25 index at BM25_INDEX_DIR, loaded on first use."""
+    return BM25Index()
@@ -0,0 +1,288 @@
+import os
+import re
+from typing import Iterator, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "structured" (layout- and token-aware, below) or "recursive" (the
+# previous 700/120-character RecursiveCharacterTextSplitter)
+CHUNKER = os.getenv("CHUNKER", "structured").lower()
+# Chunk size and sentence overlap, in tokens of the answering model
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "384"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+# A new heading only closes the current chunk once it holds this many tokens
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "192"))
+# Split pages inside the PDF parse worker processes, right after extraction
+CHUNK_IN_WORKERS = os.getenv("CHUNK_IN_WORKERS", "true").lower() == "true"
+
+# "- item", "• item", "1) item", "2. item", "(a) item"
+_LIST_RE = re.compile(r"^(?:[-*•▪◦‣●○–]|\(?\d{1,2}[.)]|\(?[a-zA-Z][.)])\s+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+# Column gaps as pypdf renders them: tabs, pipes or runs of spaces
+_CELL_GAP_RE = re.compile(r"\t|\s\|\s|\S {3,}\S")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])")
+
+
+class Chunk(NamedTuple):
+    """One chunk of a page.
+
+    text is a contiguous slice of the page starting at start_index (so the
+    context builder can merge neighbours); prefix is extra context for the
+    embedding only: the section heading and, for a table continued from an
+    earlier chunk, its header row.
+    """
+    text: str
+    start_index: int
+    tokens: int
+    section: Optional[str] = None
+    prefix: str = ""
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    kind: str       # heading | row | item | sentence
+
+
+class _Block(NamedTuple):
+    kind: str       # heading | table | list | paragraph
+    spans: list     # [start, end] per row / item, or the paragraph span
+
+
+# -------------------------
+# Layout: lines -> blocks
+# -------------------------
+def _lines(text):
+    """(start, end) of each stripped line, None for blank lines."""
+    offset = 0
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped:
+            start = offset + len(line) - len(line.lstrip())
+            yield start, start + len(stripped)
+        else:
+            yield None
+        offset += len(line) + 1
+
+
+def _is_heading(line: str) -> bool:
+    if len(line) > 80 or len(line.split()) > 10 or line[-1] in ".,;":
+        return False
+    first = next((c for c in line if c.isalpha()), "")
+    return first.isupper()
+
+
+def _is_table_row(line: str) -> bool:
+    if _CELL_GAP_RE.search(line) and len(line.split()) > 1:
+        return True
+    # Lab-style rows: a label followed by values, units and ranges
+    return (
+        line[0].isalpha() and not line.endswith(".")
+        and len(line.split()) <= 12 and len(_NUMBER_RE.findall(line)) >= 2
+    )
+
+
+def _blocks(text) -> List[_Block]:
+    """Group the page's lines into headings, tables, lists and paragraphs.
+
+    Table rows and plain headings are only recognised after a break (blank
+    line, end of sentence, heading or another row), so short wrapped lines
+    of a paragraph are not mistaken for them; a heading ending in ":" or in
+    capitals is recognised anywhere. Other unmarked lines following a list
+    item continue that item.
+    """
+    blocks, current, after_break = [], None, True
+    for span in _lines(text):
+        if span is None:
+            current, after_break = None, True
+            continue
+        start, end = span
+        line = text[start:end]
+
+        if _LIST_RE.match(line):
+            if current is None or current.kind != "list":
+                current = _Block("list", [])
+                blocks.append(current)
+            current.spans.append([start, end])
+        elif after_break and _is_table_row(line):
+            if current is None or current.kind != "table":
+                current = _Block("table", [])
+                blocks.append(current)
+            current.spans.append([start, end])
+        elif _is_heading(line) and (after_break or line[-1] == ":" or line.isupper()):
+            blocks.append(_Block("heading", [[start, end]]))
+            current = None
+        elif current is not None and current.kind in ("list", "paragraph"):
+            current.spans[-1][1] = end
+        else:
+            current = _Block("paragraph", [[start, end]])
+            blocks.append(current)
+
+        kind = blocks[-1].kind
+        after_break = kind in ("heading", "table") or line[-1] in ".!?:"
+    return blocks
+
+
+def _sentences(text, start, end):
+    position = start
+    for match in _SENTENCE_END_RE.finditer(text, start, end):
+        yield position, match.start()
+        position = match.end()
+    yield position, end
+
+
+# -------------------------
+# Packing: units -> chunks
+# -------------------------
+class _Packer:
+    def __init__(self, text, tokenizer, max_tokens, overlap_tokens, min_tokens):
+        self.text = text
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.units = []
+        self.tokens = 0
+        self.fresh = 0              # tokens not carried over from the previous chunk
+        self.section = None         # text of the heading in force
+        self.chunk_section = None
+        self.table_header = None    # (start, end) of the first row of the table in force
+        self.chunk_header = None
+        self.done = []
+
+    def unit(self, start, end, kind):
+        return _Unit(start, end, self.tokenizer.count(self.text[start:end]), kind)
+
+    def add(self, unit):
+        if unit.tokens > self.max_tokens:
+            self.flush()
+            self._add_windows(unit)
+            return
+        if self.tokens + unit.tokens > self.max_tokens and self.fresh:
+            self.flush(carry=True)
+        if not self.units:
+            self.chunk_section, self.chunk_header = self.section, self.table_header
+        self.units.append(unit)
+        self.tokens += unit.tokens
+        self.fresh += unit.tokens
+
+    def keep_together(self, tokens):
+        """Start a new chunk if a block of `tokens` fits in one but not in this one."""
+        if tokens <= self.max_tokens < self.tokens + tokens and self.fresh >= self.min_tokens:
+            self.flush()
+
+    def flush(self, carry=False):
+        """Emit the pending chunk. With carry, trailing sentences (overlap)
+        or a dangling heading start the next one."""
+        if not self.fresh:
+            return
+        kept = []
+        if carry and len(self.units) > 1 and self.units[-1].kind == "heading":
+            kept = [self.units.pop()]
+        elif carry:
+            budget = self.overlap_tokens
+            for unit in reversed(self.units[1:]):
+                if unit.kind != "sentence" or unit.tokens > budget:
+                    break
+                kept.insert(0, unit)
+                budget -= unit.tokens
+        self._emit(self.units)
+
+        self.units = kept
+        self.tokens = sum(u.tokens for u in kept)
+        self.fresh = self.tokens if kept and kept[0].kind == "heading" else 0
+        self.chunk_section, self.chunk_header = self.section, self.table_header
+
+    def _emit(self, units):
+        first, last = units[0], units[-1]
+        prefix = []
+        if self.chunk_section and first.kind != "heading":
+            prefix.append(self.chunk_section)
+        if first.kind == "row" and self.chunk_header and self.chunk_header[0] != first.start:
+            prefix.append(self.text[self.chunk_header[0]:self.chunk_header[1]])
+        self.done.append(Chunk(
+            text=self.text[first.start:last.end],
+            start_index=first.start,
+            tokens=sum(u.tokens for u in units),
+            section=self.chunk_section if first.kind != "heading" else self.text[first.start:first.end],
+            prefix="".join(f"{p}\n" for p in prefix),
+        ))
+
+    def _add_windows(self, unit):
+        # A single sentence/row longer than a chunk: cut it into token windows
+        position = unit.start
+        while position < unit.end:
+            piece = self.tokenizer.truncate(self.text[position:unit.end], self.max_tokens) or \
+                self.text[position:unit.end]
+            end = position + len(piece)
+            self.chunk_section, self.chunk_header = self.section, None
+            self._emit([_Unit(position, end, self.tokenizer.count(piece), unit.kind)])
+            position = end
+            while position < unit.end and self.text[position].isspace():
+                position += 1
+
+
+def split_text(text: str, tokenizer=None, max_tokens=CHUNK_MAX_TOKENS,
+               overlap_tokens=CHUNK_OVERLAP_TOKENS, min_tokens=CHUNK_MIN_TOKENS) -> Iterator[Chunk]:
+    """Split one page of extracted text into token-bounded, layout-aware chunks.
+
+    Chunks end at block boundaries where possible: a heading starts a new
+    chunk (once the current one holds min_tokens) and is never left
+    dangling at the end of one; tables and lists that fit in a chunk are
+    kept whole, and are otherwise split only between rows / items; prose
+    is split between sentences, with up to overlap_tokens of trailing
+    sentences repeated. Sizes are counted with the answering model's
+    tokenizer (see tokenizer.py).
+    """
+    if tokenizer is None:
+        from server.modules.tokenizer import get_tokenizer
+        tokenizer = get_tokenizer()
+    packer = _Packer(text, tokenizer, max_tokens, overlap_tokens, min_tokens)
+
+    for block in _blocks(text):
+        if block.kind == "heading":
+            start, end = block.spans[0]
+            if packer.fresh >= min_tokens:
+                packer.flush()
+            packer.section = text[start:end]
+            packer.add(packer.unit(start, end, "heading"))
+            continue
+
+        if block.kind == "paragraph":
+            units = [packer.unit(s, e, "sentence") for s, e in _sentences(text, *block.spans[0])]
+        else:
+            kind = "row" if block.kind == "table" else "item"
+            units = [packer.unit(s, e, kind) for s, e in block.spans]
+            packer.keep_together(sum(u.tokens for u in units))
+
+        packer.table_header = block.spans[0] if block.kind == "table" else None
+        for unit in units:
+            if unit.kind == "item" and unit.tokens > max_tokens:
+                # Long list item: fall back to its sentences
+                for s, e in _sentences(text, unit.start, unit.end):
+                    packer.add(packer.unit(s, e, "sentence"))
+            else:
+                packer.add(unit)
+
+        yield from packer.done
+        packer.done = []
+
+    packer.flush()
+    yield from packer.done
+
+
+def split_pages(texts: List[str], tokenizer=None) -> List[List[Chunk]]:
+    """Chunks of each page; runs in the parse worker processes."""
+    return [list(split_text(text, tokenizer)) for text in texts]
+
+
+def chunker_version(tokenizer_name: str) -> str:
+    """Tag stored with each ingested file, so changing the chunker
+    configuration or the tokenizer its sizes are counted with re-chunks
+    files when they are uploaded again."""
+    if CHUNKER != "structured":
+        return ""
+    return f"structured-{CHUNK_MAX_TOKENS}-{CHUNK_OVERLAP_TOKENS}-{CHUNK_MIN_TOKENS}-{tokenizer_name}"
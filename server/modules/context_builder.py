@@ -0,0 +1,145 @@
+import os
+import re
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from server.modules.resources import resources
+
+load_dotenv()
+
+# Max tokens of retrieved context put into the prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Word-shingle Jaccard similarity above which a chunk is a near-duplicate
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.85"))
+# Shortest suffix/prefix overlap (chars) treated as splitter overlap
+MIN_OVERLAP_CHARS = 20
+
+SEPARATOR = "\n\n"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# -------------------------
+# Merging
+# -------------------------
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    for size in range(min(len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_pair(a, b):
+    """Merge two chunks of the same page if they overlap or touch, else None.
+
+    Chunks carry `start_index` when ingested with it; older ones are
+    merged on text overlap alone.
+    """
+    if a["start"] is not None and b["start"] is not None:
+        first, second = (a, b) if a["start"] <= b["start"] else (b, a)
+        first_end = first["start"] + len(first["text"])
+        # Splitter drops the whitespace between chunks, so allow a small gap
+        if second["start"] > first_end + 2:
+            return None
+        if second["start"] + len(second["text"]) <= first_end:
+            text = first["text"]
+        else:
+            overlap = first_end - second["start"]
+            text = first["text"] + (second["text"][overlap:] if overlap > 0 else " " + second["text"])
+        return {**first, "text": text, "rank": min(a["rank"], b["rank"])}
+
+    for first, second in ((a, b), (b, a)):
+        if second["text"] in first["text"]:
+            return {**first, "rank": min(a["rank"], b["rank"])}
+        overlap = _text_overlap(first["text"], second["text"])
+        if overlap:
+            return {**first, "text": first["text"] + second["text"][overlap:], "rank": min(a["rank"], b["rank"])}
+    return None
+
+
+def merge_chunks(docs):
+    """Collapse overlapping/adjacent chunks of the same source and page.
+
+    Each merged chunk keeps the best (lowest) retrieval rank of its parts.
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        chunk = {"text": doc.page_content, "start": doc.metadata.get("start_index"),
+                 "rank": rank, "metadata": doc.metadata}
+        group = groups.setdefault(key, [])
+
+        merged = True
+        while merged:
+            merged = False
+            for i, other in enumerate(group):
+                combined = _merge_pair(other, chunk)
+                if combined is not None:
+                    chunk = combined
+                    group.pop(i)
+                    merged = True
+                    break
+        group.append(chunk)
+
+    return sorted((c for group in groups.values() for c in group), key=lambda c: c["rank"])
+
+
+# -------------------------
+# Near-duplicate removal
+# -------------------------
+def _shingles(text, size=3):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(chunks, threshold=CONTEXT_DEDUP_THRESHOLD):
+    """Keep the best-ranked chunk of each group of near-identical texts
+    (e.g. the same boilerplate on every page or in two uploaded copies)."""
+    kept, kept_shingles = [], []
+    for chunk in chunks:
+        shingles = _shingles(chunk["text"])
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(chunk)
+        kept_shingles.append(shingles)
+    return kept
+
+
+# -------------------------
+# Packing
+# -------------------------
+def build_context(docs, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Turn retrieved docs (best first) into the documents sent to the LLM.
+
+    Overlapping chunks are merged, near-duplicates dropped, and chunks are
+    packed in relevance order until `token_budget` tokens (counted with the
+    model's tokenizer) are used. A chunk that does not fit is skipped so a
+    smaller, less relevant one can still be packed; if not even the best
+    chunk fits, it is truncated to the budget.
+    """
+    if not docs:
+        return []
+
+    tokenizer = resources.get("tokenizer")
+    chunks = drop_near_duplicates(merge_chunks(docs))
+    separator_tokens = tokenizer.count(SEPARATOR)
+
+    packed, used = [], 0
+    for chunk in chunks:
+        tokens = tokenizer.count(chunk["text"]) + (separator_tokens if packed else 0)
+        if used + tokens <= token_budget:
+            packed.append(chunk)
+            used += tokens
+
+    if not packed:
+        best = chunks[0]
+        packed = [{**best, "text": tokenizer.truncate(best["text"], token_budget)}]
+
+    return [
+        Document(page_content=chunk["text"], metadata={**chunk["metadata"], "text": chunk["text"]})
+        for chunk in packed
+    ]
@@ -0,0 +1,71 @@
+import os
+from functools import lru_cache
+from typing import List
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+from server.modules.resilience import hf_breaker
+
+load_dotenv()
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+# "hf_endpoint" (HF Inference API, default) or "local" (sentence-transformers on CPU)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "hf_endpoint").lower()
+
+
+@lru_cache(maxsize=None)
+def get_embedder():
+    """Process-wide embedder shared by /ask/ and load_vectorstore.
+
+    BGE-M3 (1024-dim), either via the HF Endpoint API (token read from the
+    HUGGINGFACEHUB_API_TOKEN environment variable) or in-process on CPU
+    when EMBEDDINGS_BACKEND=local.
+    """
+    from server.modules.embedding_cache import (
+        EMBEDDING_CACHE_ENABLED,
+        CachedEmbeddings,
+        EmbeddingCache,
+    )
+
+    if EMBEDDINGS_BACKEND == "local":
+        from server.modules.local_embeddings import LOCAL_EMBEDDING_RUNTIME, LocalEmbeddings
+
+        embedder = LocalEmbeddings(EMBEDDING_MODEL)
+        # Local (and quantized) vectors differ slightly from the endpoint's,
+        # so they get their own cache keys
+        cache_model = f"{EMBEDDING_MODEL}@local-{LOCAL_EMBEDDING_RUNTIME}"
+    else:
+        from langchain_huggingface import HuggingFaceEndpointEmbeddings
+
+        embedder = BreakerEmbeddings(HuggingFaceEndpointEmbeddings(model=EMBEDDING_MODEL))
+        cache_model = EMBEDDING_MODEL
+
+    if EMBEDDING_CACHE_ENABLED:
+        embedder = CachedEmbeddings(embedder, cache_model, EmbeddingCache())
+
+    return embedder
+
+
+class BreakerEmbeddings(Embeddings):
+    """Calls the HF endpoint through its circuit breaker (resilience.py).
+
+    Sits under the embedding cache, so cached texts are served even while
+    the circuit is open.
+    """
+
+    def __init__(self, embedder: Embeddings, breaker=hf_breaker):
+        self.embedder = embedder
+        self.breaker = breaker
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.breaker.call(self.embedder.embed_documents, texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.breaker.call(self.embedder.embed_query, text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.breaker.acall(self.embedder.aembed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.breaker.acall(self.embedder.aembed_query, text)
@@ -0,0 +1,326 @@
+import os
+import re
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from server.logger import logger
+from server.modules.metrics import metrics
+
+load_dotenv()
+
+# Answer direct lookups ("what was my HbA1c", "dose of metformin") from the
+# retrieved chunks without calling the LLM, when confident enough
+EXTRACTIVE_ENABLED = os.getenv("EXTRACTIVE_ENABLED", "false").lower() == "true"
+# Share of the question's key terms that must appear in the chunk holding the span
+EXTRACTIVE_MIN_MATCH_SCORE = float(os.getenv("EXTRACTIVE_MIN_MATCH_SCORE", "0.6"))
+# Span confidence (pattern heuristics, or the QA model's score) needed to answer
+EXTRACTIVE_MIN_CONFIDENCE = float(os.getenv("EXTRACTIVE_MIN_CONFIDENCE", "0.75"))
+# Chunks searched, in retrieval order
+EXTRACTIVE_TOP_DOCS = int(os.getenv("EXTRACTIVE_TOP_DOCS", "2"))
+# Optional small extractive QA model (transformers), e.g. deepset/tinyroberta-squad2;
+# empty = patterns only
+EXTRACTIVE_QA_MODEL = os.getenv("EXTRACTIVE_QA_MODEL", "").strip()
+
+# Canonical lab test -> names it goes by in questions and reports
+LAB_TESTS = {
+    "HbA1c": ("hba1c", "hb a1c", "hemoglobin a1c", "haemoglobin a1c", "a1c", "glycated hemoglobin",
+              "glycosylated hemoglobin"),
+    "Hemoglobin": ("hemoglobin", "haemoglobin", "hgb", "hb"),
+    "Fasting glucose": ("fasting glucose", "fasting blood sugar", "fasting plasma glucose", "fbs"),
+    "Glucose": ("glucose", "blood sugar", "blood glucose"),
+    "Creatinine": ("creatinine",),
+    "eGFR": ("egfr",),
+    "LDL cholesterol": ("ldl cholesterol", "ldl"),
+    "HDL cholesterol": ("hdl cholesterol", "hdl"),
+    "Total cholesterol": ("total cholesterol", "cholesterol"),
+    "Triglycerides": ("triglycerides", "triglyceride"),
+    "TSH": ("tsh", "thyroid stimulating hormone"),
+    "Potassium": ("potassium",),
+    "Sodium": ("sodium",),
+    "Platelets": ("platelets", "platelet count", "platelet"),
+    "WBC": ("wbc", "white blood cells", "white blood cell count", "leukocytes"),
+    "Blood pressure": ("blood pressure", "bp"),
+}
+_ALIASES = sorted(
+    ((alias, test) for test, aliases in LAB_TESTS.items() for alias in aliases),
+    key=lambda item: -len(item[0]),
+)
+_ALIAS_RE = re.compile(r"\b(" + "|".join(re.escape(alias) for alias, _ in _ALIASES) + r")\b", re.IGNORECASE)
+_TEST_OF_ALIAS = {alias: test for alias, test in _ALIASES}
+
+# A value right after the test name: "HbA1c: 7.2 %", "Hemoglobin   13.1   g/dL", "BP 130/85 mmHg".
+# Between the name and the number only a ":", "=", "|", "is" or "of" may stand,
+# so the match cannot run into the next sentence, test or drug
+_UNITS = (r"%|mg/dl|g/dl|g/l|mmol/l|mmol/mol|µmol/l|umol/l|miu/l|mu/l|µiu/ml|uiu/ml|"
+          r"ml/min(?:/1\.73\s?m2)?|mmhg|iu/l|u/l|ng/ml|pg/ml|x?\s?10\^?\d+/[lµu]?l|/[µu]l|k/[µu]l|bpm")
+_CONNECTOR = r"(?:\s*[:=|]\s*|\s+(?:is|of)\s+|\s+)"
+_MONTHS = r"jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec"
+# The number is neither the bound of a range ("4.0 - 5.6", "4 to 6") nor part of a date
+_NOT_RANGE_OR_DATE = (r"(?!\d|[/.-]\d|\s*(?:-|–|to)\s*\d|\s*(?:st|nd|rd|th)\b|\s+(?:of\s+)?(?:"
+                      + _MONTHS + r")[a-z]*\b)")
+_VALUE_RE = re.compile(
+    _CONNECTOR + r"(\d+(?:\.\d+)?(?:/\d+)?)" + _NOT_RANGE_OR_DATE
+    + r"(?:\s*(" + _UNITS + r")(?![\w/]))?",
+    re.IGNORECASE,
+)
+# Words that may sit between a drug and its dose ("metformin XR 500 mg"); anything
+# else, such as another drug, ends the match
+_FORMULATION = r"(?:\s+(?:xr|er|sr|ir|cr|dr|la|hcl|hydrochloride|tab|tabs|tablets?|caps?|capsules?|oral|po)\b){0,2}"
+_DOSE_RE = (_FORMULATION + _CONNECTOR + r"(\d+(?:\.\d+)?)\s*(mg|mcg|µg|g|ml|units?|iu)(?![\w/])"
+            r"([^\n.;]{0,40})")
+_FREQUENCY_RE = re.compile(
+    r"\b(?:once|twice|thrice|daily|nightly|weekly|bid|tid|qid|qd|od|bd|every|morning|evening|"
+    r"bedtime|at night|with meals|as needed|prn)\b",
+    re.IGNORECASE,
+)
+_REFERENCE_RE = re.compile(r"\d\s*-\s*\d|[<>]\s*\d|reference|range", re.IGNORECASE)
+
+# Questions asking for a value / a dose, not an explanation ("what is HbA1c?")
+_LAB_INTENT_RE = re.compile(
+    r"\b(?:value|values|level|levels|result|results|reading|readings|measured)\b",
+    re.IGNORECASE,
+)
+# "what was my HbA1c": a lookup only when it names a lab test
+_MY_RESULT_RE = re.compile(r"^\s*what\s+(?:is|was|were|are)\s+my\b", re.IGNORECASE)
+_DOSE_INTENT_RE = re.compile(r"\b(?:dose|doses|dosage|dosing|how much|how many mg|strength|mg|prescribed)\b",
+                             re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an the is are was were be been my me i our your his her their of for in on at to with and or by from
+what which who whom whose when where how why does do did can could should would will shall may might
+this that these those it its value values level levels result results reading readings count measured
+dose doses dosage dosing strength prescribed prescription take taking taken much many mg medicine
+medication medications drug drugs tablet tablets current currently latest last report please tell show
+""".split())
+SPAN_MAX_CHARS = 200
+
+
+class Extraction(NamedTuple):
+    response: str
+    doc: object             # the Document the span came from
+    kind: str               # lab | medication | qa
+    confidence: float
+    match_score: float
+
+
+def _key_terms(question: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(question.lower()) if w not in _STOPWORDS and len(w) > 1]
+
+
+def match_score(question: str, text: str) -> float:
+    """Share of the question's key terms present in text (1.0 if it has none)."""
+    terms = _key_terms(question)
+    if not terms:
+        return 1.0
+    present = set(_WORD_RE.findall(text.lower()))
+    return sum(term in present for term in terms) / len(terms)
+
+
+def _line_at(text: str, start: int, end: int) -> str:
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", end)
+    line = " ".join(text[line_start:line_end if line_end != -1 else len(text)].split())
+    if len(line) <= SPAN_MAX_CHARS:
+        return line
+    return " ".join(text[start:end].split())
+
+
+def _citation(doc, span: str) -> str:
+    source = os.path.basename(doc.metadata.get("source", "")) or "your document"
+    page = doc.metadata.get("page")
+    where = f"{source}, page {int(page) + 1}" if isinstance(page, (int, float)) else source
+    return f'(From {where}: "{span}")'
+
+
+# -------------------------
+# Patterns
+# -------------------------
+def _lab_test_in(question: str) -> Optional[str]:
+    match = _ALIAS_RE.search(question)
+    return _TEST_OF_ALIAS[match.group(1).lower()] if match else None
+
+
+def _extract_lab(test: str, question: str, docs) -> Optional[Extraction]:
+    found = []      # (value, unit, span, doc, in_table)
+    for doc in docs:
+        text = doc.page_content
+        for alias_match in _ALIAS_RE.finditer(text):
+            if _TEST_OF_ALIAS[alias_match.group(1).lower()] != test:
+                continue
+            value_match = _VALUE_RE.match(text, alias_match.end())
+            if value_match is None:
+                continue
+            span = _line_at(text, alias_match.start(), value_match.end())
+            found.append((value_match.group(1), value_match.group(2), span, doc,
+                          bool(_REFERENCE_RE.search(span[len(alias_match.group(1)):]))))
+    if not found:
+        return None
+
+    value, unit, span, doc, has_reference = found[0]
+    confidence = 0.6 + 0.25 * bool(unit) + 0.1 * has_reference
+    if len({v for v, *_ in found}) > 1:
+        # Several readings (dates, repeat tests): which one is meant needs the LLM
+        confidence *= 0.5
+    answer = f"{test}: {value}{'' if not unit or unit == '%' else ' '}{unit or ''}"
+    return Extraction(f"{answer}\n\n{_citation(doc, span)}", doc, "lab", min(confidence, 1.0),
+                      match_score(question, doc.page_content))
+
+
+def _extract_medication(question: str, docs) -> Optional[Extraction]:
+    candidates = [w for w in _key_terms(question) if len(w) >= 4 and w.isalpha()]
+    for drug in candidates:
+        pattern = re.compile(r"\b(" + re.escape(drug) + r")\b" + _DOSE_RE, re.IGNORECASE)
+        found = []
+        for doc in docs:
+            for m in pattern.finditer(doc.page_content):
+                found.append((m, doc))
+        if not found:
+            continue
+
+        m, doc = found[0]
+        frequency = m.group(4).strip() if _FREQUENCY_RE.search(m.group(4)) else ""
+        confidence = 0.7 + 0.15 * bool(frequency)
+        if len({(f.group(2), f.group(3).lower()) for f, _ in found}) > 1:
+            confidence *= 0.5
+        span = _line_at(doc.page_content, m.start(), m.end())
+        answer = f"{m.group(1)}: {m.group(2)} {m.group(3)}" + (f" {frequency}" if frequency else "")
+        return Extraction(f"{answer}\n\n{_citation(doc, span)}", doc, "medication", min(confidence, 1.0),
+                          match_score(question, doc.page_content))
+    return None
+
+
+# -------------------------
+# Optional local QA model
+# -------------------------
+class LocalQAModel:
+    """Small extractive QA model on CPU, loaded on first use; if it cannot
+    be loaded (no transformers, no model) it is disabled, like the reranker."""
+
+    def __init__(self, model_name=EXTRACTIVE_QA_MODEL):
+        self.model_name = model_name
+        self._pipeline = None
+        self._failed = not model_name
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._pipeline is None and not self._failed:
+                try:
+                    from transformers import pipeline
+                    self._pipeline = pipeline("question-answering", model=self.model_name, device=-1)
+                    logger.info(f"Loaded extractive QA model {self.model_name}")
+                except Exception:
+                    logger.exception(f"Could not load QA model {self.model_name}; using patterns only")
+                    self._failed = True
+        return self._pipeline
+
+    def extract(self, question: str, docs) -> Optional[Extraction]:
+        qa = self.load()
+        if qa is None:
+            return None
+        best = None
+        for doc in docs:
+            result = qa(question=question, context=doc.page_content)
+            if result.get("answer") and (best is None or result["score"] > best[0]["score"]):
+                best = (result, doc)
+        if best is None:
+            return None
+        result, doc = best
+        span = _line_at(doc.page_content, result["start"], result["end"])
+        return Extraction(f"{result['answer'].strip()}\n\n{_citation(doc, span)}", doc, "qa",
+                          float(result["score"]), match_score(question, doc.page_content))
+
+
+# -------------------------
+# Fast path
+# -------------------------
+class ExtractiveAnswerer:
+    """Tries to answer a lookup question from the top retrieved chunks.
+
+    Lab values and medication doses are found with patterns, anything else
+    phrased as a lookup by the optional QA model. An answer is given only
+    when its span confidence and the chunk's match score clear the
+    thresholds; otherwise the caller falls back to the LLM. Keeps the
+    fast-path rate and an estimate of the LLM latency saved (each hit
+    saves the recent average LLM time minus its own).
+    """
+
+    def __init__(self, qa_model=None, min_confidence=EXTRACTIVE_MIN_CONFIDENCE,
+                 min_match_score=EXTRACTIVE_MIN_MATCH_SCORE, top_docs=EXTRACTIVE_TOP_DOCS):
+        self.qa_model = qa_model or LocalQAModel()
+        self.min_confidence = min_confidence
+        self.min_match_score = min_match_score
+        self.top_docs = top_docs
+
+        self._lock = threading.Lock()
+        self._llm_seconds = None    # EWMA of llm_total
+        self._stats = {"attempts": 0, "lookups": 0, "hits_lab": 0, "hits_medication": 0, "hits_qa": 0,
+                       "below_threshold": 0, "latency_saved_seconds": 0.0}
+
+    def extract(self, question: str, docs) -> Optional[Extraction]:
+        """Best extraction for question, whatever its confidence (None if not a lookup)."""
+        docs = list(docs)[:self.top_docs]
+        test = _lab_test_in(question)
+        if test is not None and (_LAB_INTENT_RE.search(question) or _MY_RESULT_RE.match(question)):
+            return _extract_lab(test, question, docs)
+        if _DOSE_INTENT_RE.search(question):
+            extraction = _extract_medication(question, docs)
+            if extraction is not None:
+                return extraction
+        elif not _LAB_INTENT_RE.search(question):
+            return None
+        return self.qa_model.extract(question, docs)
+
+    def answer(self, question: str, docs) -> Optional[dict]:
+        """{"response", "sources", "extractive"} if confident, else None."""
+        start = time.perf_counter()
+        extraction = self.extract(question, docs)
+        accepted = (
+            extraction is not None
+            and extraction.confidence >= self.min_confidence
+            and extraction.match_score >= self.min_match_score
+        )
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["attempts"] += 1
+            self._stats["lookups"] += extraction is not None
+            if extraction is not None and not accepted:
+                self._stats["below_threshold"] += 1
+            if accepted:
+                self._stats[f"hits_{extraction.kind}"] += 1
+                saved = max(0.0, (self._llm_seconds or 0.0) - elapsed)
+                self._stats["latency_saved_seconds"] += saved
+        if not accepted:
+            return None
+        metrics.observe("extractive_latency_saved_seconds", saved, kind=extraction.kind)
+        logger.info(f"Extractive answer ({extraction.kind}, confidence={extraction.confidence:.2f}, "
+                    f"match={extraction.match_score:.2f})")
+        return {
+            "response": extraction.response,
+            "sources": [extraction.doc.metadata.get("source", "")],
+            "extractive": True,
+        }
+
+    def observe_llm(self, seconds: float):
+        with self._lock:
+            self._llm_seconds = seconds if self._llm_seconds is None else \
+                self._llm_seconds + 0.1 * (seconds - self._llm_seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._stats["hits_lab"] + self._stats["hits_medication"] + self._stats["hits_qa"]
+            attempts = self._stats["attempts"]
+            return {
+                **self._stats,
+                "latency_saved_seconds": round(self._stats["latency_saved_seconds"], 3),
+                "fast_path_rate": round(hits / attempts, 4) if attempts else 0.0,
+                "llm_seconds_avg": round(self._llm_seconds, 3) if self._llm_seconds is not None else None,
+            }
+
+
+# Process-wide; the QA model (if configured) loads on first use or at warm-up
+extractive_answerer = ExtractiveAnswerer()
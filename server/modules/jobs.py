@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from server.logger import logger
+from server.modules.admission import Overloaded
+from server.modules.metrics import observe_stage
+from server.modules.pdf_handlers import discard_staged
+
+load_dotenv()
+
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+# Jobs waiting for a worker; uploads beyond this are shed with a 429
+INGEST_MAX_QUEUED_JOBS = int(os.getenv("INGEST_MAX_QUEUED_JOBS", "8"))
+# Finished jobs kept around for status polling
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+
+class IngestionJob:
+    def __init__(self, saved_files, namespace="", doc_type=None):
+        self.id = uuid.uuid4().hex
+        self.namespace = namespace
+        self.doc_type = doc_type
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.files = {
+            saved.path: {
+                "file": Path(saved.path).name,
+                "sha256": saved.sha256,
+                "bytes": saved.size,
+                "status": "queued",
+                "pages_parsed": 0,
+                "chunks_total": None,
+                "chunks_unchanged": 0,
+                "chunks_embedded": 0,
+                "vectors_upserted": 0,
+                "vectors_deleted": 0,
+                "started_at": None,
+                "finished_at": None,
+            }
+            for saved in saved_files
+        }
+        # Uploads still under their temp names, renamed into place by the job
+        self.staged = list(saved_files)
+
+    def on_progress(self, file_path, stage, n):
+        now = time.time()
+        progress = self.files[file_path]
+
+        if stage == "chunks_total":
+            progress["chunks_total"] = n
+        else:
+            progress[stage] += n
+
+        if progress["chunks_total"] is not None and progress["vectors_upserted"] >= progress["chunks_total"]:
+            progress["status"] = "completed"
+            progress["finished_at"] = now
+
+    def to_dict(self):
+        def elapsed_ms(start, end):
+            if start is None:
+                return None
+            return round(((end or time.time()) - start) * 1000, 1)
+
+        return {
+            "job_id": self.id,
+            "namespace": self.namespace,
+            "doc_type": self.doc_type,
+            "status": self.status,
+            "error": self.error,
+            "timings": {
+                "queued_ms": elapsed_ms(self.created_at, self.started_at),
+                "running_ms": elapsed_ms(self.started_at, self.finished_at),
+            },
+            "files": [
+                {
+                    **{k: v for k, v in p.items() if k not in ("started_at", "finished_at")},
+                    "elapsed_ms": elapsed_ms(p["started_at"], p["finished_at"]),
+                }
+                for p in self.files.values()
+            ],
+        }
+
+
+class JobManager:
+    """Runs ingestion jobs on a background thread pool and tracks their progress.
+
+    The pool is the ingestion side of admission control: at most `workers`
+    jobs run and at most `max_queued` wait, apart from the query pool.
+    """
+
+    def __init__(self, workers=INGEST_JOB_WORKERS, history=INGEST_JOB_HISTORY,
+                 max_queued=INGEST_MAX_QUEUED_JOBS):
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="ingest")
+        self._workers = workers
+        self._max_queued = max_queued
+        self._jobs = OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+        self._job_time = 30.0   # EWMA of seconds per job, for Retry-After
+
+    def check_capacity(self):
+        """Raise Overloaded if the job queue is full."""
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == "queued")
+            retry_after = self._job_time * (queued - self._max_queued + 1) / self._workers
+        if queued >= self._max_queued:
+            raise Overloaded("Too many ingestion jobs queued", retry_after)
+
+    def submit(self, saved_files, namespace="", doc_type=None) -> IngestionJob:
+        """Queue ingestion of files already saved by save_uploaded_files."""
+        self.check_capacity()
+        job = IngestionJob(saved_files, namespace, doc_type)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._pool.submit(self._run, job)
+        logger.info(f"Ingestion job {job.id} queued for {len(job.files)} file(s)")
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {
+            "running": statuses.count("running"),
+            "queued": statuses.count("queued"),
+            "workers": self._workers,
+            "max_queued": self._max_queued,
+        }
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        for progress in job.files.values():
+            progress["status"] = "running"
+            progress["started_at"] = job.started_at
+        try:
+            # Deferred: pulls in the splitter, tqdm and the ingestion pipeline
+            from server.modules.load_vectorstore import ingest_files
+
+            ingest_files(
+                list(job.files),
+                on_progress=job.on_progress,
+                file_hashes={path: p["sha256"] for path, p in job.files.items()},
+                namespace=job.namespace,
+                doc_type=job.doc_type,
+                staged=job.staged
+            )
+            job.status = "completed"
+            logger.info(f"Ingestion job {job.id} completed")
+        except Exception as exc:
+            logger.exception(f"Ingestion job {job.id} failed")
+            job.status = "failed"
+            job.error = str(exc)
+            for progress in job.files.values():
+                if progress["status"] != "completed":
+                    progress["status"] = "failed"
+        finally:
+            discard_staged(job.staged)     # left over only if the job failed before renaming them
+            job.finished_at = time.time()
+            observe_stage("ingest", "job", job.finished_at - job.started_at)
+            with self._lock:
+                self._job_time += 0.2 * (job.finished_at - job.started_at - self._job_time)
+
+    def _forget_finished(self):
+        finished = [j for j in self._jobs.values() if j.status in ("completed", "failed")]
+        for job in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[job.id]
+
+
+job_manager = JobManager()
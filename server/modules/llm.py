@@ -1,9 +1,12 @@
 import os
+from operator import itemgetter
+from typing import List
+
 from dotenv import load_dotenv
 
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_groq import ChatGroq
+from langchain_core.retrievers import BaseRetriever
 
 load_dotenv()
 
@@ -14,13 +17,41 @@ def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
 
-def get_llm_chain(retriever):
-    llm = ChatGroq(
+class DocumentsRetriever(BaseRetriever):
+    """Reusable retriever: returns the documents passed in with each call.
+
+    Retrieval happens in the route (embed + Pinecone), so the chain input is
+    {"question": ..., "docs": [...]} and this retriever just hands the docs on.
+    One instance is shared by every request.
+    """
+
+    def _get_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return query["docs"]
+
+    async def _aget_relevant_documents(self, query, *, run_manager) -> List[Document]:
+        return query["docs"]
+
+
+def get_llm():
+    # One client per process -> its HTTP connection pool (keep-alive to Groq)
+    # is shared by every request
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
         groq_api_key=GROQ_API_KEY,
         model_name="llama-3.1-8b-instant",
         temperature=0
     )
 
+
+def get_llm_chain(retriever=None, llm=None):
+    """Build the RAG chain. Call once at startup and reuse it for every question.
+
+    Invoke with {"question": str, "docs": List[Document]}.
+    """
+    retriever = retriever or DocumentsRetriever()
+    llm = llm or get_llm()
+
     prompt = PromptTemplate(
         input_variables=["context", "question"],
         template="""
@@ -52,7 +83,7 @@ Your job is to provide clear, accurate, and helpful responses based **only on th
     chain = (
         {
             "context": retriever | format_docs,
-            "question": RunnablePassthrough()
+            "question": itemgetter("question")
         }
         | prompt
         | llm
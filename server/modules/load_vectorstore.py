@@ -1,18 +1,18 @@
 import os
-from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
 
 from dotenv import load_dotenv
 from tqdm.auto import tqdm
 
-# Pinecone v3
-from pinecone import Pinecone
-
-# LangChain loaders & splitters
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-# HuggingFace Endpoint Embeddings (Correct + Stable)
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from server.modules.answer_cache import answer_cache
+from server.modules.chunker import CHUNK_IN_WORKERS, CHUNKER, chunker_version, split_text
+from server.modules.manifest import chunk_hash, file_sha256, vector_id
+from server.modules.metrics import timed
+from server.modules.pdf_handlers import iter_parsed_pages, promote_staged, save_uploaded_files, submit_pdf_parse
+from server.modules.resilience import retry_with_backoff
+from server.modules.resources import resources
+from server.modules.sessions import session_store
 
 
 # ----------------------------------------
@@ -20,75 +20,321 @@ from langchain_huggingface import HuggingFaceEndpointEmbeddings
 # ----------------------------------------
 load_dotenv()
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-
-if not PINECONE_API_KEY:
-    raise RuntimeError("PINECONE_API_KEY missing")
-if not PINECONE_INDEX_NAME:
-    raise RuntimeError("PINECONE_INDEX_NAME missing")
-
-UPLOAD_DIR = "./uploaded_docs"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
-# ----------------------------------------
-# Connect Pinecone
-# ----------------------------------------
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+# Ingestion tuning
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "2"))
+DELETE_BATCH_SIZE = 1000  # Pinecone limit per delete call
 
 
 # ----------------------------------------
 # Load, split, embed, upload
 # ----------------------------------------
-def load_vectorstore(uploaded_files):
-
-    # BGE-M3 via HF Endpoint API (1024-dim)
-    embedder = HuggingFaceEndpointEmbeddings(
-        model="BAAI/bge-m3"
-        # IMPORTANT: Do NOT pass token here.
-        # It auto reads from HUGGINGFACEHUB_API_TOKEN environment variable
+def load_vectorstore(uploaded_files, on_progress=None, namespace="", doc_type=None):
+    # Save uploaded PDFs (streamed to disk, hashed on the way)
+    saved = save_uploaded_files(uploaded_files, namespace)
+    ingest_files(
+        [f.path for f in saved],
+        on_progress=on_progress,
+        file_hashes={f.path: f.sha256 for f in saved},
+        namespace=namespace,
+        doc_type=doc_type,
+        staged=saved
     )
 
-    file_paths = []
 
-    # Save uploaded PDFs
-    for file in uploaded_files:
-        save_path = Path(UPLOAD_DIR) / file.filename
-        with open(save_path, "wb") as f:
-            f.write(file.file.read())
-        file_paths.append(str(save_path))
+@lru_cache(maxsize=None)
+def _recursive_splitter():
+    # LangChain splitter, only for CHUNKER=recursive
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=700,
+        chunk_overlap=120,
+        add_start_index=True  # lets the context builder merge neighbouring chunks
+    )
 
-    # Process each PDF
-    for file_path in file_paths:
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
 
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=700,
-            chunk_overlap=120
-        )
-        chunks = splitter.split_documents(documents)
+def _iter_chunks(page, doc_type=None, chunks=None):
+    """Split one parsed page into (chunk hash, text, metadata) chunks.
 
-        # BGE requires "passage:" prefix
-        texts = [f"passage: {chunk.page_content}" for chunk in chunks]
+    `chunks` are the page's chunker.Chunk list when it was already split
+    in a parse worker.
+    """
+    extra = {"doc_type": doc_type} if doc_type else {}
 
-        metadatas = [
-            {
+    if CHUNKER == "recursive":
+        for chunk in _recursive_splitter().split_documents([page]):
+            metadata = {
                 "text": chunk.page_content,  # required for RAG response
-                **chunk.metadata
+                **chunk.metadata,
+                **extra
             }
-            for chunk in chunks
-        ]
+            digest = chunk_hash(chunk.page_content, page.metadata.get("page"), doc_type)
+            # BGE requires "passage:" prefix
+            yield digest, f"passage: {chunk.page_content}", metadata
+        return
+
+    if chunks is None:
+        chunks = split_text(page.page_content, resources.get("tokenizer"))
+    for chunk in chunks:
+        metadata = {
+            "text": chunk.text,  # required for RAG response
+            **page.metadata,
+            "start_index": chunk.start_index,  # lets the context builder merge neighbouring chunks
+            **({"section": chunk.section} if chunk.section else {}),
+            **extra
+        }
+        digest = chunk_hash(chunk.text, page.metadata.get("page"), doc_type)
+        # BGE requires "passage:" prefix; the heading / table header only
+        # steer the embedding, the stored text stays a slice of the page
+        yield digest, f"passage: {chunk.prefix}{chunk.text}", metadata
+
+
+def _embed_batch(embedder, file_path, ids, texts, metadatas):
+    with timed("ingest", "embed"):
+        vectors = retry_with_backoff(embedder.embed_documents, texts)
+    return [(file_path, vector) for vector in zip(ids, vectors, metadatas)]
+
+
+def _upsert_batch(batch, namespace=""):
+    # Vector store (Pinecone or local, see VECTOR_STORE) shared with /ask/
+    vector_store = resources.get("vector_store")
+    with timed("ingest", "upsert"):
+        retry_with_backoff(vector_store.upsert, [vector for _, vector in batch], namespace)
+    return batch
+
+
+def _delete_vectors(ids, namespace=""):
+    vector_store = resources.get("vector_store")
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        with timed("ingest", "delete"):
+            retry_with_backoff(vector_store.delete, ids[start:start + DELETE_BATCH_SIZE], namespace)
+
+
+def _count_by_file(batch):
+    counts = {}
+    for file_path, _ in batch:
+        counts[file_path] = counts.get(file_path, 0) + 1
+    return counts
+
+
+class _IngestPipeline:
+    """Embed batches on one thread pool, upsert on another.
+
+    Finished embedding batches are regrouped into UPSERT_BATCH_SIZE upserts,
+    so Pinecone writes overlap with further embedding (and with parsing,
+    which feeds submit() as pages arrive).
+    """
+
+    def __init__(self, embedder, report, namespace=""):
+        self.embedder = embedder
+        self.report = report
+        self.namespace = namespace
+        self.embed_pool = ThreadPoolExecutor(EMBED_WORKERS)
+        self.upsert_pool = ThreadPoolExecutor(UPSERT_WORKERS)
+        self.embed_futures = set()
+        self.upsert_futures = set()
+        self.buffer = []
+        self.embed_bar = tqdm(total=0, desc="Embedding chunks")
+        self.upsert_bar = tqdm(total=0, desc="Upserting to Pinecone")
+
+    def submit(self, file_path, chunks):
+        ids, texts, metadatas = zip(*chunks)
+        self.embed_bar.total += len(chunks)
+        self.upsert_bar.total += len(chunks)
+        self.embed_futures.add(self.embed_pool.submit(
+            _embed_batch, self.embedder, file_path, list(ids), list(texts), list(metadatas)
+        ))
+
+    def poll(self, block=False):
+        """Move finished embeddings into upserts and record finished upserts.
+
+        Re-raises the error of a batch that exhausted its retries.
+        """
+        if self.embed_futures:
+            done, self.embed_futures = wait(
+                self.embed_futures,
+                timeout=None if block else 0,
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                embedded = future.result()
+                self.embed_bar.update(len(embedded))
+                for file_path, n in _count_by_file(embedded).items():
+                    self.report(file_path, "chunks_embedded", n)
+
+                self.buffer.extend(embedded)
+                while len(self.buffer) >= UPSERT_BATCH_SIZE:
+                    self._flush(self.buffer[:UPSERT_BATCH_SIZE])
+                    self.buffer = self.buffer[UPSERT_BATCH_SIZE:]
+
+        done, self.upsert_futures = wait(self.upsert_futures, timeout=0)
+        self._record_upserts(done)
+
+    def finish(self):
+        while self.embed_futures:
+            self.poll(block=True)
+        if self.buffer:
+            self._flush(self.buffer)
+            self.buffer = []
+        done, self.upsert_futures = wait(self.upsert_futures)
+        self._record_upserts(done)
+
+    def close(self, cancel=False):
+        self.embed_pool.shutdown(cancel_futures=cancel)
+        self.upsert_pool.shutdown(cancel_futures=cancel)
+        self.embed_bar.close()
+        self.upsert_bar.close()
+
+    def _flush(self, batch):
+        self.upsert_futures.add(self.upsert_pool.submit(_upsert_batch, batch, self.namespace))
+
+    def _record_upserts(self, done):
+        for future in done:
+            batch = future.result()
+            self.upsert_bar.update(len(batch))
+            for file_path, n in _count_by_file(batch).items():
+                self.report(file_path, "vectors_upserted", n)
+
+
+def ingest_files(file_paths, on_progress=None, file_hashes=None, namespace="", doc_type=None, staged=()):
+    """Parse, split, embed and upsert already-saved PDFs, incrementally.
+
+    Each file is diffed against the local document manifest: an unchanged
+    file is skipped outright; otherwise only chunks whose (text, page) hash
+    is new are embedded and upserted, and chunks that disappeared are
+    deleted from the index. file_hashes ({path: sha256}) avoids re-reading
+    files that were hashed while being saved. staged uploads (SavedFile,
+    see save_uploaded_files) are renamed into place once their paths are
+    locked, so no other job is reading them.
+
+    Vectors and BM25 documents go to `namespace` (one per tenant); a
+    non-empty doc_type is stored in every chunk's metadata for filtering,
+    and re-uploading a file under another doc_type re-indexes it.
+
+    Pages are parsed in a process pool (fanned out per file and page range)
+    and split into chunks by the same workers (see chunker.py), or as they
+    arrive with CHUNK_IN_WORKERS off. Chunks are embedded in EMBED_BATCH_SIZE batches
+    on EMBED_WORKERS threads and upserted in UPSERT_BATCH_SIZE batches on
+    UPSERT_WORKERS threads. Every batch is retried with backoff.
+
+    on_progress(file_path, stage, n) is called as work completes, with stage
+    one of "pages_parsed", "chunks_total" (chunks to embed, set once),
+    "chunks_unchanged", "chunks_embedded", "vectors_upserted",
+    "vectors_deleted".
+    """
+    # BGE-M3 (1024-dim); unchanged chunks are served from the embedding cache
+    embedder = resources.get("embedder")
+    bm25_index = resources.get("bm25_index")
+    manifest = resources.get("manifest")
+    # Resolved once here; parse workers load the same tokenizer from its path
+    tokenizer = resources.get("tokenizer")
+    file_hashes = file_hashes or {}
+
+    def report(file_path, stage, n):
+        if on_progress:
+            on_progress(file_path, stage, n)
+
+    with manifest.lock_sources(file_paths):
+        promote_staged(staged)
+        changed = {}
+        for file_path in dict.fromkeys(file_paths):
+            file_hash = file_hashes.get(file_path) or file_sha256(file_path)
+            # The stored version also covers chunking and doc type, so changing either re-indexes
+            file_hash = ":".join(part for part in (file_hash, chunker_version(tokenizer.name), doc_type) if part)
+            previous_ids = manifest.chunk_ids(file_path).values()
+            # Files indexed before BM25 existed are re-parsed once to backfill it
+            in_bm25 = all(bm25_index.contains(vid, namespace) for vid in previous_ids)
+            if manifest.file_hash(file_path) == file_hash and in_bm25:
+                print(f"⏭️ Unchanged, skipping → {file_path}")
+                report(file_path, "chunks_unchanged", len(manifest.chunk_ids(file_path)))
+                report(file_path, "chunks_total", 0)
+                continue
+            changed[file_path] = file_hash
+
+        # Fan every changed file out to the parse process pool up front
+        split_in_workers = CHUNKER != "recursive" and CHUNK_IN_WORKERS
+        parsing = {file_path: submit_pdf_parse(file_path, split=split_in_workers, tokenizer_path=tokenizer.path)
+                   for file_path in changed}
+
+        indexed, stale, sparse = {}, {}, {}
+        pipeline = _IngestPipeline(embedder, report, namespace)
+        try:
+            for file_path in changed:
+                page_count, page_futures = parsing[file_path]
+                previous = manifest.chunk_ids(file_path)
+                current = indexed[file_path] = {}
+                sparse[file_path] = []
+
+                total, unchanged, pending = 0, 0, []
+                for page, page_chunks in iter_parsed_pages(file_path, page_count, page_futures):
+                    report(file_path, "pages_parsed", 1)
+
+                    if page_chunks is not None:
+                        chunks = list(_iter_chunks(page, doc_type, page_chunks))
+                    else:
+                        with timed("ingest", "split"):
+                            chunks = list(_iter_chunks(page, doc_type))
+
+                    for digest, text, metadata in chunks:
+                        if digest in current:
+                            continue  # identical chunk repeated on the same page
+                        if digest in previous:
+                            current[digest] = previous[digest]
+                            unchanged += 1
+                            if not bm25_index.contains(current[digest], namespace):
+                                sparse[file_path].append((current[digest], metadata["text"], metadata))
+                            continue
+
+                        current[digest] = vector_id(file_path, digest)
+                        pending.append((current[digest], text, metadata))
+                        sparse[file_path].append((current[digest], metadata["text"], metadata))
+                        total += 1
+                        if len(pending) == EMBED_BATCH_SIZE:
+                            pipeline.submit(file_path, pending)
+                            pending = []
+
+                    pipeline.poll()
+
+                if pending:
+                    pipeline.submit(file_path, pending)
+
+                stale[file_path] = [vid for digest, vid in previous.items() if digest not in current]
+                report(file_path, "chunks_unchanged", unchanged)
+                report(file_path, "chunks_total", total)
+                print(f"🔍 Embedding {total} new/changed chunks from {file_path} ({unchanged} unchanged)...")
+
+            pipeline.finish()
+
+        except Exception:
+            for _, page_futures in parsing.values():
+                for _, future in page_futures:
+                    future.cancel()
+            pipeline.close(cancel=True)
+            raise
+
+        pipeline.close()
+
+        for file_path, file_hash in changed.items():
+            # Only after the new chunks are in: drop the ones that disappeared
+            if stale[file_path]:
+                _delete_vectors(stale[file_path], namespace)
+                report(file_path, "vectors_deleted", len(stale[file_path]))
 
-        ids = [f"{Path(file_path).stem}-{i}" for i in range(len(chunks))]
+            # Keep the BM25 index in step with the vector index
+            bm25_index.delete(stale[file_path], namespace)
+            bm25_index.add(sparse[file_path], namespace)
 
-        print(f"🔍 Embedding {len(texts)} chunks...")
-        embeddings = embedder.embed_documents(texts)
+            manifest.commit(file_path, file_hash, indexed[file_path])
 
-        print("📤 Uploading to Pinecone...")
-        with tqdm(total=len(embeddings), desc="Upserting to Pinecone"):
-            index.upsert(vectors=zip(ids, embeddings, metadatas))
+            # Reusable session chunks from the old version are stale now
+            session_store.invalidate_source(file_path)
+            print(f"✅ Upload complete → {file_path}")
 
-        print(f"✅ Upload complete → {file_path}")
+        if changed:
+            # Any cached answer in the namespace may be stale, including ones
+            # that found nothing before this document was there
+            answer_cache.invalidate_namespace(namespace)
+            bm25_index.save()
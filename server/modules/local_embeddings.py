@@ -0,0 +1,143 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+from server.logger import logger
+
+load_dotenv()
+
+# torch intra-op threads for CPU inference (0 = leave torch's default)
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+# "torch" | "int8" (torch dynamic quantization of Linear layers) | "onnx"
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch").lower()
+# Texts encoded per forward pass
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+# How long the batcher waits for more requests once one has arrived
+LOCAL_EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("LOCAL_EMBEDDING_BATCH_WINDOW_MS", "5"))
+
+
+def load_sentence_transformer(model_name, runtime=LOCAL_EMBEDDING_RUNTIME, threads=LOCAL_EMBEDDING_THREADS):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    if runtime == "onnx":
+        # Needs sentence-transformers[onnx]; exports the model on first load
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    else:
+        model = SentenceTransformer(model_name, device="cpu")
+        if runtime == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    logger.info(f"Loaded local embedding model {model_name} (runtime={runtime}, threads={torch.get_num_threads()})")
+    return model
+
+
+class LocalEmbeddings(Embeddings):
+    """In-process sentence-transformers embeddings on CPU.
+
+    Calls from any thread or coroutine are queued to a single worker
+    thread, which groups whatever arrives within the batch window (up to
+    batch_size texts) into one forward pass. Concurrent /ask/ queries
+    therefore share a batch instead of contending for the CPU, and large
+    ingestion batches are split into batch_size passes.
+    """
+
+    def __init__(self, model_name, batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                 window_ms=LOCAL_EMBEDDING_BATCH_WINDOW_MS, model=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self._model = model
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="local-embeddings", daemon=True)
+        self._worker.start()
+
+    # -------------------------
+    # Batching worker
+    # -------------------------
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.window
+        while size < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        # Nothing may escape this loop: it is the only worker, and every
+        # later embed would wait forever on its queue
+        while True:
+            batch = self._next_batch()
+            try:
+                self._encode(batch)
+            except Exception:
+                logger.exception("Local embedding worker failed on a batch")
+
+    def _encode(self, batch):
+        # Callers that were cancelled while queued (client disconnect,
+        # timeout) are dropped; the rest can no longer be cancelled
+        batch = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            if self._model is None:
+                self._model = load_sentence_transformer(self.model_name)
+            texts = [text for texts, _ in batch for text in texts]
+            vectors = self._model.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            ).tolist()
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[start:start + len(texts)])
+            start += len(texts)
+
+    def _submit(self, texts) -> Future:
+        future = Future()
+        if not texts:
+            future.set_result([])
+        else:
+            self._queue.put((list(texts), future))
+        return future
+
+    # -------------------------
+    # Embeddings API
+    # -------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit([text]).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(self._submit(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await asyncio.wrap_future(self._submit([text])))[0]
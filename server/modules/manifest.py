@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "./cache/manifest.sqlite3")
+
+
+def file_sha256(path, chunk_size=1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def chunk_hash(text: str, page, doc_type=None) -> str:
+    # Page (and doc type, if any) is part of the identity so stored
+    # metadata never goes stale
+    key = f"{page}\x00{text}" if not doc_type else f"{page}\x00{doc_type}\x00{text}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def vector_id(source: str, chunk_digest: str) -> str:
+    # Stable per (document, chunk content); the source digest keeps two
+    # files with the same stem from overwriting each other
+    source_digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return f"{Path(source).stem}-{source_digest}-{chunk_digest[:24]}"
+
+
+class DocumentManifest:
+    """Local record of what is in the vector index for each document.
+
+    documents: source -> content hash of the last ingested version
+    chunks:    (source, chunk hash) -> vector id
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS documents (
+                source TEXT PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                source TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                vector_id TEXT NOT NULL,
+                PRIMARY KEY (source, chunk_hash)
+            );
+        """)
+        self._lock = threading.Lock()
+        self._source_locks = {}
+
+    @contextmanager
+    def lock_sources(self, sources):
+        """Serialize ingestion of the same documents across concurrent jobs."""
+        with self._lock:
+            locks = [self._source_locks.setdefault(s, threading.Lock()) for s in sorted(set(sources))]
+        with ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            yield
+
+    def file_hash(self, source):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hash FROM documents WHERE source = ?", (source,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def chunk_ids(self, source) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash, vector_id FROM chunks WHERE source = ?", (source,)
+            ).fetchall()
+        return dict(rows)
+
+    def commit(self, source, file_hash, chunk_ids: dict):
+        """Replace the stored state of `source` once the index matches it."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self._conn.executemany(
+                "INSERT INTO chunks (source, chunk_hash, vector_id) VALUES (?, ?, ?)",
+                [(source, h, vid) for h, vid in chunk_ids.items()]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (source, file_hash, updated_at) VALUES (?, ?, ?)",
+                (source, file_hash, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_manifest() -> DocumentManifest:
+    """Process-wide manifest at MANIFEST_PATH, opened on first use."""
+    return DocumentManifest()
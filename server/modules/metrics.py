@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Adds a Server-Timing header with the stages of each request
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# Stage durations (ms) of the request being served, for Server-Timing;
+# set by the metrics middleware, None outside a request
+request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three adds."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process aggregation rendered in the Prometheus text format.
+
+    Histograms are declared once with their buckets; each distinct label
+    set gets its own series. Nothing is exported until /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._declared = {}     # name -> (help, buckets)
+        self._series = {}       # name -> {labels tuple: Histogram}
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self._declared[name] = (documentation, tuple(buckets))
+        self._series.setdefault(name, {})
+
+    def observe(self, name, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._declared[name][1])
+            histogram.observe(value)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (documentation, buckets) in self._declared.items():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(self._series[name].items()):
+                    labels = ",".join(f'{k}="{v}"' for k, v in key)
+                    prefix = f"{labels}," if labels else ""
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                    suffix = f"{{{labels}}}" if labels else ""
+                    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+                    lines.append(f"{name}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.histogram("http_request_duration_seconds", "HTTP request latency by route and status.")
+metrics.histogram("rag_stage_duration_seconds", "Latency of each ask/ingest pipeline stage.")
+metrics.histogram("query_embedding_batch_size", "Queries per batched embedding call.", SIZE_BUCKETS)
+metrics.histogram("extractive_latency_saved_seconds", "LLM latency saved per extractive fast-path answer.")
+
+
+def observe_stage(pipeline, stage, seconds):
+    """Record one stage duration, and add it to the current request's Server-Timing."""
+    metrics.observe("rag_stage_duration_seconds", seconds, pipeline=pipeline, stage=stage)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+
+@contextmanager
+def timed(pipeline, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(pipeline, stage, time.perf_counter() - start)
+
+
+def format_server_timing(timings, total_seconds) -> str:
+    entries = [f"{stage};dur={ms:.2f}" for stage, ms in timings.items()]
+    entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
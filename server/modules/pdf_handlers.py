@@ -1,16 +1,195 @@
+import hashlib
+import multiprocessing
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
 from fastapi import UploadFile
 import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from server.modules.metrics import observe_stage, timed
 
 UPLOAD_DIR="./uploaded_docs"
+# Uploads are copied to disk in chunks of this size (never read whole)
+UPLOAD_CHUNK_SIZE=int(os.getenv("UPLOAD_CHUNK_SIZE",str(1024*1024)))
+
+# Text extraction is CPU-bound (GIL) -> parse in worker processes
+PARSE_WORKERS=int(os.getenv("PARSE_WORKERS",str(os.cpu_count() or 1)))
+# Large PDFs are split into page ranges of this size, one task each
+PARSE_PAGES_PER_TASK=int(os.getenv("PARSE_PAGES_PER_TASK","16"))
+# Workers must not be forked from the threaded server: a lock held by another
+# thread at fork time (imports, logging, tokenizer) would deadlock the child
+PARSE_START_METHOD=os.getenv("PARSE_START_METHOD","forkserver")
+
+_parse_pool=None
+
+# Mode of a file created with open(): temp files are 0600, and os.replace
+# would carry that over to the stored document (read once, at import, as
+# os.umask can only be read by setting it)
+_UMASK=os.umask(0o022)
+os.umask(_UMASK)
+UPLOAD_FILE_MODE=0o666&~_UMASK
+
+
+class SavedFile(NamedTuple):
+    path:str            # where the document lives once its job promotes it
+    sha256:str
+    size:int
+    staged_path:str     # unique temp file holding the upload until then
+
+
+class ParsedPage(NamedTuple):
+    document:Document
+    chunks:Optional[list]   # chunker.Chunk list when split in the worker, else None
+
+
+def upload_dir(namespace:str="")->str:
+    # Each tenant namespace gets its own folder, so equal file names never collide
+    return os.path.join(UPLOAD_DIR,namespace) if namespace else UPLOAD_DIR
+
+
+def upload_name(filename:Optional[str])->str:
+    """Base name an upload is stored under; ValueError if it has none."""
+    name=os.path.basename((filename or "").replace("\\","/")).strip()
+    if name in ("",".",".."):
+        raise ValueError(f"Invalid file name: {filename!r}")
+    return name
+
+
+def save_uploaded_files(files:list[UploadFile],namespace:str="")-> list[SavedFile]:
+    """Stream uploads to upload_dir(namespace) chunk by chunk, hashing while writing.
+
+    Each file is written to its own unique .part file (staged_path). The
+    ingestion job renames it into place under the manifest's source lock
+    (promote_staged), so two uploads of the same name never overwrite a
+    file another job is still parsing, and readers never see a
+    half-written PDF. The SHA-256 comes from the same pass. Raises
+    ValueError for a file without a usable name, or for two files with
+    the same name (they would be stored, and tracked by their job, as one
+    document); on any error nothing written by this call is left behind.
+    """
+    names=[upload_name(file.filename) for file in files]
+    duplicates=sorted({name for name in names if names.count(name)>1})
+    if duplicates:
+        raise ValueError(f"Duplicate file names in one upload: {', '.join(duplicates)}")
+    directory=upload_dir(namespace)
+    os.makedirs(directory,exist_ok=True)
+    saved=[]
+    try:
+        for file,name in zip(files,names):
+            digest=hashlib.sha256()
+            size=0
+            part=tempfile.NamedTemporaryFile("wb",dir=directory,suffix=".part",delete=False)
+            written=False
+            try:
+                os.chmod(part.name,UPLOAD_FILE_MODE)
+                with timed("ingest","save"),part:
+                    while chunk:=file.file.read(UPLOAD_CHUNK_SIZE):
+                        digest.update(chunk)
+                        part.write(chunk)
+                        size+=len(chunk)
+                written=True
+            finally:
+                if not written:
+                    os.unlink(part.name)    # a read failed mid-copy
+            saved.append(SavedFile(os.path.join(directory,name),digest.hexdigest(),size,part.name))
+    except BaseException:
+        discard_staged(saved)
+        raise
+    return saved
+
+
+def promote_staged(saved_files:list[SavedFile]):
+    # Call with the manifest's lock on these paths held
+    for saved in saved_files:
+        os.replace(saved.staged_path,saved.path)
+
+
+def discard_staged(saved_files:list[SavedFile]):
+    # Uploads whose job never promoted them (queue full, job failed early)
+    for saved in saved_files:
+        try:
+            os.unlink(saved.staged_path)
+        except FileNotFoundError:
+            pass
+
+
+def get_parse_pool(workers:int=None)->ProcessPoolExecutor:
+    # One pool per process, created on first use
+    global _parse_pool
+    if _parse_pool is None:
+        context=multiprocessing.get_context(PARSE_START_METHOD)
+        if PARSE_START_METHOD=="forkserver":
+            # Import the parser (pypdf, chunker) once in the fork server
+            context.set_forkserver_preload(["server.modules.pdf_handlers"])
+        _parse_pool=ProcessPoolExecutor(
+            max_workers=workers or PARSE_WORKERS,
+            mp_context=context
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool=None
+
+
+def _extract_page_range(file_path:str,start:int,end:int,split:bool=False,tokenizer_path:Optional[str]=None):
+    # Runs in a worker process; parse (and split) times are reported back to the parent.
+    # Chunks are sized with the server's tokenizer, loaded from the path it resolved
+    from pypdf import PdfReader
+    began=time.perf_counter()
+    reader=PdfReader(file_path)
+    texts=[reader.pages[i].extract_text() or "" for i in range(start,end)]
+    parsed=time.perf_counter()
+    if not split:
+        return texts,parsed-began,None,0.0
+
+    from server.modules.chunker import split_pages
+    from server.modules.tokenizer import worker_tokenizer
+    chunks=split_pages(texts,worker_tokenizer(tokenizer_path))
+    return texts,parsed-began,chunks,time.perf_counter()-parsed
+
+
+def submit_pdf_parse(file_path:str,pool:ProcessPoolExecutor=None,pages_per_task:int=PARSE_PAGES_PER_TASK,
+                     split:bool=False,tokenizer_path:Optional[str]=None):
+    """Fan a PDF out to the parse pool in page ranges.
+
+    Returns (page_count, futures) where each future yields the results of
+    one range, in page order. With split, the workers also cut each page
+    into chunks (chunker.split_pages), so splitting runs in parallel too,
+    counting tokens with the tokenizer.json at tokenizer_path (the
+    server's tokenizer; None = heuristic counts).
+    """
+    from pypdf import PdfReader
+    pool=pool or get_parse_pool()
+    page_count=len(PdfReader(file_path).pages)
+    futures=[
+        (start,pool.submit(_extract_page_range,file_path,start,min(start+pages_per_task,page_count),split,
+                           tokenizer_path))
+        for start in range(0,page_count,pages_per_task)
+    ]
+    return page_count,futures
+
+
+def iter_parsed_pages(file_path:str,page_count:int,futures):
+    """Yield a ParsedPage per page, as soon as its page range is parsed.
 
-def save_uploaded_files(files:list[UploadFile])-> list[str]:
-    os.makedirs(UPLOAD_DIR,exist_ok=True)
-    file_path=[]
-    for file in files:
-        temp_path=os.path.join(UPLOAD_DIR,file.filename)
-        with open(temp_path,"wb") as f:
-            shutil.copyfileobj(file.file,f)
-        file_path.append(temp_path)
-    return file_path
\ No newline at end of file
+    Document metadata matches PyPDFLoader's "source"/"page" keys; chunks
+    is None unless the range was split in the worker.
+    """
+    for start,future in futures:
+        texts,seconds,chunks,split_seconds=future.result()
+        observe_stage("ingest","parse",seconds)
+        if chunks is not None:
+            observe_stage("ingest","split",split_seconds)
+        for offset,text in enumerate(texts):
+            document=Document(
+                page_content=text,
+                metadata={"source":file_path,"page":start+offset,"total_pages":page_count}
+            )
+            yield ParsedPage(document,chunks[offset] if chunks is not None else None)
@@ -0,0 +1,170 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Namespaces become directory names and index keys
+_NAMESPACE_RE = re.compile(r"^[A-Za-z0-9_-]{0,64}$")
+
+
+def validate_namespace(namespace: str) -> str:
+    namespace = (namespace or "").strip()
+    if not _NAMESPACE_RE.match(namespace):
+        raise ValueError("namespace must be at most 64 letters, digits, '-' or '_'")
+    return namespace
+
+
+class MetadataFilter(NamedTuple):
+    """Metadata restrictions applied before scoring.
+
+    sources are full source paths as stored in chunk metadata; pages are
+    0-based and inclusive, like the stored "page" metadata.
+    """
+    sources: Tuple[str, ...] = ()
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+    doc_type: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not self.sources and self.page_min is None and self.page_max is None and not self.doc_type
+
+    def key(self) -> str:
+        """Stable string form, e.g. to scope cached answers."""
+        if self.is_empty():
+            return ""
+        return f"{','.join(sorted(self.sources))}|{self.page_min}|{self.page_max}|{self.doc_type or ''}"
+
+    def to_pinecone(self):
+        """Pinecone metadata filter expression, or None."""
+        clauses = {}
+        if self.sources:
+            clauses["source"] = {"$in": list(self.sources)}
+        page = {}
+        if self.page_min is not None:
+            page["$gte"] = self.page_min
+        if self.page_max is not None:
+            page["$lte"] = self.page_max
+        if page:
+            clauses["page"] = page
+        if self.doc_type:
+            clauses["doc_type"] = {"$eq": self.doc_type}
+        return clauses or None
+
+    def matches(self, metadata) -> bool:
+        if self.sources and metadata.get("source") not in self.sources:
+            return False
+        page = metadata.get("page")
+        if self.page_min is not None and (page is None or page < self.page_min):
+            return False
+        if self.page_max is not None and (page is None or page > self.page_max):
+            return False
+        if self.doc_type and metadata.get("doc_type") != self.doc_type:
+            return False
+        return True
+
+
+class MetadataColumns:
+    """Local pre-filter index: namespace, source, page and doc type per row.
+
+    Held as numpy columns next to a row-addressed index (vector store rows,
+    BM25 doc numbers), plus the live rows of each namespace, so a query can
+    restrict itself to one tenant's rows (cost proportional to the tenant,
+    not the corpus) and evaluate filters without touching stored metadata.
+    """
+
+    def __init__(self):
+        self._codes = {"namespace": {}, "source": {}, "doc_type": {"": 0}}
+        self._ns = np.full(0, -1, dtype=np.int32)
+        self._source = np.zeros(0, dtype=np.int32)
+        self._page = np.zeros(0, dtype=np.int32)
+        self._doc_type = np.zeros(0, dtype=np.int32)
+        self._ns_rows = {}      # namespace code -> set of rows
+        self._ns_arrays = {}    # namespace code -> sorted row array (cache)
+
+    def _code(self, column, value):
+        codes = self._codes[column]
+        return codes.setdefault(value, len(codes))
+
+    def _grow(self, row):
+        if row < len(self._ns):
+            return
+        size = max(row + 1, 2 * len(self._ns), 1024)
+        extra = size - len(self._ns)
+        self._ns = np.concatenate([self._ns, np.full(extra, -1, dtype=np.int32)])
+        self._source = np.concatenate([self._source, np.zeros(extra, dtype=np.int32)])
+        self._page = np.concatenate([self._page, np.zeros(extra, dtype=np.int32)])
+        self._doc_type = np.concatenate([self._doc_type, np.zeros(extra, dtype=np.int32)])
+
+    def set(self, row, namespace, metadata):
+        self.remove(row)
+        self._grow(row)
+        metadata = metadata or {}
+        code = self._code("namespace", namespace)
+        page = metadata.get("page")
+        self._ns[row] = code
+        self._source[row] = self._code("source", metadata.get("source") or "")
+        self._page[row] = page if isinstance(page, int) else -1
+        self._doc_type[row] = self._code("doc_type", metadata.get("doc_type") or "")
+        self._ns_rows.setdefault(code, set()).add(row)
+        self._ns_arrays.pop(code, None)
+
+    def remove(self, row):
+        if row >= len(self._ns) or self._ns[row] < 0:
+            return
+        code = int(self._ns[row])
+        self._ns_rows[code].discard(row)
+        self._ns_arrays.pop(code, None)
+        self._ns[row] = -1
+
+    def take(self, rows) -> "MetadataColumns":
+        """Copy holding only `rows` (sorted), renumbered 0..len(rows) - 1."""
+        taken = MetadataColumns()
+        taken._codes = {column: dict(codes) for column, codes in self._codes.items()}
+        taken._ns = self._ns[rows].copy()
+        taken._source = self._source[rows].copy()
+        taken._page = self._page[rows].copy()
+        taken._doc_type = self._doc_type[rows].copy()
+        for row, code in enumerate(taken._ns.tolist()):
+            if code >= 0:
+                taken._ns_rows.setdefault(code, set()).add(row)
+        return taken
+
+    def namespace_size(self, namespace) -> int:
+        code = self._codes["namespace"].get(namespace)
+        return len(self._ns_rows.get(code, ())) if code is not None else 0
+
+    def rows(self, namespace) -> np.ndarray:
+        """Live rows of `namespace`, sorted."""
+        code = self._codes["namespace"].get(namespace)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        rows = self._ns_arrays.get(code)
+        if rows is None:
+            rows = self._ns_arrays[code] = np.array(sorted(self._ns_rows.get(code, ())), dtype=np.int64)
+        return rows
+
+    def match(self, rows, namespace, metadata_filter=None) -> np.ndarray:
+        """Boolean mask over `rows`: live, in `namespace` and passing the filter."""
+        code = self._codes["namespace"].get(namespace)
+        if code is None:
+            return np.zeros(len(rows), dtype=bool)
+        mask = self._ns[rows] == code
+        if metadata_filter is None or metadata_filter.is_empty():
+            return mask
+        if metadata_filter.sources:
+            codes = [self._codes["source"][s] for s in metadata_filter.sources if s in self._codes["source"]]
+            mask &= np.isin(self._source[rows], codes)
+        if metadata_filter.page_min is not None:
+            mask &= self._page[rows] >= metadata_filter.page_min
+        if metadata_filter.page_max is not None:
+            mask &= (self._page[rows] <= metadata_filter.page_max) & (self._page[rows] >= 0)
+        if metadata_filter.doc_type:
+            mask &= self._doc_type[rows] == self._codes["doc_type"].get(metadata_filter.doc_type, -1)
+        return mask
+
+    def select(self, namespace, metadata_filter=None) -> np.ndarray:
+        """Rows of `namespace` passing the filter (the pre-filtered candidate set)."""
+        rows = self.rows(namespace)
+        if metadata_filter is None or metadata_filter.is_empty():
+            return rows
+        return rows[self.match(rows, namespace, metadata_filter)]
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+from collections import Counter, deque
+
+import numpy as np
+from dotenv import load_dotenv
+
+from server.logger import logger
+from server.modules.metrics import metrics
+
+load_dotenv()
+
+QUERY_BATCH_ENABLED = os.getenv("QUERY_BATCH_ENABLED", "true").lower() == "true"
+# How long the first query of a batch waits for others to join
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+# A batch is sent as soon as it holds this many queries
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+
+
+class QueryEmbeddingBatcher:
+    """Coalesces concurrent query embeddings into one embed_documents call.
+
+    The first query to arrive opens a batch and arms a timer of window_ms;
+    the batch is flushed when the timer fires or max_size queries have
+    joined, whichever comes first. Every caller awaits its own future.
+    The loop only holds tasks weakly, so in-flight batch tasks are kept in
+    _tasks until done; close() cancels them on shutdown.
+    Batch sizes and the delay each query spent waiting for its batch are
+    kept for stats().
+    """
+
+    def __init__(self, embedder, window_ms=QUERY_BATCH_WINDOW_MS, max_size=QUERY_BATCH_MAX_SIZE,
+                 delay_samples=10000):
+        self.embedder = embedder
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._pending = []          # (text, future, enqueued_at)
+        self._timer = None
+        self._tasks = set()
+        self._batch_sizes = Counter()
+        self._delays = deque(maxlen=delay_samples)
+        self._errors = 0
+
+    async def embed_query(self, text: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        started = time.perf_counter()
+        self._batch_sizes[len(batch)] += 1
+        self._delays.extend(started - enqueued for _, _, enqueued in batch)
+        metrics.observe("query_embedding_batch_size", len(batch))
+        for _, _, enqueued in batch:
+            # Not observe_stage: this task runs in the first caller's context
+            metrics.observe("rag_stage_duration_seconds", started - enqueued, pipeline="ask", stage="embed_queue")
+        try:
+            vectors = await self.embedder.aembed_documents([text for text, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            self._errors += 1
+            logger.warning(f"Batched query embedding failed for {len(batch)} queries: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():  # caller may have been cancelled
+                future.set_result(vector)
+
+    def close(self):
+        """Cancel queued and in-flight batches; their callers get CancelledError."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        for _, future, _ in batch:
+            future.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self):
+        batches = sum(self._batch_sizes.values())
+        queries = sum(size * count for size, count in self._batch_sizes.items())
+        delays_ms = np.asarray(self._delays) * 1000
+        return {
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "batches": batches,
+            "queries": queries,
+            "errors": self._errors,
+            "mean_batch_size": round(queries / batches, 2) if batches else 0.0,
+            "batch_size_histogram": {str(size): self._batch_sizes[size] for size in sorted(self._batch_sizes)},
+            "queue_delay_ms": {
+                f"p{q}": round(float(np.percentile(delays_ms, q)), 2) if len(delays_ms) else 0.0
+                for q in (50, 95, 99)
+            },
+        }
@@ -1,40 +1,108 @@
-
 from server.logger import logger
+from server.modules.resilience import groq_breaker
 from langchain_core.messages import AIMessage
 
-def query_chain(chain, user_input: str):
+
+def _build_response(result, docs=()):
+    # ✅ Handle LangChain 1.x output correctly
+    if isinstance(result, dict):
+        answer = result["result"]
+        if isinstance(answer, AIMessage):
+            answer = answer.content
+
+        source_docs = result.get("source_documents", [])
+
+    elif isinstance(result, AIMessage):
+        answer = result.content
+        source_docs = []
+
+    else:
+        answer = str(result)
+        source_docs = []
+
+    # The chain is fed the retrieved docs directly, so cite those
+    source_docs = source_docs or list(docs)
+
+    return {
+        "response": answer,
+        "sources": [
+            doc.metadata.get("source", "")
+            for doc in source_docs
+        ]
+    }
+
+
+def query_chain(chain, user_input: str, docs=()):
     try:
         logger.debug(f"Running chain for input: {user_input}")
 
-        result = chain.invoke({"query": user_input})
+        result = groq_breaker.call(chain.invoke, {"question": user_input, "docs": list(docs)})
+        response = _build_response(result, docs)
 
-        # ✅ Handle LangChain 1.x output correctly
-        if isinstance(result, dict):
-            answer = result["result"]
-            if isinstance(answer, AIMessage):
-                answer = answer.content
+        logger.debug(f"Chain response: {response}")
+        return response
 
-            source_docs = result.get("source_documents", [])
+    except Exception:
+        logger.exception("Error on query chain")
+        raise
 
-        elif isinstance(result, AIMessage):
-            answer = result.content
-            source_docs = []
 
-        else:
-            answer = str(result)
-            source_docs = []
+async def aquery_chain(chain, user_input: str, docs=()):
+    # Async variant of query_chain: awaits the LLM without blocking the event loop
+    try:
+        logger.debug(f"Running chain (async) for input: {user_input}")
 
-        response = {
-            "response": answer,
-            "sources": [
-                doc.metadata.get("source", "")
-                for doc in source_docs
-            ]
-        }
+        result = await groq_breaker.acall(chain.ainvoke, {"question": user_input, "docs": list(docs)})
+        response = _build_response(result, docs)
 
         logger.debug(f"Chain response: {response}")
         return response
 
     except Exception:
-        logger.exception("Error on query chain")
+        logger.exception("Error on async query chain")
         raise
+
+
+async def astream_chain(chain, user_input: str, docs=()):
+    # Yields answer text as the LLM produces it (chain.astream)
+    groq_breaker.before_call()
+    try:
+        logger.debug(f"Streaming chain for input: {user_input}")
+
+        async for chunk in chain.astream({"question": user_input, "docs": list(docs)}):
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if text:
+                yield text
+
+    except Exception as exc:
+        groq_breaker.on_failure(exc)
+        logger.exception("Error on streaming query chain")
+        raise
+    except BaseException:
+        # Client went away mid-stream: no verdict on Groq either way
+        groq_breaker.release()
+        raise
+    groq_breaker.on_success()
+
+
+async def abatch_chain_as_completed(chain, questions, docs_lists, max_concurrency: int):
+    # Runs the chain over many questions (chain.abatch_as_completed), at most
+    # max_concurrency LLM calls at a time; yields (index, response) in
+    # completion order, with the exception as response for failed items
+    inputs = [{"question": q, "docs": list(docs)} for q, docs in zip(questions, docs_lists)]
+    logger.debug(f"Running chain (batch) for {len(inputs)} inputs")
+
+    groq_breaker.before_call()
+    try:
+        async for index, result in chain.abatch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            if isinstance(result, Exception):
+                groq_breaker.on_failure(result)
+                logger.warning(f"Batch item {index} failed: {result}")
+                yield index, result
+            else:
+                groq_breaker.on_success()
+                yield index, _build_response(result, docs_lists[index])
+    finally:
+        groq_breaker.release()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from server.logger import logger
+
+load_dotenv()
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Candidates scored by the cross-encoder before keeping RETRIEVAL_TOP_K
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", "30"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+# Past this budget reranking is abandoned and retrieval order is kept
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "8192"))
+
+
+class CrossEncoderReranker:
+    """CPU cross-encoder reranking with a latency budget and a score cache.
+
+    Pairs are scored in batches; the budget is checked before each batch,
+    and if it runs out the original (fused retrieval) order is returned.
+    Scores are cached per (query, chunk text) in an LRU, so repeated and
+    overlapping questions only score new pairs. The model loads on first use; if it
+    cannot be loaded, reranking is disabled and retrieval order is kept.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE,
+                 budget_ms=RERANK_BUDGET_MS, cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._stats = {"reranked": 0, "budget_exceeded": 0, "pairs_scored": 0, "pairs_cached": 0}
+
+    def load(self):
+        with self._lock:
+            if self._model is None and not self._failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    logger.info(f"Loaded reranker {self.model_name}")
+                except Exception:
+                    logger.exception(f"Could not load reranker {self.model_name}; keeping retrieval order")
+                    self._failed = True
+        return self._model
+
+    @staticmethod
+    def _key(query, text):
+        return hashlib.sha1(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def rerank(self, query, docs, top_n):
+        """Return (docs, reranked): the best top_n docs, and whether the cross-encoder ordered them."""
+        if len(docs) <= 1:
+            return docs[:top_n], False
+        model = self.load()
+        if model is None:
+            return docs[:top_n], False
+
+        start = time.perf_counter()
+        keys = [self._key(query, doc.page_content) for doc in docs]
+        with self._lock:
+            scores = {}
+            for k in keys:
+                if k in self._cache:
+                    scores[k] = self._cache[k]
+                    self._cache.move_to_end(k)
+            missing = [(k, doc) for k, doc in zip(keys, docs) if k not in scores]
+            missing = list({k: doc for k, doc in missing}.items())
+            # Counters too: rerank runs on several threadpool workers at once
+            self._stats["pairs_cached"] += len(docs) - len(missing)
+
+        for i in range(0, len(missing), self.batch_size):
+            if (time.perf_counter() - start) * 1000 > self.budget_ms:
+                with self._lock:
+                    self._stats["budget_exceeded"] += 1
+                logger.warning(f"Rerank budget of {self.budget_ms}ms exceeded; keeping retrieval order")
+                return docs[:top_n], False
+
+            batch = missing[i:i + self.batch_size]
+            predicted = model.predict([(query, doc.page_content) for _, doc in batch], batch_size=self.batch_size)
+            with self._lock:
+                self._stats["pairs_scored"] += len(batch)
+                for (key, _), score in zip(batch, predicted):
+                    scores[key] = self._cache[key] = float(score)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+
+        with self._lock:
+            self._stats["reranked"] += 1
+        order = sorted(range(len(docs)), key=lambda i: scores[keys[i]], reverse=True)
+        return [docs[i] for i in order[:top_n]], True
+
+    def stats(self) -> dict:
+        with self._lock:
+            pairs = self._stats["pairs_scored"] + self._stats["pairs_cached"]
+            return {
+                **self._stats,
+                "cache_hit_rate": round(self._stats["pairs_cached"] / pairs, 4) if pairs else 0.0,
+                "cache_entries": len(self._cache),
+                "model_loaded": self._model is not None,
+            }
+
+
+reranker = CrossEncoderReranker()
@@ -0,0 +1,208 @@
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from server.logger import logger
+
+load_dotenv()
+
+# Consecutive upstream failures that open a circuit, and how long it stays
+# open before a trial call (doubling while trials fail, up to the max)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "5"))
+CIRCUIT_MAX_RESET_SECONDS = float(os.getenv("CIRCUIT_MAX_RESET_SECONDS", "60"))
+
+
+def retry_with_backoff(fn, *args, attempts=4, base_delay=0.5, max_delay=8.0, retryable=None, **kwargs):
+    """Call fn(*args, **kwargs), retrying failures with exponential backoff + jitter
+    (stretched to the server's Retry-After, or an open circuit's, when given).
+
+    Only failures that retryable(exc) accepts are retried (default
+    is_retryable: timeouts, connection errors, 429, 5xx, open circuits);
+    anything else, such as a 4xx for a bad payload or credentials, is
+    re-raised at once. Re-raises the last exception once `attempts` calls
+    have failed.
+    """
+    retryable = retryable or is_retryable
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as exc:
+            if attempt == attempts or not retryable(exc):
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+            delay *= 0.5 + random.random() / 2
+            # An open circuit or a rate-limited upstream says when to come back
+            hint = getattr(exc, "retry_after", None) or upstream_retry_after(exc)
+            if hint:
+                delay = min(max_delay, max(delay, hint))
+            logger.warning(
+                f"{getattr(fn, '__name__', fn)} failed ({exc}); "
+                f"retry {attempt}/{attempts - 1} in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+
+# -------------------------
+# Circuit breakers around the remote backends (Groq, HF endpoint, Pinecone)
+# -------------------------
+def upstream_status(exc):
+    """HTTP status carried by a client library exception (groq, httpx,
+    huggingface_hub, pinecone all expose it one of these ways), else None."""
+    for candidate in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status"):
+            status = getattr(candidate, attr, None)
+            if isinstance(status, int):
+                return status
+    return None
+
+
+def upstream_retry_after(exc):
+    """Seconds from the Retry-After header of an upstream error response, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def is_upstream_failure(exc) -> bool:
+    # Timeouts / connection errors carry no status; 4xx other than 429 are our bug, not an outage
+    status = upstream_status(exc)
+    return status is None or status == 429 or status >= 500
+
+
+# Exception class names (of any library) that mean the request may not have
+# reached the server, or it did not answer in time
+_TRANSIENT_NAMES = ("Timeout", "Connect", "Network", "RemoteProtocol")
+
+
+def is_retryable(exc) -> bool:
+    """True for failures worth trying again: timeouts, connection errors,
+    429 and 5xx responses, and open circuits (they say when to come back)."""
+    if isinstance(exc, CircuitOpenError):
+        return True
+    status = upstream_status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in cls.__name__ for cls in type(exc).__mro__ for name in _TRANSIENT_NAMES)
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (circuit open); retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stops calling a backend that keeps failing, and probes it with backoff.
+
+    closed: calls go through; failure_threshold consecutive upstream
+    failures open the circuit. open: calls fail fast with CircuitOpenError
+    for reset_timeout. half-open: one trial call goes through; success
+    closes the circuit, failure re-opens it with the timeout doubled (up to
+    max_reset_timeout).
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout=CIRCUIT_RESET_SECONDS, max_reset_timeout=CIRCUIT_MAX_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self._state == "open":
+                remaining = self._opened_at + self._timeout - time.monotonic()
+                if remaining > 0:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._state = "half_open"
+            if self._state == "half_open":
+                if self._trial_running:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, self._timeout)
+                self._trial_running = True
+            self._stats["calls"] += 1
+
+    def on_success(self):
+        with self._lock:
+            if self._state == "half_open":
+                logger.info(f"Circuit {self.name} closed")
+            self._state = "closed"
+            self._failures = 0
+            self._timeout = self.reset_timeout
+            self._trial_running = False
+
+    def on_failure(self, exc):
+        with self._lock:
+            self._trial_running = False
+            if not is_upstream_failure(exc):
+                return
+            self._stats["failures"] += 1
+            self._failures += 1
+            if self._state == "half_open":
+                self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+            elif self._failures < self.failure_threshold:
+                return
+            self._state = "open"
+            self._opened_at = time.monotonic()
+            self._stats["opened"] += 1
+            logger.warning(f"Circuit {self.name} open for {self._timeout:.0f}s after: {exc}")
+
+    def release(self):
+        """End a call without a verdict (cancelled, or its caller went away)."""
+        with self._lock:
+            self._trial_running = False
+
+    def call(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self.on_failure(exc)
+            raise
+        self.on_success()
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as exc:
+            self.on_failure(exc)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.on_success()
+        return result
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"state": self._state, **self._stats}
+
+
+groq_breaker = CircuitBreaker("groq")
+hf_breaker = CircuitBreaker("hf_endpoint")
+pinecone_breaker = CircuitBreaker("pinecone")
+
+
+def circuit_status() -> dict:
+    return {b.name: b.status() for b in (groq_breaker, hf_breaker, pinecone_breaker)}
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from server.logger import logger
+
+load_dotenv()
+
+# "background" (default): warm resources after the port is open
+# "blocking": warm before serving; "lazy": build each on first use
+RESOURCE_WARMUP = os.getenv("RESOURCE_WARMUP", "background").lower()
+
+
+class ResourceRegistry:
+    """Named process-wide resources, built once on first use.
+
+    Factories import their heavy dependencies themselves, so importing the
+    app stays cheap. get() builds under a per-resource lock (concurrent
+    callers wait for the same instance); the lifespan warms everything in
+    background threads and closes what was built on shutdown.
+    """
+
+    def __init__(self):
+        self._factories = {}    # name -> (factory, close)
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.build_ms = {}
+        self.errors = {}
+
+    def register(self, name, factory, close=None):
+        self._factories[name] = (factory, close)
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        if name in self._instances:
+            return self._instances[name]
+        factory, _ = self._factories[name]
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.perf_counter()
+                instance = factory()
+                self.build_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+                logger.info(f"Resource {name} ready in {self.build_ms[name]}ms")
+                with self._lock:
+                    self._instances[name] = instance
+        return self._instances[name]
+
+    async def aget(self, name):
+        # Fast path without a threadpool hop once built
+        if name in self._instances:
+            return self._instances[name]
+        return await run_in_threadpool(self.get, name)
+
+    async def warm_up(self, names=None):
+        async def warm(name):
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception as e:
+                logger.exception(f"Warm-up of {name} failed; it will be retried on first use")
+                self.errors[name] = str(e)
+
+        await asyncio.gather(*(warm(name) for name in (names or list(self._factories))))
+
+    def close(self):
+        with self._lock:
+            built = list(self._instances.items())
+            self._instances.clear()
+        for name, instance in reversed(built):
+            _, close = self._factories[name]
+            if close is not None:
+                try:
+                    close(instance)
+                except Exception:
+                    logger.exception(f"Error closing {name}")
+
+    def status(self):
+        return {
+            "ready": sorted(self._instances),
+            "pending": sorted(set(self._factories) - set(self._instances)),
+            "build_ms": dict(self.build_ms),
+            "errors": dict(self.errors),
+        }
+
+
+resources = ResourceRegistry()
+
+
+# -------------------------
+# Registrations (imports stay inside the factories)
+# -------------------------
+def _llm_chain():
+    from server.modules.llm import get_llm_chain
+    return get_llm_chain()
+
+
+def _embedder():
+    from server.modules.embeddings import get_embedder
+    return get_embedder()
+
+
+def _query_batcher():
+    from server.modules.query_batcher import QueryEmbeddingBatcher
+    return QueryEmbeddingBatcher(resources.get("embedder"))
+
+
+def _vector_store():
+    from server.modules.vectorstore import get_vector_store
+    return get_vector_store()
+
+
+def _bm25_index():
+    from server.modules.bm25 import get_bm25_index
+    return get_bm25_index()
+
+
+def _manifest():
+    from server.modules.manifest import get_manifest
+    return get_manifest()
+
+
+def _tokenizer():
+    from server.modules.tokenizer import get_tokenizer
+    return get_tokenizer()
+
+
+def _reranker():
+    from server.modules.reranker import RERANK_ENABLED, reranker
+    if RERANK_ENABLED:
+        reranker.load()
+    return reranker
+
+
+def _extractive():
+    from server.modules.extractive import EXTRACTIVE_ENABLED, extractive_answerer
+    if EXTRACTIVE_ENABLED:
+        extractive_answerer.qa_model.load()
+    return extractive_answerer
+
+
+resources.register("llm_chain", _llm_chain)
+resources.register("embedder", _embedder)
+resources.register("query_batcher", _query_batcher, close=lambda batcher: batcher.close())
+resources.register("vector_store", _vector_store)
+resources.register("bm25_index", _bm25_index)
+resources.register("manifest", _manifest, close=lambda manifest: manifest.close())
+resources.register("tokenizer", _tokenizer)
+resources.register("reranker", _reranker)
+resources.register("extractive", _extractive)
@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.documents import Document
+
+from server.modules.reranker import RERANK_ENABLED, RERANK_FETCH_K
+from server.modules.resources import resources
+from server.modules.timing import StageTimer
+
+load_dotenv()
+
+# Chunks handed to the LLM
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+# Candidates fetched from each retriever before fusion
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "10"))
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+# Reciprocal-rank fusion constant (60 is the usual default)
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def reciprocal_rank_fusion(result_lists, k=RRF_K):
+    """Merge ranked match lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores, matches = {}, {}
+    for results in result_lists:
+        for rank, match in enumerate(results, start=1):
+            scores[match["id"]] = scores.get(match["id"], 0.0) + 1.0 / (k + rank)
+            matches.setdefault(match["id"], match)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [{**matches[vid], "score": scores[vid]} for vid in ranked]
+
+
+def _to_documents(matches):
+    return [
+        Document(
+            page_content=m["metadata"].get("text", ""),
+            metadata=m["metadata"]
+        )
+        for m in matches
+    ]
+
+
+async def retrieve(question: str, embedded_query, timer: StageTimer, top_k=RETRIEVAL_TOP_K,
+                   namespace="", metadata_filter=None):
+    """Dense (vector store) + sparse (BM25) retrieval fused with RRF.
+
+    Both retrievers search only `namespace` and pre-filter by
+    `metadata_filter` (a prefilter.MetadataFilter) before scoring.
+
+    Both retrievers run concurrently off the event loop; their latencies
+    are recorded as "retrieve_dense" / "retrieve_sparse", the whole step
+    as "retrieve". With reranking enabled, RERANK_FETCH_K fused candidates
+    are rescored by the cross-encoder ("rerank") before keeping top_k.
+    """
+    vector_store = await resources.aget("vector_store")
+    bm25_index = await resources.aget("bm25_index")
+    fetch_k = max(RETRIEVAL_FETCH_K, RERANK_FETCH_K) if RERANK_ENABLED else RETRIEVAL_FETCH_K
+
+    async def dense():
+        with timer.stage("retrieve_dense"):
+            response = await run_in_threadpool(
+                vector_store.query,
+                vector=embedded_query,
+                top_k=fetch_k if HYBRID_RETRIEVAL or RERANK_ENABLED else top_k,
+                include_metadata=True,
+                namespace=namespace,
+                metadata_filter=metadata_filter
+            )
+        # Pinecone returns model objects; normalize to plain dicts
+        return [
+            {"id": m["id"], "score": m["score"], "metadata": m["metadata"]}
+            for m in response.get("matches", [])
+        ]
+
+    async def sparse():
+        with timer.stage("retrieve_sparse"):
+            response = await run_in_threadpool(bm25_index.query, question, fetch_k, namespace, metadata_filter)
+        return response["matches"]
+
+    with timer.stage("retrieve"):
+        if HYBRID_RETRIEVAL:
+            dense_matches, sparse_matches = await asyncio.gather(dense(), sparse())
+            with timer.stage("fuse"):
+                candidates = reciprocal_rank_fusion([dense_matches, sparse_matches])
+        else:
+            candidates = await dense()
+
+    if not RERANK_ENABLED:
+        return _to_documents(candidates[:top_k])
+
+    reranker = await resources.aget("reranker")
+    with timer.stage("rerank"):
+        docs, _ = await run_in_threadpool(
+            reranker.rerank, question, _to_documents(candidates[:RERANK_FETCH_K]), top_k
+        )
+    return docs
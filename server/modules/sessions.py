@@ -0,0 +1,217 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from dotenv import load_dotenv
+
+from server.modules.vectors import unit_vector
+
+load_dotenv()
+
+SESSIONS_ENABLED = os.getenv("SESSIONS_ENABLED", "true").lower() == "true"
+# Sessions kept in memory; the least recently used one is dropped beyond this
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Turns kept per session, and characters kept of each question / answer
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+SESSION_MAX_TURN_CHARS = int(os.getenv("SESSION_MAX_TURN_CHARS", "600"))
+# Previous questions folded into the retrieval query of a follow-up
+SESSION_CONDENSE_TURNS = int(os.getenv("SESSION_CONDENSE_TURNS", "2"))
+# Cosine similarity between this turn's and the previous turn's retrieval
+# query above which the previous turn's chunks are reused as they are
+SESSION_REUSE_SIMILARITY = float(os.getenv("SESSION_REUSE_SIMILARITY", "0.85"))
+
+# Session ids come from the client; they are only dictionary keys
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# "and what about the dosage?", "is it safe?", "what else"
+_FOLLOW_UP_START_RE = re.compile(
+    r"^(?:and|but|also|so|then|what about|how about|what else|why|how come)\b", re.IGNORECASE
+)
+# Only pronouns that cannot be resolved without the earlier turns: "this
+# report", "her glucose" or "my hemoglobin" stand on their own
+_ANAPHORA_RE = re.compile(r"\b(?:it|its|it's|they|them|that one|those ones)\b", re.IGNORECASE)
+
+
+def validate_session_id(session_id):
+    session_id = (session_id or "").strip()
+    if not session_id:
+        return None
+    if not _SESSION_ID_RE.match(session_id):
+        raise ValueError("session_id must be 1-64 letters, digits, '-' or '_'")
+    return session_id
+
+
+def is_follow_up(question: str) -> bool:
+    question = question.strip()
+    return bool(
+        _FOLLOW_UP_START_RE.match(question)
+        or _ANAPHORA_RE.search(question)
+    )
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SESSION_MAX_TURN_CHARS else text[:SESSION_MAX_TURN_CHARS - 1] + "…"
+
+
+class _Session:
+    __slots__ = ("turns", "scope", "query_embedding", "docs", "expires_at")
+
+    def __init__(self):
+        self.turns = deque(maxlen=SESSION_MAX_TURNS)   # (question, answer)
+        # Retrieval of the last turn: its scope, query embedding and final docs
+        self.scope = None
+        self.query_embedding = None
+        self.docs = None
+        self.expires_at = 0.0
+
+
+class SessionTurn:
+    """What a question needs from its session, read once before answering.
+
+    retrieval_query is the question, or for a follow-up the recent
+    questions and the new one joined together; llm_question adds the
+    recent turns so the model can resolve "it" / "the dosage".
+    """
+
+    def __init__(self, question, history=(), follow_up=False):
+        self.question = question
+        self.history = list(history)
+        self.follow_up = follow_up and bool(self.history)
+        if self.follow_up:
+            recent = [q for q, _ in self.history[-SESSION_CONDENSE_TURNS:]]
+            self.retrieval_query = " ".join(recent + [question])
+        else:
+            self.retrieval_query = question
+
+    @property
+    def llm_question(self):
+        if not self.follow_up:
+            return self.question
+        lines = ["Conversation so far:"]
+        for question, answer in self.history[-SESSION_CONDENSE_TURNS:]:
+            lines.append(f"User: {question}")
+            lines.append(f"Assistant: {answer}")
+        lines.append(f"\nFollow-up question: {self.question}")
+        return "\n".join(lines)
+
+
+class SessionStore:
+    """Bounded per-conversation memory for /ask/.
+
+    Keeps the last few turns of each session (clipped) and the chunks
+    retrieved for its last turn. Sessions are keyed by (namespace,
+    session_id), so a session id never reaches another tenant's history;
+    they are evicted LRU beyond max_sessions and expire when idle for the
+    TTL. Reused chunks are dropped when their document is re-ingested.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS,
+                 reuse_similarity=SESSION_REUSE_SIMILARITY):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.reuse_similarity = reuse_similarity
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "turns": 0,
+            "follow_ups": 0,
+            "reused": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    # -------------------------
+    # Lookup
+    # -------------------------
+    def begin_turn(self, namespace: str, session_id, question: str) -> SessionTurn:
+        if session_id is None:
+            return SessionTurn(question)
+        with self._lock:
+            session = self._live_session((namespace, session_id))
+            history = list(session.turns) if session is not None else []
+            turn = SessionTurn(question, history, is_follow_up(question))
+            self._stats["turns"] += 1
+            self._stats["follow_ups"] += turn.follow_up
+            return turn
+
+    def reusable_docs(self, namespace: str, session_id, scope: str, query_embedding):
+        """The previous turn's chunks if this turn asks about the same thing, else None."""
+        if session_id is None:
+            return None
+        with self._lock:
+            session = self._live_session((namespace, session_id))
+            if session is None or not session.docs or session.scope != scope:
+                return None
+            if float(unit_vector(query_embedding) @ session.query_embedding) < self.reuse_similarity:
+                return None
+            self._stats["reused"] += 1
+            return list(session.docs)
+
+    # -------------------------
+    # Update
+    # -------------------------
+    def end_turn(self, namespace: str, session_id, turn: SessionTurn, answer: str,
+                 scope: str = None, query_embedding=None, docs=None):
+        """Record a finished turn; with docs, remember them for the next one.
+
+        Without docs (answered from the cache) the earlier turn's chunks are
+        forgotten, so the next turn is never compared against a turn older
+        than the one it follows.
+        """
+        if session_id is None:
+            return
+        key = (namespace, session_id)
+        with self._lock:
+            session = self._live_session(key)
+            if session is None:
+                session = self._sessions[key] = _Session()
+            session.turns.append((_clip(turn.question), _clip(answer)))
+            if docs is not None:
+                session.scope = scope
+                session.query_embedding = unit_vector(query_embedding)
+                session.docs = tuple(docs)
+            else:
+                session.scope = session.query_embedding = session.docs = None
+            session.expires_at = time.monotonic() + self.ttl_seconds
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_source(self, source: str) -> int:
+        """Forget reusable chunks that came from `source` (turns are kept)."""
+        dropped = 0
+        with self._lock:
+            for session in self._sessions.values():
+                if session.docs and any(d.metadata.get("source") == source for d in session.docs):
+                    session.docs = session.query_embedding = None
+                    dropped += 1
+            self._stats["invalidations"] += dropped
+        return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "sessions": len(self._sessions)}
+
+    # -------------------------
+    # Internals (call with lock held)
+    # -------------------------
+    def _live_session(self, key):
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        if session.expires_at < time.monotonic():
+            del self._sessions[key]
+            self._stats["expirations"] += 1
+            return None
+        return session
+
+
+# Process-wide store shared by /ask/ and load_vectorstore (for invalidation)
+session_store = SessionStore()
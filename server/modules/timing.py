@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+
+from server.modules.metrics import observe_stage
+
+
+class StageTimer:
+    """Collects per-stage wall-clock timings for one request (in ms).
+
+    Every recorded stage is also aggregated into the process-wide
+    rag_stage_duration_seconds histogram under `pipeline`.
+    """
+
+    def __init__(self, pipeline="ask"):
+        self._start = time.perf_counter()
+        self.pipeline = pipeline
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.timings[name] = round(seconds * 1000, 2)
+        observe_stage(self.pipeline, name, seconds)
+
+    def since_start(self):
+        return time.perf_counter() - self._start
+
+    def as_dict(self):
+        return {**self.timings, "total": round(self.since_start() * 1000, 2)}
@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from server.logger import logger
+
+load_dotenv()
+
+# Tokenizer of the answering model (llama-3.1-8b-instant on Groq)
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "NousResearch/Meta-Llama-3.1-8B-Instruct")
+# How long the server waits for the hub to download a tokenizer that is not
+# cached yet before falling back to heuristic counts
+TOKENIZER_HUB_TIMEOUT_SECONDS = float(os.getenv("TOKENIZER_HUB_TIMEOUT_SECONDS", "10"))
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class HeuristicTokenizer:
+    """Fallback when the real tokenizer cannot be loaded (offline, no hub access).
+
+    Counts words and punctuation, scaled up slightly to err on the side
+    of over-estimating BPE tokens.
+    """
+
+    name = "heuristic"
+    path = None
+
+    def count(self, text: str) -> int:
+        return int(len(_WORD_RE.findall(text)) * 1.3) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        words = list(_WORD_RE.finditer(text))
+        keep = int(max(max_tokens - 1, 0) / 1.3)
+        if len(words) <= keep:
+            return text
+        return text[:words[keep].start()].rstrip() if keep else ""
+
+
+class HFTokenizer:
+    """Counts and truncates with a Hugging Face `tokenizers` tokenizer.
+
+    path is the local tokenizer.json it was read from, so parse workers
+    can load the very same one.
+    """
+
+    def __init__(self, tokenizer, name, path):
+        self._tokenizer = tokenizer
+        self.name = name
+        self.path = path
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self._tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        return text[:encoding.offsets[max_tokens - 1][1]]
+
+
+def _tokenizer_file(name, timeout) -> str:
+    """Local tokenizer.json for a file, a directory or a hub repo id."""
+    if os.path.isfile(name):
+        return name
+    if os.path.isdir(name):
+        return os.path.join(name, "tokenizer.json")
+
+    from huggingface_hub import hf_hub_download
+    try:
+        return hf_hub_download(name, "tokenizer.json", local_files_only=True)
+    except Exception:
+        pass
+
+    # Not cached: the hub client retries with backoff for ~20s when offline,
+    # so the download gets `timeout` seconds (it may still finish for next time)
+    result = {}
+
+    def download():
+        try:
+            result["path"] = hf_hub_download(name, "tokenizer.json", etag_timeout=timeout)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=download, name="tokenizer-download", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if "path" in result:
+        return result["path"]
+    raise result.get("error") or TimeoutError(f"no tokenizer from the hub within {timeout:g}s")
+
+
+def load_tokenizer(path, name=TOKENIZER_NAME):
+    """Tokenizer read from a local tokenizer.json; the heuristic for None."""
+    if path is None:
+        return HeuristicTokenizer()
+    from tokenizers import Tokenizer
+    return HFTokenizer(Tokenizer.from_file(path), name, path)
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """Process-wide tokenizer for TOKENIZER_NAME, or the heuristic fallback.
+
+    Resolved in the server process only; parse workers are given its path
+    (worker_tokenizer), so they never wait on the hub and always count
+    with the same tokenizer.
+    """
+    try:
+        tokenizer = load_tokenizer(_tokenizer_file(TOKENIZER_NAME, TOKENIZER_HUB_TIMEOUT_SECONDS), TOKENIZER_NAME)
+        logger.info(f"Loaded tokenizer {TOKENIZER_NAME}")
+        return tokenizer
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {TOKENIZER_NAME} ({e}); using heuristic token counts")
+        return HeuristicTokenizer()
+
+
+@lru_cache(maxsize=None)
+def worker_tokenizer(path):
+    """A parse worker's tokenizer: the server's, from its path (None = heuristic)."""
+    return load_tokenizer(path)
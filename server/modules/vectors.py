@@ -0,0 +1,8 @@
+import numpy as np
+
+
+def unit_vector(vector):
+    """vector as float32 scaled to length 1 (a zero vector is returned as is)."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,330 @@
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+from dotenv import load_dotenv
+
+from server.logger import logger
+from server.modules.prefilter import MetadataColumns
+from server.modules.resilience import pinecone_breaker
+
+load_dotenv()
+
+# "pinecone" (default) or "local"
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1024"))
+
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "./cache/vectors")
+# Below this many vectors search is exact (brute force); above it an IVF index is used
+LOCAL_ANN_THRESHOLD = int(os.getenv("LOCAL_ANN_THRESHOLD", "20000"))
+# IVF lists probed per query (higher = better recall, slower)
+LOCAL_ANN_NPROBE = int(os.getenv("LOCAL_ANN_NPROBE", "8"))
+
+
+class VectorStore:
+    """Minimal Pinecone-shaped interface shared by every backend.
+
+    vectors are (id, values, metadata) tuples; query returns
+    {"matches": [{"id", "score", "metadata"}, ...]} best first, searching
+    only `namespace` and, if given, rows passing `metadata_filter`
+    (a prefilter.MetadataFilter).
+    """
+
+    def upsert(self, vectors, namespace=""):
+        raise NotImplementedError
+
+    def query(self, vector, top_k, include_metadata=True, namespace="", metadata_filter=None):
+        raise NotImplementedError
+
+    def delete(self, ids, namespace=""):
+        raise NotImplementedError
+
+
+# -------------------------
+# Pinecone
+# -------------------------
+class PineconeVectorStore(VectorStore):
+    # Every call goes through the Pinecone circuit breaker (resilience.py)
+    def __init__(self, index):
+        self.index = index
+
+    def upsert(self, vectors, namespace=""):
+        return pinecone_breaker.call(self.index.upsert, vectors=list(vectors), namespace=namespace)
+
+    def query(self, vector, top_k, include_metadata=True, namespace="", metadata_filter=None):
+        # Namespaces and metadata filters are applied server-side by Pinecone
+        pinecone_filter = metadata_filter.to_pinecone() if metadata_filter is not None else None
+        return pinecone_breaker.call(
+            self.index.query,
+            vector=vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            namespace=namespace,
+            **({"filter": pinecone_filter} if pinecone_filter else {})
+        )
+
+    def delete(self, ids, namespace=""):
+        return pinecone_breaker.call(self.index.delete, ids=list(ids), namespace=namespace)
+
+
+# -------------------------
+# Local (memory-mapped float32 + SQLite metadata)
+# -------------------------
+def _unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class IVFIndex:
+    """Inverted-file ANN index: spherical k-means centroids + per-list row ids.
+
+    Queries scan only the rows of the `nprobe` closest lists. Rows added
+    after training are appended to their closest list; deleted or
+    overwritten rows are filtered by the caller.
+    """
+
+    def __init__(self, vectors, rows, nlist=None, iterations=10, sample_size=50000, seed=0):
+        rng = np.random.default_rng(seed)
+        self.nlist = nlist or max(1, int(np.sqrt(len(rows))))
+        self.trained_size = len(rows)
+
+        sample = rows if len(rows) <= sample_size else rng.choice(rows, sample_size, replace=False)
+        data = vectors[np.sort(sample)]
+        centroids = data[rng.choice(len(data), self.nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            empty = np.bincount(assign, minlength=self.nlist) == 0
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+            centroids = _unit_rows(sums)
+        self.centroids = centroids
+
+        self.lists = [[] for _ in range(self.nlist)]
+        for start in range(0, len(rows), 8192):
+            block = rows[start:start + 8192]
+            for row, list_id in zip(block.tolist(), self.assign(vectors[block]).tolist()):
+                self.lists[list_id].append(row)
+
+    def assign(self, unit_vectors):
+        return np.argmax(unit_vectors @ self.centroids.T, axis=1)
+
+    def add(self, rows, unit_vectors):
+        for row, list_id in zip(rows, self.assign(unit_vectors).tolist()):
+            self.lists[list_id].append(row)
+
+    def candidates(self, unit_query, nprobe):
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(-(self.centroids @ unit_query), nprobe - 1)[:nprobe]
+        rows = [row for list_id in probe for row in self.lists[list_id]]
+        return np.unique(np.asarray(rows, dtype=np.int64))
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store with the same upsert/query/delete semantics.
+
+    - vectors: unit-normalized float32 rows in a memory-mapped file
+      (vectors.f32), so only pages actually touched are resident
+    - metadata + ids: SQLite side store (meta.sqlite3), fetched only for
+      the returned matches
+    - pre-filter: namespace/source/page/doc type columns in memory, so a
+      query only scores the rows of its namespace that pass the filter
+    - search: exact cosine over those rows while they number fewer than
+      ann_threshold, otherwise IVF candidates restricted to them
+    """
+
+    def __init__(self, directory=LOCAL_VECTOR_DIR, dim=EMBEDDING_DIM,
+                 ann_threshold=LOCAL_ANN_THRESHOLD, nprobe=LOCAL_ANN_NPROBE):
+        os.makedirs(directory, exist_ok=True)
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._path = os.path.join(directory, "vectors.f32")
+
+        self._db = sqlite3.connect(os.path.join(directory, "meta.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS vectors (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                UNIQUE (namespace, id)
+            );
+        """)
+
+        if not os.path.exists(self._path):
+            open(self._path, "wb").close()
+        capacity = os.path.getsize(self._path) // (4 * dim)
+        self._vectors = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._resize(max(capacity, 1024))
+
+        # Only ids and filterable metadata are loaded at startup, never the vectors
+        self._rows = {}         # (namespace, id) -> row
+        self._columns = MetadataColumns()
+        self._size = 0          # rows in use (high-water mark)
+        for row, vid, namespace, source, page, doc_type in self._db.execute(
+            "SELECT row, id, namespace, json_extract(metadata, '$.source'), "
+            "json_extract(metadata, '$.page'), json_extract(metadata, '$.doc_type') FROM vectors"
+        ):
+            self._rows[(namespace, vid)] = row
+            self._alive[row] = True
+            self._columns.set(row, namespace, {"source": source, "page": page, "doc_type": doc_type})
+            self._size = max(self._size, row + 1)
+        self._free = [r for r in range(self._size) if not self._alive[r]]
+        self._ivf = None
+
+    # -------------------------
+    # Storage
+    # -------------------------
+    def _resize(self, capacity):
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._path, "r+b") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+    def _allocate_row(self):
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._alive):
+            self._resize(len(self._alive) * 2)
+        self._size += 1
+        return self._size - 1
+
+    def __len__(self):
+        return len(self._rows)
+
+    # -------------------------
+    # VectorStore API
+    # -------------------------
+    def upsert(self, vectors, namespace=""):
+        vectors = list(vectors)
+        if not vectors:
+            return {"upserted_count": 0}
+
+        units = _unit_rows([values for _, values, _ in vectors])
+        with self._lock:
+            rows = []
+            for vid, _, _ in vectors:
+                row = self._rows.get((namespace, vid))
+                if row is None:
+                    row = self._rows[(namespace, vid)] = self._allocate_row()
+                rows.append(row)
+
+            self._vectors[rows] = units
+            self._vectors.flush()
+            self._alive[rows] = True
+            for row, (_, _, metadata) in zip(rows, vectors):
+                self._columns.set(row, namespace, metadata)
+
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vectors (row, id, namespace, metadata) VALUES (?, ?, ?, ?)",
+                    [(row, vid, namespace, json.dumps(metadata or {}))
+                     for row, (vid, _, metadata) in zip(rows, vectors)]
+                )
+
+            if self._ivf is not None:
+                self._ivf.add(rows, units)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids, namespace=""):
+        with self._lock:
+            rows = [self._rows.pop((namespace, vid)) for vid in ids if (namespace, vid) in self._rows]
+            self._alive[rows] = False
+            for row in rows:
+                self._columns.remove(row)
+            self._free.extend(rows)
+            with self._db:
+                self._db.executemany("DELETE FROM vectors WHERE row = ?", [(r,) for r in rows])
+        return {}
+
+    def query(self, vector, top_k, include_metadata=True, namespace="", metadata_filter=None, exact=None):
+        """Cosine top_k within `namespace` and `metadata_filter`.
+
+        exact=None picks by the size of the pre-filtered row set.
+        """
+        query = _unit_rows(vector)
+        with self._lock:
+            # The pre-filtered set is the namespace's rows, or a subset of them
+            rows = self._columns.select(namespace, metadata_filter)
+            if not len(rows):
+                return {"matches": []}
+
+            # Selective filters stay exact: IVF probing could miss all of them
+            use_ann = (len(rows) >= self.ann_threshold) if exact is None else not exact
+            if use_ann:
+                rows = self._ann_candidates(query)
+                rows = rows[self._columns.match(rows, namespace, metadata_filter)]
+            scores = np.asarray(self._vectors[rows] @ query) if len(rows) else np.zeros(0, dtype=np.float32)
+
+            k = min(top_k, len(rows))
+            if k <= 0:
+                return {"matches": []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            best_rows = rows[top].tolist()
+            best_scores = scores[top].tolist()
+
+            stored = self._fetch_rows(best_rows)
+
+        return {
+            "matches": [
+                {
+                    "id": stored[row][0],
+                    "score": score,
+                    **({"metadata": json.loads(stored[row][1])} if include_metadata else {}),
+                }
+                for row, score in zip(best_rows, best_scores)
+            ]
+        }
+
+    # -------------------------
+    # Internals (call with lock held)
+    # -------------------------
+    def _fetch_rows(self, rows):
+        found = self._db.execute(
+            f"SELECT row, id, metadata FROM vectors WHERE row IN ({','.join('?' * len(rows))})", rows
+        ).fetchall()
+        return {row: (vid, metadata) for row, vid, metadata in found}
+
+    def _ann_candidates(self, query):
+        alive_rows = len(self._rows)
+        if self._ivf is None or alive_rows > 2 * self._ivf.trained_size:
+            logger.info(f"Building IVF index over {alive_rows} vectors")
+            self._ivf = IVFIndex(self._vectors, np.flatnonzero(self._alive[:self._size]))
+        return self._ivf.candidates(query, self.nprobe)
+
+
+# -------------------------
+# Factory
+# -------------------------
+@lru_cache(maxsize=None)
+def get_vector_store() -> VectorStore:
+    """Process-wide vector store selected by VECTOR_STORE."""
+    if VECTOR_STORE == "local":
+        logger.info(f"Using local vector store at {LOCAL_VECTOR_DIR}")
+        return LocalVectorStore()
+
+    # Pinecone v3
+    from pinecone import Pinecone
+
+    api_key = os.getenv("PINECONE_API_KEY")
+    index_name = os.getenv("PINECONE_INDEX_NAME")
+    if not api_key:
+        raise RuntimeError("PINECONE_API_KEY missing")
+    if not index_name:
+        raise RuntimeError("PINECONE_INDEX_NAME missing")
+
+    pc = Pinecone(api_key=api_key)
+    return PineconeVectorStore(pc.Index(index_name))
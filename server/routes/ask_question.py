@@ -1,21 +1,30 @@
-from fastapi import APIRouter, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
 import os
 
-from pydantic import Field
-from pinecone import Pinecone
 from dotenv import load_dotenv
 
-from langchain_core.documents import Document
-from langchain_core.retrievers import BaseRetriever
-
-# HF Endpoint Embeddings (correct new class)
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
-
 # Correct project imports
-from server.modules.llm import get_llm_chain
-from server.modules.query_handlers import query_chain
+from server.middlewares.exception_handlers import error_payload, error_response
+from server.modules.admission import Overloaded, batch_pool, query_pool
+from server.modules.embeddings import EMBEDDINGS_BACKEND
+from server.modules.extractive import EXTRACTIVE_ENABLED, extractive_answerer
+from server.modules.retrieval import retrieve
+from server.modules.context_builder import build_context
+from server.modules.query_batcher import QUERY_BATCH_ENABLED
+from server.modules.reranker import RERANK_ENABLED, reranker
+from server.modules.resources import resources
+from server.modules.answer_cache import ANSWER_CACHE_ENABLED, answer_cache
+from server.modules.pdf_handlers import upload_dir
+from server.modules.prefilter import MetadataFilter, validate_namespace
+from server.modules.query_handlers import abatch_chain_as_completed, aquery_chain, astream_chain
+from server.modules.sessions import SESSIONS_ENABLED, session_store, validate_session_id
+from server.modules.timing import StageTimer
 from server.logger import logger
 
 
@@ -27,98 +36,540 @@ router = APIRouter()
 load_dotenv()
 
 HF_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 
-if not HF_TOKEN:
+if EMBEDDINGS_BACKEND == "hf_endpoint" and not HF_TOKEN:
     raise RuntimeError("HUGGINGFACEHUB_API_TOKEN missing")
-if not PINECONE_API_KEY:
-    raise RuntimeError("PINECONE_API_KEY missing")
-if not PINECONE_INDEX_NAME:
-    raise RuntimeError("PINECONE_INDEX_NAME missing")
+
+# /ask/batch: questions per request, and concurrent retrievals / LLM calls per batch
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "500"))
+ASK_BATCH_RETRIEVE_CONCURRENCY = int(os.getenv("ASK_BATCH_RETRIEVE_CONCURRENCY", "16"))
+ASK_BATCH_LLM_CONCURRENCY = int(os.getenv("ASK_BATCH_LLM_CONCURRENCY", "8"))
 
 
 # -------------------------
 # Global Initialization
+#   The chain, BGE-M3 embedder (with on-disk cache) and query batcher are
+#   shared process-wide through the resource registry, warmed at startup.
+#   Questions run in the query admission pool (admission.py): a bounded
+#   number at once, a bounded queue behind them, 429 beyond that.
+# -------------------------
+
+
 # -------------------------
+# Tenant scope + metadata filters
+# -------------------------
+class AskScope:
+    """Where a question is answered from: one tenant namespace, optionally
+    narrowed to some of its files, a page range or a document type."""
+
+    def __init__(self, namespace="", metadata_filter=None, session_id=None):
+        self.namespace = namespace
+        self.filter = metadata_filter or MetadataFilter()
+        # Optional conversation (sessions.py) the question belongs to
+        self.session_id = session_id
 
-# HuggingFace BGE-M3 Embeddings (correct + stable)
-embeddings = HuggingFaceEndpointEmbeddings(
-    model="BAAI/bge-m3",
-    
-)
+    @property
+    def cache_key(self):
+        return f"{self.namespace}|{self.filter.key()}"
 
-# Pinecone v3 client + index
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+
+def _parse_scope(namespace, sources, page_min, page_max, doc_type, session_id=None) -> AskScope:
+    """Validate the optional form fields; raises ValueError on bad input.
+
+    sources is a comma-separated list of uploaded file names; pages are
+    1-based and inclusive, as shown to users.
+    """
+    namespace = validate_namespace(namespace)
+    session_id = validate_session_id(session_id) if SESSIONS_ENABLED else None
+    names = [name.strip() for name in (sources or "").split(",") if name.strip()]
+    for bound in (page_min, page_max):
+        if bound is not None and bound < 1:
+            raise ValueError("page_min and page_max start at 1")
+    if page_min is not None and page_max is not None and page_min > page_max:
+        raise ValueError("page_min must not exceed page_max")
+    return AskScope(namespace, MetadataFilter(
+        sources=tuple(os.path.join(upload_dir(namespace), os.path.basename(name)) for name in names),
+        page_min=page_min - 1 if page_min is not None else None,
+        page_max=page_max - 1 if page_max is not None else None,
+        doc_type=(doc_type or "").strip() or None,
+    ), session_id)
 
 
 # -------------------------
 # Ask Endpoint
 # -------------------------
 @router.post("/ask/")
-async def ask_question(question: str = Form(...)):
+async def ask_question(
+    request: Request,
+    question: str = Form(...),
+    namespace: str = Form(""),
+    sources: Optional[str] = Form(None),
+    page_min: Optional[int] = Form(None),
+    page_max: Optional[int] = Form(None),
+    doc_type: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+):
+    try:
+        scope = _parse_scope(namespace, sources, page_min, page_max, doc_type, session_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    try:
+        async with query_pool.slot():
+            chain = await resources.aget("llm_chain")
+            return await _answer_question(chain, question, scope)
+
+    except Overloaded as e:
+        return error_response(e)
+    except Exception as e:
+        logger.exception("Error processing question")
+        return error_response(e)
+
+
+NO_DOCS_ANSWER = "Sorry, no relevant information found in uploaded documents."
+
+
+async def _embed_question(question: str, timer: StageTimer):
+    # -------------------------
+    # Embed Query  (BGE requires "query:" prefix)
+    # -------------------------
+    with timer.stage("embed"):
+        # Concurrent questions share one embedding call
+        if QUERY_BATCH_ENABLED:
+            query_batcher = await resources.aget("query_batcher")
+            return await query_batcher.embed_query(f"query: {question}")
+        embeddings = await resources.aget("embedder")
+        return await embeddings.aembed_query(f"query: {question}")
+
+
+async def _retrieve_docs(question: str, embedded_query, timer: StageTimer, scope: AskScope):
+    # -------------------------
+    # Hybrid retrieval: vector store + BM25, fused with RRF,
+    # pre-filtered to the tenant namespace and metadata filter
+    # -------------------------
+    docs = await retrieve(
+        question, embedded_query, timer,
+        namespace=scope.namespace, metadata_filter=scope.filter
+    )
+
+    # -------------------------
+    # Merge overlapping chunks, drop duplicates, fit the token budget
+    # -------------------------
+    with timer.stage("context"):
+        return await run_in_threadpool(build_context, docs)
+
+
+def _sources(docs):
+    return [doc.metadata.get("source", "") for doc in docs]
+
+
+def _cache_lookup(question: str, scope: AskScope, embedded_query=None):
+    # Exact (normalized text) lookup needs no embedding; the semantic one does
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if embedded_query is None:
+        return answer_cache.get_exact(question, scope.cache_key)
+    return answer_cache.get_similar(embedded_query, scope.cache_key)
+
+
+async def _cached_or_embed(turn, scope: AskScope, timer: StageTimer):
+    """(cached answer or None, query embedding or None).
+
+    Follow-ups depend on the conversation, so they bypass the answer cache
+    and embed the condensed retrieval query instead of the question.
+    """
+    if turn.follow_up:
+        return None, await _embed_question(turn.retrieval_query, timer)
+    cached = _cache_lookup(turn.question, scope)
+    if cached is not None:
+        return cached, None
+    embedded_query = await _embed_question(turn.question, timer)
+    return _cache_lookup(turn.question, scope, embedded_query), embedded_query
+
+
+async def _session_or_retrieve(turn, embedded_query, timer: StageTimer, scope: AskScope):
+    """(docs, reused): the session's previous chunks when this turn is
+    about the same thing, else a fresh retrieval."""
+    docs = session_store.reusable_docs(scope.namespace, scope.session_id, scope.cache_key, embedded_query)
+    if docs is not None:
+        return docs, True
+    return await _retrieve_docs(turn.retrieval_query, embedded_query, timer, scope), False
+
+
+async def _extractive_answer(turn, docs, timer: StageTimer):
+    # Direct lookups answered from the chunks themselves, skipping the LLM;
+    # None falls back to it. Follow-ups need the conversation, so always go to the LLM.
+    if not EXTRACTIVE_ENABLED or turn.follow_up:
+        return None
+    answerer = await resources.aget("extractive")
+    with timer.stage("extractive"):
+        return await run_in_threadpool(answerer.answer, turn.question, docs)
+
+
+def _observe_llm(timer: StageTimer):
+    # Recent LLM latency, to estimate what each extractive answer saves
+    extractive_answerer.observe_llm(timer.timings["llm_total"] / 1000)
+
+
+# -------------------------
+# Shared answer pipeline
+#   /ask/, /ask/stream and /ask/batch all go cache -> retrieve -> context
+#   -> (extractive | chain) -> cache + session; only how the chain is run
+#   (awaited, streamed, batched) differs
+# -------------------------
+class AnswerPlan:
+    """A question taken as far as it goes without the LLM.
+
+    result is the final {"response", "sources", ...} when the cache, an
+    empty retrieval or the extractive fast path answered it; otherwise
+    None, and the chain is to be run on docs with turn.llm_question.
+    """
+
+    def __init__(self, turn, embedded_query=None, docs=None, result=None, reused=False):
+        self.turn = turn
+        self.embedded_query = embedded_query
+        self.docs = docs
+        self.result = result
+        self.reused = reused
+
+
+async def _plan_answer(turn, embedded_query, docs, timer: StageTimer, reused=False) -> AnswerPlan:
+    # After retrieval: no docs, extractive fast path, or the chain
+    if not docs:
+        return AnswerPlan(turn, embedded_query, docs, {"response": NO_DOCS_ANSWER, "sources": []}, reused)
+    extracted = await _extractive_answer(turn, docs, timer)
+    return AnswerPlan(turn, embedded_query, docs, extracted, reused)
+
+
+async def _prepare_answer(question: str, scope: AskScope, timer: StageTimer) -> AnswerPlan:
+    turn = session_store.begin_turn(scope.namespace, scope.session_id, question)
+
+    cached, embedded_query = await _cached_or_embed(turn, scope, timer)
+    if cached is not None:
+        logger.info("Answer served from cache")
+        return AnswerPlan(turn, result={**cached, "cached": True})
+
+    docs, reused = await _session_or_retrieve(turn, embedded_query, timer, scope)
+    return await _plan_answer(turn, embedded_query, docs, timer, reused)
+
+
+def _finish_answer(plan: AnswerPlan, scope: AskScope, result: dict):
+    """Cache a freshly built answer and record the turn in its session."""
+    if result.get("cached"):
+        _end_turn(plan.turn, scope, result["response"])
+        return
+    if ANSWER_CACHE_ENABLED and plan.docs and not plan.turn.follow_up:
+        answer_cache.put(plan.turn.question, plan.embedded_query, result, scope.cache_key, scope.namespace)
+    _end_turn(plan.turn, scope, result["response"], plan.embedded_query, plan.docs)
+
+
+def _end_turn(turn, scope: AskScope, answer: str, embedded_query=None, docs=None):
+    session_store.end_turn(
+        scope.namespace, scope.session_id, turn, answer,
+        scope=scope.cache_key, query_embedding=embedded_query, docs=docs
+    )
+
+
+async def _answer_question(chain, question: str, scope: AskScope):
+    logger.info(f"User query: {question}")
+    timer = StageTimer()
+    plan = await _prepare_answer(question, scope, timer)
+
+    # -------------------------
+    # Run the shared chain (built once at startup) unless already answered
+    # -------------------------
+    result = plan.result
+    if result is None:
+        with timer.stage("llm_total"):
+            result = await aquery_chain(chain, plan.turn.llm_question, plan.docs)
+        _observe_llm(timer)
+    _finish_answer(plan, scope, result)
+
+    timings = timer.as_dict()
+    logger.info(f"Query processed successfully timings={timings}")
+    return {**result, "reused_context": plan.reused, "timings": timings}
+
+
+# -------------------------
+# Streaming Ask Endpoint (Server-Sent Events)
+#   event: token -> {"token": "..."}   (repeated)
+#   event: done  -> {"sources": [...], "timings": {...}}
+#   event: error -> {"error": "...", "status": 500}   (+ "retry_after" for 429 / 503)
+# -------------------------
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _error_event(exc) -> dict:
+    # Headers are already sent: the event carries the status / Retry-After
+    status, content = error_payload(exc)
+    return {**content, "status": status}
+
+
+async def _stream_answer(chain, question: str, scope: AskScope):
+    timer = StageTimer()
+    try:
+        async with query_pool.slot():
+            logger.info(f"User query (stream): {question}")
+            plan = await _prepare_answer(question, scope, timer)
+
+            result = plan.result
+            if result is not None:
+                yield _sse("token", {"token": result["response"]})
+            else:
+                tokens = []
+                with timer.stage("llm_total"):
+                    llm_start = timer.since_start()
+                    async for token in astream_chain(chain, plan.turn.llm_question, plan.docs):
+                        if "llm_first_token" not in timer.timings:
+                            timer.record("llm_first_token", timer.since_start() - llm_start)
+                        tokens.append(token)
+                        yield _sse("token", {"token": token})
+                _observe_llm(timer)
+                result = {"response": "".join(tokens), "sources": _sources(plan.docs)}
+            _finish_answer(plan, scope, result)
+
+            yield _sse("done", {
+                "sources": result["sources"], "reused_context": plan.reused,
+                "cached": bool(result.get("cached")), "extractive": bool(result.get("extractive")),
+                "timings": timer.as_dict()
+            })
+            logger.info(f"Streamed query successfully timings={timer.as_dict()}")
+
+    except Exception as e:
+        if not isinstance(e, Overloaded):
+            logger.exception("Error streaming answer")
+        yield _sse("error", _error_event(e))
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(
+    request: Request,
+    question: str = Form(...),
+    namespace: str = Form(""),
+    sources: Optional[str] = Form(None),
+    page_min: Optional[int] = Form(None),
+    page_max: Optional[int] = Form(None),
+    doc_type: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+):
+    try:
+        scope = _parse_scope(namespace, sources, page_min, page_max, doc_type, session_id)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    try:
+        # Shed while a plain 429 can still be sent; the slot is taken in the stream
+        query_pool.check()
+    except Overloaded as e:
+        return error_response(e)
+
+    return StreamingResponse(
+        _stream_answer(await resources.aget("llm_chain"), question, scope),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# -------------------------
+# Batch Ask Endpoint (NDJSON, one line per question in completion order)
+#   {"index": i, "question": ..., "response": ..., "sources": [...]}
+#   {"index": i, "question": ..., "error": "..."}    (the batch goes on)
+#   {"done": true, "questions": n, "errors": k, "cached": c, "timings": {...}}
+#   {"error": "...", "status": 429, "retry_after": s}  (shed while queued)
+# -------------------------
+class AskBatchRequest(BaseModel):
+    questions: List[str]
+    namespace: str = ""
+    sources: Optional[str] = None
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+    doc_type: Optional[str] = None
+
+
+def _ndjson(data: dict) -> str:
+    return json.dumps(data) + "\n"
+
+
+async def _batch_answers(chain, questions: List[str], scope: AskScope):
+    # Batches run in their own admission pool, apart from interactive questions
     try:
-        logger.info(f"User query: {question}")
+        async with batch_pool.slot():
+            async for line in _batch_lines(chain, questions, scope):
+                yield line
+    except Overloaded as e:
+        status, content = error_payload(e)
+        yield _ndjson({**content, "status": status})
+
+
+async def _batch_lines(chain, questions: List[str], scope: AskScope):
+    """Answer a question set with one embedding call, concurrent retrieval
+    and capped concurrent LLM calls; cached questions are answered first."""
+    timer = StageTimer("ask_batch")
+    pending = {}        # index -> question, until its line is sent
+    counts = {"errors": 0, "cached": 0}
+
+    def line(index, **data):
+        del pending[index]
+        if "error" in data:
+            counts["errors"] += 1
+        return _ndjson({"index": index, "question": questions[index], **data})
+
+    try:
+        for index, question in enumerate(questions):
+            pending[index] = question
+            cached = _cache_lookup(question, scope)
+            if cached is not None:
+                counts["cached"] += 1
+                yield line(index, **cached, cached=True)
+
+        # -------------------------
+        # One embedding call for the whole batch
+        # -------------------------
+        embedded = {}
+        if pending:
+            with timer.stage("embed"):
+                embeddings = await resources.aget("embedder")
+                vectors = await embeddings.aembed_documents([f"query: {q}" for q in pending.values()])
+            embedded = dict(zip(list(pending), vectors))
+
+        for index in list(pending):
+            cached = _cache_lookup(questions[index], scope, embedded[index])
+            if cached is not None:
+                counts["cached"] += 1
+                yield line(index, **cached, cached=True)
 
         # -------------------------
-        # Embed Query  (BGE requires "query:" prefix)
+        # Concurrent retrieval (vector store + BM25 per question)
         # -------------------------
-        embedded_query = embeddings.embed_query(f"query: {question}")
+        retrieve_slots = asyncio.Semaphore(ASK_BATCH_RETRIEVE_CONCURRENCY)
+
+        async def fetch(index):
+            async with retrieve_slots:
+                return await _retrieve_docs(questions[index], embedded[index], StageTimer("ask_batch"), scope)
+
+        to_answer = list(pending)
+        with timer.stage("retrieve"):
+            results = await asyncio.gather(*(fetch(i) for i in to_answer), return_exceptions=True)
 
         # -------------------------
-        # Query Pinecone
+        # No docs / extractive fast path, as for /ask/
         # -------------------------
-        response = index.query(
-            vector=embedded_query,
-            top_k=3,
-            include_metadata=True
-        )
-
-        matches = response.get("matches", [])
-
-        docs = [
-            Document(
-                page_content=m["metadata"].get("text", ""),
-                metadata=m["metadata"]
-            )
-            for m in matches
-        ]
-
-        if not docs:
-            return {
-                "answer": "Sorry, no relevant information found in uploaded documents.",
-                "sources": []
-            }
+        plans = {}      # index -> AnswerPlan still needing the chain
+        for index, docs in zip(to_answer, results):
+            if isinstance(docs, Exception):
+                logger.warning(f"Batch item {index} retrieval failed: {docs}")
+                yield line(index, error=str(docs))
+                continue
+            # Batch questions have no session: each turn stands alone
+            turn = session_store.begin_turn(scope.namespace, None, questions[index])
+            plan = await _plan_answer(turn, embedded[index], docs, StageTimer("ask_batch"))
+            if plan.result is not None:
+                _finish_answer(plan, scope, plan.result)
+                yield line(index, **plan.result)
+            else:
+                plans[index] = plan
 
         # -------------------------
-        # Simple Retriever
+        # LLM calls, at most ASK_BATCH_LLM_CONCURRENCY at a time
         # -------------------------
-        class SimpleRetriever(BaseRetriever):
-            tags: Optional[List[str]] = Field(default_factory=list)
-            metadata: Optional[dict] = Field(default_factory=dict)
+        indexes = list(plans)
+        with timer.stage("llm_total"):
+            async for position, result in abatch_chain_as_completed(
+                chain, [questions[i] for i in indexes], [plans[i].docs for i in indexes],
+                ASK_BATCH_LLM_CONCURRENCY
+            ):
+                index = indexes[position]
+                if isinstance(result, Exception):
+                    yield line(index, error=str(result))
+                    continue
+                _finish_answer(plans[index], scope, result)
+                yield line(index, **result)
 
-            def __init__(self, documents: List[Document]):
-                super().__init__()
-                self._docs = documents
+    except Exception as e:
+        # A batch-wide step failed (e.g. the embedding call): report it on
+        # every question still unanswered
+        logger.exception("Error answering question batch")
+        for index in list(pending):
+            yield line(index, error=str(e))
 
-            def _get_relevant_documents(self, query: str) -> List[Document]:
-                return self._docs
+    timings = timer.as_dict()
+    logger.info(f"Question batch processed questions={len(questions)} timings={timings}")
+    yield _ndjson({"done": True, "questions": len(questions), **counts, "timings": timings})
 
-            async def _aget_relevant_documents(self, query: str) -> List[Document]:
-                return self._docs
 
-        retriever = SimpleRetriever(docs)
+@router.post("/ask/batch")
+async def ask_batch(body: AskBatchRequest):
+    try:
+        scope = _parse_scope(body.namespace, body.sources, body.page_min, body.page_max, body.doc_type)
+        if not body.questions:
+            raise ValueError("questions must not be empty")
+        if len(body.questions) > ASK_BATCH_MAX_QUESTIONS:
+            raise ValueError(f"at most {ASK_BATCH_MAX_QUESTIONS} questions per batch")
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    try:
+        batch_pool.check()
+    except Overloaded as e:
+        return error_response(e)
 
-        chain = get_llm_chain(retriever)
-        result = query_chain(chain, question)
+    return StreamingResponse(
+        _batch_answers(await resources.aget("llm_chain"), body.questions, scope),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        logger.info("Query processed successfully")
-        return result
 
-    except Exception as e:
-        logger.exception("Error processing question")
-        return JSONResponse(
-            status_code=500,
-            content={"error": str(e)}
-        )
+# -------------------------
+# Answer cache metrics
+# -------------------------
+@router.get("/ask/cache/stats")
+async def answer_cache_stats():
+    return answer_cache.stats()
+
+
+# -------------------------
+# Extractive fast-path metrics
+# -------------------------
+@router.get("/ask/extractive/stats")
+async def extractive_stats():
+    return {"enabled": EXTRACTIVE_ENABLED, **extractive_answerer.stats()}
+
+
+# -------------------------
+# Reranker metrics
+# -------------------------
+@router.get("/ask/reranker/stats")
+async def reranker_stats():
+    return {"enabled": RERANK_ENABLED, **reranker.stats()}
+
+
+# -------------------------
+# Conversation session metrics
+# -------------------------
+@router.get("/ask/sessions/stats")
+async def session_stats():
+    if not SESSIONS_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **session_store.stats()}
+
+
+# -------------------------
+# Embedding cache metrics (query and passage lookups)
+# -------------------------
+@router.get("/ask/embeddings/stats")
+async def embedding_cache_stats():
+    cache = getattr(await resources.aget("embedder"), "cache", None)
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+# -------------------------
+# Query embedding batcher metrics
+# -------------------------
+@router.get("/ask/batcher/stats")
+async def query_batcher_stats():
+    if not QUERY_BATCH_ENABLED:
+        return {"enabled": False}
+    query_batcher = await resources.aget("query_batcher")
+    return {"enabled": True, **query_batcher.stats()}
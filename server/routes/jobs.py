@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from server.modules.jobs import job_manager
+
+
+router=APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id:str):
+    job=job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404,content={"error":f"Unknown job {job_id}"})
+    return job.to_dict()
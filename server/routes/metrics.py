@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from server.modules.admission import batch_pool, query_pool, rate_limiter
+from server.modules.jobs import job_manager
+from server.modules.metrics import metrics
+from server.modules.resilience import circuit_status
+
+
+router=APIRouter()
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(),media_type="text/plain; version=0.0.4")
+
+
+# Admission control: pool occupancy, shed counts, rate limiting, circuits
+@router.get("/admission/stats")
+async def admission_stats():
+    return {
+        "ask":query_pool.stats(),
+        "ask_batch":batch_pool.stats(),
+        "ingest":job_manager.stats(),
+        "rate_limit":rate_limiter.stats(),
+        "circuits":circuit_status()
+    }
@@ -1,20 +1,54 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-from typing import List
+from typing import List, Optional
 
-from server.modules.load_vectorstore import load_vectorstore
+from server.middlewares.exception_handlers import error_response
+from server.modules.admission import Overloaded
+from server.modules.pdf_handlers import discard_staged, save_uploaded_files
+from server.modules.jobs import job_manager
+from server.modules.prefilter import validate_namespace
 from server.logger import logger
 
 
 router=APIRouter()
 
 @router.post("/upload_pdfs/")
-async def upload_pdfs(files:List[UploadFile] = File(...)):
+async def upload_pdfs(
+    files:List[UploadFile] = File(...),
+    namespace:str = Form(""),
+    doc_type:Optional[str] = Form(None)
+):
+    # Tenant namespace: documents are only ever retrieved for the same namespace
+    try:
+        namespace=validate_namespace(namespace)
+    except ValueError as e:
+        return JSONResponse(status_code=400,content={"error":str(e)})
+    doc_type=(doc_type or "").strip() or None
+
+    saved=[]
     try:
         logger.info("Recieved uploaded files")
-        load_vectorstore(files)
-        logger.info("Document added to vectorstore")
-        return {"messages":"Files processed and vectorstore updated"}
+        # Files must be saved while the request is open; ingestion runs in the background
+        saved=await run_in_threadpool(save_uploaded_files,files,namespace)
+        job=job_manager.submit(saved,namespace,doc_type)
+        saved=[]    # the job owns (and cleans up) the staged files now
+        return JSONResponse(
+            status_code=202,
+            content={
+                "messages":"Files received, ingestion started",
+                "job_id":job.id,
+                "status_url":f"/jobs/{job.id}"
+            }
+        )
+    except ValueError as e:
+        # A file without a usable name, or two files with the same one
+        return JSONResponse(status_code=400,content={"error":str(e)})
+    except Overloaded as e:
+        # The ingestion queue filled up while the files were being received
+        return error_response(e)
     except Exception as e:
         logger.exception("Error during PDF upload")
-        return JSONResponse(status_code=500,content={"error":str(e)})
\ No newline at end of file
+        return error_response(e)
+    finally:
+        discard_staged(saved)
@@ -0,0 +1,20 @@
+import pytest
+from langchain_core.documents import Document
+
+from server.modules.resources import ResourceRegistry
+from server.modules.tokenizer import HeuristicTokenizer
+
+
+def doc(text, source="report.pdf", page=0, **metadata):
+    return Document(page_content=text, metadata={"source": source, "page": page, **metadata})
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty resource registry swapped in for the process-wide one."""
+    registry = ResourceRegistry()
+    registry.register("tokenizer", HeuristicTokenizer)
+    for module in ("server.modules.context_builder", "server.modules.load_vectorstore"):
+        monkeypatch.setattr(f"{module}.resources", registry)
+    yield registry
+    registry.close()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from server.modules.answer_cache import AnswerCache
+
+
+def near(vector, noise, seed):
+    return np.asarray(vector) + noise * np.random.default_rng(seed).normal(size=len(vector))
+
+
+def test_similar_lookup_skips_expired_best_match():
+    cache = AnswerCache(ttl_seconds=60, similarity_threshold=0.9)
+    question = np.array([1.0, 0.0, 0.0, 0.0])
+    cache.put("What is my HbA1c?", question, {"response": "stale"})
+    cache.put("What was my latest HbA1c value?", near(question, 0.05, 1), {"response": "live"})
+    cache._entries[("", "what is my hba1c")].expires_at = 0     # the closest one has expired
+
+    assert cache.get_similar(question) == {"response": "live"}
+    stats = cache.stats()
+    assert stats["hits_semantic"] == 1 and stats["misses"] == 0 and stats["expirations"] == 1
+
+
+def test_similar_lookup_stays_in_scope_and_above_threshold():
+    cache = AnswerCache(similarity_threshold=0.9)
+    question = np.array([1.0, 0.0, 0.0, 0.0])
+    cache.put("What is my HbA1c?", question, {"response": "tenant a"}, scope="a")
+    cache.put("Unrelated", np.array([0.0, 1.0, 0.0, 0.0]), {"response": "unrelated"}, scope="b")
+
+    assert cache.get_similar(question, scope="b") is None
+    assert cache.get_similar(near(question, 0.01, 2), scope="a") == {"response": "tenant a"}
+    assert cache.stats()["misses"] == 1
+
+
+def test_ingestion_invalidates_the_namespace():
+    cache = AnswerCache()
+    cache.put("q1", [1.0, 0.0], {"response": "a"}, scope="a|filter", namespace="a")
+    cache.put("q2", [0.0, 1.0], {"response": "b"}, scope="b", namespace="b")
+
+    assert cache.invalidate_namespace("a") == 1
+    assert cache.get_exact("q1", "a|filter") is None
+    assert cache.get_exact("q2", "b") == {"response": "b"}
@@ -0,0 +1,110 @@
+from server.modules.bm25 import BM25Index, tokenize
+from server.modules.prefilter import MetadataFilter
+
+DOCS = [
+    ("a", "HbA1c 7.2 % on the latest panel", {"source": "labs.pdf", "page": 0}),
+    ("b", "Metformin 500 mg twice daily", {"source": "meds.pdf", "page": 0}),
+    ("c", "Fasting glucose 6.1 mmol/L, HbA1c pending", {"source": "labs.pdf", "page": 3}),
+]
+
+
+def ids(result):
+    return [m["id"] for m in result["matches"]]
+
+
+def test_add_and_query(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(DOCS)
+
+    assert set(ids(index.query("hba1c", 5))) == {"a", "c"}
+    assert ids(index.query("metformin dose", 5)) == ["b"]
+    assert index.query("metformin", 5)["matches"][0]["metadata"] == {"source": "meds.pdf", "page": 0}
+
+
+def test_namespaces_and_filters_are_applied(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(DOCS, namespace="tenant-a")
+    index.add([("d", "HbA1c 6.0 %", {"source": "other.pdf", "page": 0})], namespace="tenant-b")
+
+    assert set(ids(index.query("hba1c", 5, namespace="tenant-a"))) == {"a", "c"}
+    assert ids(index.query("hba1c", 5, namespace="tenant-b")) == ["d"]
+    assert ids(index.query("hba1c", 5)) == []
+    assert ids(index.query("hba1c", 5, "tenant-a", MetadataFilter(page_min=1))) == ["c"]
+    assert ids(index.query("hba1c", 5, "tenant-a", MetadataFilter(sources=("meds.pdf",)))) == []
+
+
+def test_readd_replaces_and_delete_tombstones(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(DOCS)
+    index.add([("a", "Blood pressure 120/80", {"source": "labs.pdf", "page": 0})])
+    index.delete(["c"])
+
+    assert ids(index.query("hba1c", 5)) == []
+    assert ids(index.query("blood pressure", 5)) == ["a"]
+    assert not index.contains("c")
+    assert index.contains("a")
+
+
+def test_reload_after_save(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(DOCS)
+    index.delete(["b"])
+    index.save()
+    before = index.query("hba1c glucose", 5)
+
+    reloaded = BM25Index(str(tmp_path))
+    assert reloaded.query("hba1c glucose", 5) == before
+    assert ids(reloaded.query("metformin", 5)) == []
+    assert reloaded.contains("a") and not reloaded.contains("b")
+
+    # The reloaded index keeps taking additions and deletions
+    reloaded.add([("e", "Metformin stopped", {"source": "meds.pdf", "page": 1})])
+    reloaded.delete(["a"])
+    reloaded.save()
+    again = BM25Index(str(tmp_path))
+    assert ids(again.query("metformin", 5)) == ["e"]
+    assert ids(again.query("hba1c", 5)) == ["c"]
+
+
+def test_tombstones_do_not_skew_scores(tmp_path):
+    churned = BM25Index(str(tmp_path / "churned"), compact_ratio=1.0)
+    for _ in range(20):     # the same file re-ingested many times
+        churned.add(DOCS)
+    fresh = BM25Index(str(tmp_path / "fresh"))
+    fresh.add(DOCS)
+
+    for question in ("hba1c", "metformin dose", "glucose hba1c"):
+        expected = fresh.query(question, 5)["matches"]
+        result = churned.query(question, 5)["matches"]
+        assert [m["id"] for m in result] == [m["id"] for m in expected]
+        assert [m["score"] for m in result] == [m["score"] for m in expected]
+        assert all(m["score"] > 0 for m in result)
+
+
+def test_save_compacts_tombstones(tmp_path):
+    index = BM25Index(str(tmp_path), compact_ratio=0.5)
+    for _ in range(5):
+        index.add(DOCS)
+    index.delete(["b"])
+    before = index.query("hba1c glucose metformin", 5)
+    index.save()
+
+    assert len(index._lengths) == 2
+    postings = sum(len(docs) for lexicon in index._postings.values() for docs, _ in lexicon.values())
+    assert postings == sum(len(set(tokenize(text))) for vid, text, _ in DOCS if vid != "b")
+    assert index.query("hba1c glucose metformin", 5) == before
+
+    # Compacted docs keep their stored rows, before and after a reload
+    index.add([("f", "Metformin restarted", {"source": "meds.pdf", "page": 2})])
+    index.delete(["a"])
+    expected = index.query("hba1c metformin", 5)
+    index.save()
+    assert index.query("hba1c metformin", 5) == expected
+    reloaded = BM25Index(str(tmp_path), compact_ratio=0.5)
+    assert reloaded.query("hba1c metformin", 5) == expected
+
+    reloaded.delete(["c"])
+    reloaded.save()
+    assert len(reloaded._lengths) == 1
+    assert ids(BM25Index(str(tmp_path)).query("hba1c metformin", 5)) == ["f"]
+
@@ -0,0 +1,77 @@
+from server.modules.chunker import chunker_version, split_text
+from server.modules.tokenizer import HeuristicTokenizer
+
+TOKENIZER = HeuristicTokenizer()
+HEADER = "Test\tValue\tUnit\tRange"
+ROWS = [f"Test{i}\t{i}.{i}\tmg/dL\t1.0 - 9.9" for i in range(14)]
+SENTENCES = [f"Sentence number {i} describes the patient history in some detail." for i in range(12)]
+PAGE = (
+    "LABORATORY RESULTS\n" + HEADER + "\n" + "\n".join(ROWS) + "\n\n"
+    "Clinical Notes\n" + " ".join(SENTENCES) + "\n\n"
+    "Plan:\nContinue metformin."
+)
+
+
+def split(text, max_tokens=60, overlap_tokens=16, min_tokens=20):
+    return list(split_text(text, TOKENIZER, max_tokens=max_tokens,
+                           overlap_tokens=overlap_tokens, min_tokens=min_tokens))
+
+
+def test_chunks_are_page_slices_within_the_token_limit():
+    chunks = split(PAGE)
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert PAGE[chunk.start_index:chunk.start_index + len(chunk.text)] == chunk.text
+        assert chunk.tokens <= 60
+        assert chunk.text == chunk.text.strip()
+
+
+def test_headings_start_chunks_and_are_never_left_dangling():
+    chunks = split(PAGE)
+    for heading in ("LABORATORY RESULTS", "Clinical Notes"):
+        holding = [c for c in chunks if heading in c.text.split("\n")]
+        assert len(holding) == 1
+        assert holding[0].text.startswith(heading)
+        assert holding[0].section == heading
+    for chunk in chunks:
+        assert not chunk.text.endswith(("LABORATORY RESULTS", "Clinical Notes"))
+
+
+def test_tables_split_between_rows_and_repeat_the_header():
+    chunks = [c for c in split(PAGE) if c.section == "LABORATORY RESULTS"]
+    lines = [line for c in chunks for line in c.text.split("\n")]
+    assert lines == ["LABORATORY RESULTS", HEADER] + ROWS     # whole rows, each once
+
+    for chunk in chunks[1:]:
+        assert chunk.prefix == f"LABORATORY RESULTS\n{HEADER}\n"
+        assert chunk.text.split("\n")[0] in ROWS
+
+
+def test_a_table_that_fits_is_kept_whole():
+    table = "\n".join([HEADER] + ROWS[:2])
+    text = " ".join(SENTENCES[:4]) + "\n\n" + table
+    chunks = split(text, max_tokens=80, min_tokens=20)
+    assert any(chunk.text == table for chunk in chunks)
+
+
+def test_prose_overlap_stays_within_budget():
+    chunks = [c for c in split(PAGE) if c.section == "Clinical Notes"]
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        overlap = previous.start_index + len(previous.text) - current.start_index
+        assert overlap > 0
+        assert TOKENIZER.count(PAGE[current.start_index:current.start_index + overlap]) <= 16
+        assert current.prefix == "Clinical Notes\n"
+
+
+def test_wrapped_prose_lines_are_not_headings_or_rows():
+    text = ("Blood pressure was measured in both arms while seated and after rest\n"
+            "Twice During the visit and was normal, with\n"
+            "Glucose   levels reviewed with the patient.")
+    chunks = split(text)
+    assert [(c.text, c.section) for c in chunks] == [(text, None)]
+
+
+def test_chunker_version_names_the_tokenizer():
+    assert chunker_version("heuristic") != chunker_version("NousResearch/Meta-Llama-3.1-8B-Instruct")
+    assert chunker_version("heuristic").endswith("-heuristic")
@@ -0,0 +1,71 @@
+from server.modules.context_builder import build_context, drop_near_duplicates, merge_chunks
+from server.tests.conftest import doc
+
+PAGE = ("Metformin 500 mg twice daily was started in March. "
+        "HbA1c fell from 8.1 % to 7.2 % over three months. "
+        "Fasting glucose remains above target and diet advice was repeated.")
+
+
+def test_overlapping_chunks_merge_by_start_index():
+    first, second = PAGE[:70], PAGE[50:140]
+    merged = merge_chunks([doc(second, start_index=50), doc(first, start_index=0)])
+    assert len(merged) == 1
+    assert merged[0]["text"] == PAGE[:140]
+    assert merged[0]["rank"] == 0
+
+
+def test_adjacent_chunks_merge_across_dropped_whitespace():
+    first, second = PAGE[:51].rstrip(), PAGE[51:]
+    merged = merge_chunks([doc(first, start_index=0), doc(second, start_index=51)])
+    assert [c["text"] for c in merged] == [f"{first} {second}"]
+
+
+def test_chunks_merge_on_text_overlap_without_start_index():
+    merged = merge_chunks([doc(PAGE[:80]), doc(PAGE[40:])])
+    assert [c["text"] for c in merged] == [PAGE]
+
+
+def test_distant_chunks_and_other_pages_stay_apart():
+    merged = merge_chunks([
+        doc(PAGE[:40], start_index=0),
+        doc(PAGE[100:], start_index=100),
+        doc(PAGE[30:80], page=1, start_index=30),
+    ])
+    assert len(merged) == 3
+    assert [c["rank"] for c in merged] == [0, 1, 2]
+
+
+def test_near_duplicates_keep_the_best_ranked():
+    chunks = [
+        {"text": "Patient advised to follow a low sugar diet and walk daily.", "rank": 0},
+        {"text": "Unrelated: blood pressure 120/80 mmHg at rest.", "rank": 1},
+        {"text": "Patient advised to follow a low sugar diet and walk daily!", "rank": 2},
+    ]
+    assert [c["rank"] for c in drop_near_duplicates(chunks)] == [0, 1]
+
+
+def test_build_context_merges_dedups_and_sets_text(registry):
+    docs = [
+        doc(PAGE[:80], start_index=0),
+        doc(PAGE[60:], start_index=60),
+        doc(PAGE, source="copy.pdf", start_index=0),
+    ]
+    context = build_context(docs)
+    assert [d.page_content for d in context] == [PAGE]
+    assert context[0].metadata["text"] == PAGE
+    assert context[0].metadata["source"] == "report.pdf"
+
+
+def test_build_context_respects_the_token_budget(registry):
+    tokenizer = registry.get("tokenizer")
+    long_chunk = " ".join(["glucose"] * 200)
+    docs = [doc(long_chunk, page=0), doc("HbA1c 7.2 %", page=1), doc("TSH 2.1 mIU/L", page=2)]
+
+    context = build_context(docs, token_budget=20)
+    assert [d.page_content for d in context] == ["HbA1c 7.2 %", "TSH 2.1 mIU/L"]
+
+    # Only the best chunk, and it does not fit: it is truncated to the budget
+    context = build_context(docs[:1], token_budget=20)
+    assert len(context) == 1
+    assert tokenizer.count(context[0].page_content) <= 20
+    assert long_chunk.startswith(context[0].page_content)
@@ -0,0 +1,32 @@
+from server.benchmarks.fakes import FakeEmbeddings
+from server.modules.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(dim=4, call_s=0, text_s=0)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_only_misses_reach_the_backend_and_are_counted(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    backend = CountingEmbeddings()
+    embedder = CachedEmbeddings(backend, "model", EmbeddingCache(path, memory_entries=2))
+
+    first = embedder.embed_documents(["a", "b", "a"])
+    assert backend.embedded == ["a", "b"]
+    assert embedder.embed_documents(["a", "b", "c"])[:2] == first[:2]
+    assert backend.embedded == ["a", "b", "c"]
+    assert embedder.cache.stats() == {
+        "memory_hits": 2, "disk_hits": 0, "misses": 4, "hit_rate": round(2 / 6, 4), "memory_entries": 2,
+    }
+
+    # A fresh process reads the vectors back from disk
+    reopened = CachedEmbeddings(backend, "model", EmbeddingCache(path))
+    assert reopened.embed_query("a") == first[0]
+    assert reopened.cache.stats()["disk_hits"] == 1
+    assert backend.embedded == ["a", "b", "c"]
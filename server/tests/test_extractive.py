@@ -0,0 +1,46 @@
+import pytest
+
+from server.modules.extractive import ExtractiveAnswerer
+from server.tests.conftest import doc
+
+
+class NoQAModel:
+    def extract(self, question, docs):
+        return None
+
+
+@pytest.fixture
+def answerer():
+    return ExtractiveAnswerer(qa_model=NoQAModel())
+
+
+@pytest.mark.parametrize("question, text", [
+    # A drug that was stopped, next to another drug's dose
+    ("What is the dose of metformin?", "Metformin was stopped. Started insulin 10 units at bedtime."),
+    # A test that was not done, next to another test's value
+    ("What is the glucose level?", "Glucose: not done. Sodium 140 mmol/L"),
+    # The reference range is not the result
+    ("What was my HbA1c?", "HbA1c (normal range 4.0 - 5.6): 7.2 %"),
+    ("What is my HbA1c value?", "HbA1c 4.0-5.6"),
+    # Dates are not results
+    ("What is my TSH?", "TSH was checked on 12 March"),
+    ("What is my TSH level?", "TSH 12/03/2024: 2.1 mIU/L"),
+    # Not lookups
+    ("Why was my HbA1c high?", "HbA1c: 7.2 %"),
+    ("What does my report say?", "HbA1c: 7.2 %"),
+])
+def test_no_answer_without_a_clear_span(answerer, question, text):
+    assert answerer.answer(question, [doc(text)]) is None
+
+
+@pytest.mark.parametrize("question, text, expected", [
+    ("What was my HbA1c?", "HbA1c: 7.2 % (reference 4.0 - 5.6)", "HbA1c: 7.2%"),
+    ("What is my hemoglobin level?", "Hemoglobin   13.1   g/dL", "Hemoglobin: 13.1 g/dL"),
+    ("What dose of metformin was prescribed?", "Metformin XR 500 mg twice daily.", "Metformin: 500 mg twice daily"),
+    ("What is my TSH level?", "TSH 2.1 mIU/L on 12/03/2024", "TSH: 2.1 mIU/L"),
+])
+def test_answers_clear_lookups(answerer, question, text, expected):
+    result = answerer.answer(question, [doc(text, source="labs.pdf", page=2)])
+    assert result is not None
+    assert result["response"].startswith(expected)
+    assert result["extractive"]
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from server.modules.local_embeddings import LocalEmbeddings
+
+
+class BlockingModel:
+    """Encodes texts as [len(text)], waiting for `release` on the first call."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            self.release.wait(5)
+        return np.array([[float(len(t))] for t in texts])
+
+
+def test_cancelled_caller_does_not_stop_the_worker():
+    model = BlockingModel()
+    embeddings = LocalEmbeddings("stub", window_ms=0, model=model)
+
+    async def scenario():
+        busy = asyncio.ensure_future(embeddings.aembed_query("busy"))
+        await asyncio.to_thread(model.started.wait, 5)
+
+        # Queued behind the busy batch, then given up on (e.g. a client disconnect)
+        with_timeout = asyncio.wait_for(embeddings.aembed_query("given up"), 0.05)
+        try:
+            await with_timeout
+        except asyncio.TimeoutError:
+            pass
+        model.release.set()
+
+        assert await busy == [4.0]
+        return await asyncio.wait_for(embeddings.aembed_documents(["next", "after"]), 5)
+
+    assert asyncio.run(scenario()) == [[4.0], [5.0]]
+    assert embeddings._worker.is_alive()
+    assert embeddings.embed_query("sync") == [4.0]
+
+
+def test_encode_errors_reach_the_caller_and_the_worker_survives():
+    class FailingOnce:
+        calls = 0
+
+        def encode(self, texts, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("out of memory")
+            return np.ones((len(texts), 2))
+
+    embeddings = LocalEmbeddings("stub", window_ms=0, model=FailingOnce())
+    with pytest.raises(RuntimeError, match="out of memory"):
+        embeddings.embed_query("first")
+    assert embeddings.embed_query("second") == [1.0, 1.0]
@@ -0,0 +1,116 @@
+import pytest
+from langchain_core.documents import Document
+
+from server.benchmarks.fakes import FakeEmbeddings
+from server.modules import load_vectorstore
+from server.modules.bm25 import BM25Index
+from server.modules.chunker import split_text
+from server.modules.manifest import DocumentManifest
+from server.modules.pdf_handlers import ParsedPage
+from server.modules.tokenizer import HeuristicTokenizer
+from server.modules.vectorstore import LocalVectorStore
+
+SOURCE = "uploaded_docs/report.pdf"
+PAGES = {
+    "intro": "Patient reviewed in diabetes clinic for routine follow up.",
+    "labs": "HbA1c 7.2 % and fasting glucose 6.1 mmol/L on the latest panel.",
+    "plan": "Metformin 500 mg twice daily continued; review in three months.",
+}
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(dim=8, call_s=0, text_s=0)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def index(registry, tmp_path, monkeypatch):
+    """Ingestion wired to local stores, with PDFs replaced by lists of page texts."""
+    registry.register("embedder", CountingEmbeddings)
+    registry.register("vector_store", lambda: LocalVectorStore(str(tmp_path / "vectors"), dim=8))
+    registry.register("bm25_index", lambda: BM25Index(str(tmp_path / "bm25")))
+    registry.register("manifest", lambda: DocumentManifest(str(tmp_path / "manifest.sqlite3")))
+
+    documents = {}
+    monkeypatch.setattr(load_vectorstore, "submit_pdf_parse",
+                        lambda path, split=False, tokenizer_path=None: (len(documents[path]), documents[path]))
+
+    def iter_parsed_pages(path, page_count, pages):
+        for page, text in enumerate(pages):
+            document = Document(page_content=text, metadata={"source": path, "page": page})
+            yield ParsedPage(document, list(split_text(text, HeuristicTokenizer())))
+
+    monkeypatch.setattr(load_vectorstore, "iter_parsed_pages", iter_parsed_pages)
+
+    def ingest(pages, version):
+        documents[SOURCE] = [PAGES[name] for name in pages]
+        progress = {}
+        load_vectorstore.ingest_files(
+            [SOURCE], file_hashes={SOURCE: version},
+            on_progress=lambda path, stage, n: progress.__setitem__(stage, progress.get(stage, 0) + n),
+        )
+        return progress
+
+    return registry, ingest
+
+
+def stored_texts(registry):
+    vector_store = registry.get("vector_store")
+    result = vector_store.query([1.0] * 8, 10)
+    return sorted(m["metadata"]["text"] for m in result["matches"])
+
+
+def test_first_ingest_indexes_every_chunk(index):
+    registry, ingest = index
+    progress = ingest(["intro", "labs"], "v1")
+
+    assert progress["chunks_total"] == 2
+    assert progress["chunks_unchanged"] == 0
+    assert stored_texts(registry) == sorted([PAGES["intro"], PAGES["labs"]])
+    assert len(registry.get("manifest").chunk_ids(SOURCE)) == 2
+    assert registry.get("manifest").file_hash(SOURCE).startswith("v1")
+
+
+def test_unchanged_file_is_skipped(index):
+    registry, ingest = index
+    ingest(["intro", "labs"], "v1")
+    embedder = registry.get("embedder")
+    embedder.embedded.clear()
+
+    progress = ingest(["intro", "labs"], "v1")
+    assert progress == {"chunks_unchanged": 2, "chunks_total": 0}
+    assert embedder.embedded == []
+
+
+def test_changed_file_embeds_added_keeps_unchanged_and_deletes_removed(index):
+    registry, ingest = index
+    ingest(["intro", "labs"], "v1")
+    manifest = registry.get("manifest")
+    before = manifest.chunk_ids(SOURCE)
+    embedder = registry.get("embedder")
+    embedder.embedded.clear()
+
+    # "labs" removed, "plan" added; "intro" stays page 0, so its chunk is unchanged
+    progress = ingest(["intro", "plan"], "v2")
+
+    assert progress["chunks_unchanged"] == 1
+    assert progress["chunks_total"] == 1
+    assert progress["vectors_deleted"] == 1
+    assert embedder.embedded == [f"passage: {PAGES['plan']}"]
+    assert stored_texts(registry) == sorted([PAGES["intro"], PAGES["plan"]])
+
+    after = manifest.chunk_ids(SOURCE)
+    assert len(after) == 2
+    kept = set(before.values()) & set(after.values())
+    assert len(kept) == 1
+
+    bm25 = registry.get("bm25_index")
+    assert not bm25.query("hba1c glucose", 5)["matches"]
+    assert [m["metadata"]["text"] for m in bm25.query("metformin", 5)["matches"]] == [PAGES["plan"]]
+    assert all(bm25.contains(vid) for vid in after.values())
+    assert not any(bm25.contains(vid) for vid in set(before.values()) - kept)
@@ -0,0 +1,51 @@
+import io
+import os
+import stat
+
+import pytest
+from fastapi import UploadFile
+
+from server.modules import pdf_handlers
+from server.modules.pdf_handlers import discard_staged, promote_staged, save_uploaded_files
+
+
+@pytest.fixture(autouse=True)
+def upload_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_handlers, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def upload(name, content=b"%PDF-1.4 test"):
+    return UploadFile(io.BytesIO(content), filename=name)
+
+
+def test_uploads_are_staged_then_promoted_with_the_default_mode(upload_root):
+    saved = save_uploaded_files([upload("report.pdf")], "tenant")
+    assert not os.path.exists(saved[0].path)
+    assert saved[0].staged_path.endswith(".part")
+
+    promote_staged(saved)
+    assert saved[0].path == os.path.join(str(upload_root), "tenant", "report.pdf")
+    with open(saved[0].path, "rb") as f:
+        assert f.read() == b"%PDF-1.4 test"
+    assert stat.S_IMODE(os.stat(saved[0].path).st_mode) == pdf_handlers.UPLOAD_FILE_MODE
+
+
+@pytest.mark.parametrize("name", ["", "..", "dir/.."])
+def test_unusable_names_are_rejected_before_writing(upload_root, name):
+    with pytest.raises(ValueError):
+        save_uploaded_files([upload("ok.pdf"), upload(name)])
+    assert os.listdir(upload_root) == []
+
+
+def test_discard_removes_staged_files(upload_root):
+    saved = save_uploaded_files([upload("a.pdf"), upload("b.pdf")])
+    discard_staged(saved)
+    discard_staged(saved)       # already gone: no error
+    assert os.listdir(upload_root) == []
+
+
+def test_duplicate_names_in_one_upload_are_rejected(upload_root):
+    with pytest.raises(ValueError, match="report.pdf"):
+        save_uploaded_files([upload("report.pdf"), upload("other.pdf"), upload("dir/report.pdf")])
+    assert os.listdir(upload_root) == []
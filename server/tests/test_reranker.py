@@ -0,0 +1,82 @@
+import time
+
+from server.modules.reranker import CrossEncoderReranker
+from server.tests.conftest import doc
+
+
+class ScoreByLength:
+    """Longer chunks score higher; records every pair it is asked to score."""
+
+    def __init__(self, seconds_per_batch=0.0):
+        self.seconds_per_batch = seconds_per_batch
+        self.scored = []
+
+    def predict(self, pairs, batch_size=None):
+        time.sleep(self.seconds_per_batch)
+        self.scored.extend(text for _, text in pairs)
+        return [float(len(text)) for _, text in pairs]
+
+
+def make_reranker(model, **kwargs):
+    reranker = CrossEncoderReranker(model_name="stub", **kwargs)
+    reranker._model = model
+    return reranker
+
+
+DOCS = [doc("short"), doc("a much longer chunk"), doc("medium chunk")]
+
+
+def texts(docs):
+    return [d.page_content for d in docs]
+
+
+def test_reorders_by_cross_encoder_score():
+    reranker = make_reranker(ScoreByLength())
+    ranked, reranked = reranker.rerank("question", DOCS, 2)
+    assert reranked
+    assert texts(ranked) == ["a much longer chunk", "medium chunk"]
+
+
+def test_budget_exceeded_keeps_retrieval_order():
+    model = ScoreByLength(seconds_per_batch=0.02)
+    reranker = make_reranker(model, batch_size=1, budget_ms=10)
+
+    ranked, reranked = reranker.rerank("question", DOCS, 2)
+    assert not reranked
+    assert texts(ranked) == ["short", "a much longer chunk"]
+    assert len(model.scored) < len(DOCS)
+    assert reranker.stats()["budget_exceeded"] == 1
+    assert reranker.stats()["reranked"] == 0
+
+
+def test_cached_pairs_are_not_scored_again():
+    model = ScoreByLength()
+    reranker = make_reranker(model)
+    reranker.rerank("question", DOCS, 3)
+    reranker.rerank("question", DOCS + [doc("new chunk")], 3)
+
+    assert model.scored == texts(DOCS) + ["new chunk"]
+    stats = reranker.stats()
+    assert stats["pairs_scored"] == 4 and stats["pairs_cached"] == 3
+    assert stats["cache_hit_rate"] == round(3 / 7, 4)
+
+    # Another question is another pair
+    reranker.rerank("other question", DOCS[:2], 2)
+    assert model.scored[-2:] == texts(DOCS[:2])
+
+
+def test_cache_evicts_least_recently_used():
+    model = ScoreByLength()
+    reranker = make_reranker(model, cache_size=4)
+    first, second = [doc("alpha"), doc("beta")], [doc("gamma"), doc("delta")]
+    reranker.rerank("q", first, 2)
+    reranker.rerank("q", second, 2)
+    reranker.rerank("q", first, 2)             # hit: first becomes most recent
+    reranker.rerank("q", [doc("epsilon"), doc("zeta")], 2)    # evicts second, not first
+    assert reranker.stats()["cache_entries"] == 4
+
+    model.scored.clear()
+    reranker.rerank("q", first, 2)
+    assert model.scored == []
+    reranker.rerank("q", second, 2)
+    assert model.scored == ["gamma", "delta"]
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from server.modules import resilience
+from server.modules.resilience import CircuitBreaker, CircuitOpenError, retry_with_backoff
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code=None):
+        super().__init__(f"upstream returned {status_code}")
+        self.status_code = status_code
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+
+def fail(status_code=None):
+    raise UpstreamError(status_code)
+
+
+def test_opens_after_consecutive_upstream_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=5)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            breaker.call(fail, 503)
+    breaker.call(lambda: "ok")      # a success resets the count
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            breaker.call(fail, 503)
+    assert breaker.status()["state"] == "closed"
+
+    with pytest.raises(UpstreamError):
+        breaker.call(fail)          # no status: timeout / connection error
+    assert breaker.status()["state"] == "open"
+
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.call(lambda: "never called")
+    assert raised.value.retry_after == pytest.approx(5)
+    assert breaker.status()["rejected"] == 1
+
+
+def test_client_errors_do_not_open_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(UpstreamError):
+        breaker.call(fail, 400)
+    assert breaker.status()["state"] == "closed"
+    with pytest.raises(UpstreamError):
+        breaker.call(fail, 429)
+    assert breaker.status()["state"] == "open"
+
+
+def test_half_open_trial_closes_on_success(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+    with pytest.raises(UpstreamError):
+        breaker.call(fail, 500)
+
+    clock.now += 5
+    breaker.before_call()           # the one trial call
+    assert breaker.status()["state"] == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()       # others are rejected while it runs
+    breaker.on_success()
+
+    assert breaker.status()["state"] == "closed"
+    assert breaker.call(lambda: "ok") == "ok"
+
+
+def test_half_open_failure_reopens_with_doubled_timeout(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5, max_reset_timeout=12)
+    with pytest.raises(UpstreamError):
+        breaker.call(fail, 500)
+
+    for timeout in (10, 12, 12):
+        clock.now += 100
+        with pytest.raises(UpstreamError):
+            breaker.call(fail, 502)
+        assert breaker.status()["state"] == "open"
+        clock.now += timeout - 0.5
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "too early")
+        clock.now -= timeout - 0.5
+
+    clock.now += 12
+    breaker.call(lambda: "ok")
+    assert breaker.status()["state"] == "closed"
+    # Closed again: the next outage starts from the base timeout
+    with pytest.raises(UpstreamError):
+        breaker.call(fail, 500)
+    clock.now += 5
+    assert breaker.call(lambda: "ok") == "ok"
+
+
+def test_cancelled_trial_releases_the_half_open_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+    with pytest.raises(UpstreamError):
+        breaker.call(fail, 500)
+    clock.now += 5
+
+    async def cancelled():
+        raise asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(breaker.acall(cancelled))
+    assert breaker.status()["state"] == "half_open"
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.status()["state"] == "closed"
+
+
+def test_retry_only_retries_transient_failures(clock):
+    calls = []
+
+    def flaky(status_code):
+        calls.append(status_code)
+        if len(calls) < 3:
+            raise UpstreamError(status_code)
+        return "ok"
+
+    assert retry_with_backoff(flaky, 503, attempts=4) == "ok"
+    assert len(calls) == 3 and len(clock.slept) == 2
+
+    calls.clear()
+    with pytest.raises(UpstreamError):
+        retry_with_backoff(flaky, 400, attempts=4)
+    assert len(calls) == 1
@@ -0,0 +1,29 @@
+import time
+
+from server.modules import tokenizer as tokenizer_module
+from server.modules.tokenizer import HeuristicTokenizer, load_tokenizer, worker_tokenizer
+
+
+def test_missing_path_means_heuristic_counts():
+    assert isinstance(load_tokenizer(None), HeuristicTokenizer)
+    assert worker_tokenizer(None).name == "heuristic"
+
+
+def test_hub_download_is_bounded_by_the_timeout(monkeypatch):
+    import huggingface_hub
+
+    def slow_download(*args, local_files_only=False, **kwargs):
+        if local_files_only:
+            raise FileNotFoundError("not cached")
+        time.sleep(5)
+
+    monkeypatch.setattr(huggingface_hub, "hf_hub_download", slow_download)
+    monkeypatch.setattr(tokenizer_module, "TOKENIZER_NAME", "some/unreachable-repo")
+    monkeypatch.setattr(tokenizer_module, "TOKENIZER_HUB_TIMEOUT_SECONDS", 0.2)
+    tokenizer_module.get_tokenizer.cache_clear()
+    try:
+        start = time.perf_counter()
+        assert isinstance(tokenizer_module.get_tokenizer(), HeuristicTokenizer)
+        assert time.perf_counter() - start < 2
+    finally:
+        tokenizer_module.get_tokenizer.cache_clear()
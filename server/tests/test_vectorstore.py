@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from server.modules.prefilter import MetadataFilter
+from server.modules.vectorstore import LocalVectorStore
+
+DIM = 8
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore(str(tmp_path), dim=DIM, ann_threshold=10 ** 6, nprobe=64)
+    values = vectors(200)
+    store.upsert([
+        (f"v{i}", values[i].tolist(), {"source": f"doc{i % 4}.pdf", "page": i % 10,
+                                       **({"doc_type": "lab"} if i % 2 else {})})
+        for i in range(200)
+    ])
+    return store, values
+
+
+def ids(result):
+    return [m["id"] for m in result["matches"]]
+
+
+def test_exact_query_returns_nearest(store):
+    store, values = store
+    result = store.query(values[17].tolist(), 3)
+    assert ids(result)[0] == "v17"
+    assert result["matches"][0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert result["matches"][0]["metadata"] == {"source": "doc1.pdf", "page": 7, "doc_type": "lab"}
+
+
+def test_filtered_query_only_returns_matching_rows(store):
+    store, values = store
+    metadata_filter = MetadataFilter(sources=("doc1.pdf", "doc3.pdf"), page_min=3, page_max=5, doc_type="lab")
+    result = store.query(values[0].tolist(), 50, metadata_filter=metadata_filter)
+
+    expected = {f"v{i}" for i in range(200) if i % 4 in (1, 3) and 3 <= i % 10 <= 5}
+    assert set(ids(result)) == expected
+    assert all(metadata_filter.matches(m["metadata"]) for m in result["matches"])
+
+
+def test_ivf_matches_exact_when_probing_every_list(store):
+    store, values = store
+    metadata_filter = MetadataFilter(doc_type="lab")
+    for i in (3, 50, 101):
+        exact = store.query(values[i].tolist(), 5, metadata_filter=metadata_filter, exact=True)
+        ann = store.query(values[i].tolist(), 5, metadata_filter=metadata_filter, exact=False)
+        assert ids(ann) == ids(exact)
+        assert all(m["metadata"]["doc_type"] == "lab" for m in ann["matches"])
+
+
+def test_ivf_sees_rows_added_and_deleted_after_training(store):
+    store, values = store
+    store.query(values[0].tolist(), 1, exact=False)     # trains the IVF index
+
+    new = vectors(1, seed=1)[0]
+    store.upsert([("new", new.tolist(), {"source": "late.pdf", "page": 0})])
+    store.delete(["v5"])
+
+    assert ids(store.query(new.tolist(), 1, exact=False)) == ["new"]
+    assert "v5" not in ids(store.query(values[5].tolist(), 5, exact=False))
+    assert "v5" not in ids(store.query(values[5].tolist(), 5, exact=True))
+
+
+def test_namespaces_are_isolated_and_persisted(tmp_path):
+    store = LocalVectorStore(str(tmp_path), dim=DIM)
+    values = vectors(2)
+    store.upsert([("a", values[0].tolist(), {"source": "x.pdf", "page": 0})], namespace="tenant-a")
+    store.upsert([("b", values[1].tolist(), {"source": "x.pdf", "page": 0})], namespace="tenant-b")
+
+    assert ids(store.query(values[1].tolist(), 5, namespace="tenant-a")) == ["a"]
+    assert ids(store.query(values[1].tolist(), 5)) == []
+
+    reopened = LocalVectorStore(str(tmp_path), dim=DIM)
+    assert ids(reopened.query(values[1].tolist(), 5, namespace="tenant-b")) == ["b"]
+    assert len(reopened) == 2